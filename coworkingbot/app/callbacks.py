@@ -0,0 +1,137 @@
+"""Callback data codec and a dict-based callback dispatcher.
+
+Callback data is `prefix` or `prefix:arg[:arg...]` (`pack`/`unpack`). Each router
+module keeps a `CallbackTable` and registers handlers with `@callbacks.route(...)`
+instead of one `F.data` filter per handler: aiogram checks filters one by one, and
+runs plain ones like `F.data == ...` in a worker thread, so a button near the end
+of the admin router used to cost dozens of thread hops. The table is a single
+async filter that finds the handler with a dict lookup.
+
+Older buttons, still present in chats, used `prefix_arg` (`confirm_<id>`,
+`report_detailed_<period>`); routes can accept that form via `legacy`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from aiogram import Router, types
+from aiogram.dispatcher.event.handler import CallableObject
+
+from coworkingbot.app.context import AppContext
+from coworkingbot.services.common import is_admin
+
+SEPARATOR = ":"
+# Telegram limit for InlineKeyboardButton.callback_data.
+MAX_CALLBACK_BYTES = 64
+NO_ACCESS_TEXT = "⛔ Нет доступа"
+
+Converter = Callable[[str], Any]
+
+
+def pack(prefix: str, *args: object) -> str:
+    parts = [prefix, *(str(arg) for arg in args)]
+    if any(SEPARATOR in part for part in parts):
+        raise ValueError(f"Callback parts must not contain {SEPARATOR!r}: {parts}")
+    data = SEPARATOR.join(parts)
+    if len(data.encode()) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"Callback data over {MAX_CALLBACK_BYTES} bytes: {data}")
+    return data
+
+
+def unpack(data: str) -> tuple[str, list[str]]:
+    prefix, *args = data.split(SEPARATOR)
+    return prefix, args
+
+
+@dataclass(frozen=True)
+class CallbackRoute:
+    prefix: str
+    handler: CallableObject
+    args: tuple[tuple[str, Converter], ...]
+
+    @property
+    def callback(self) -> Callable[..., Any]:
+        return self.handler.callback
+
+    def convert(self, values: list[str]) -> dict[str, Any] | None:
+        try:
+            return {
+                name: convert(value)
+                for (name, convert), value in zip(self.args, values, strict=True)
+            }
+        except ValueError:
+            return None
+
+
+class CallbackTable:
+    """Callback handlers of one router, looked up by prefix and argument count.
+
+    With `admin_only`, non-admins get "⛔ Нет доступа" and the handler does not run.
+    """
+
+    def __init__(self, router: Router, *, admin_only: bool = False) -> None:
+        self._admin_only = admin_only
+        self._routes: dict[tuple[str, int], CallbackRoute] = {}
+        self._legacy: dict[str, CallbackRoute] = {}
+        router.callback_query.register(self.dispatch, self.match)
+
+    def route(
+        self,
+        prefix: str,
+        *,
+        args: Mapping[str, Converter] | None = None,
+        legacy: str | None = None,
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Register a handler; `args` are passed to it by name, converted in order."""
+
+        def decorator(callback: Callable[..., Any]) -> Callable[..., Any]:
+            route = CallbackRoute(prefix, CallableObject(callback), tuple((args or {}).items()))
+            key = (prefix, len(route.args))
+            if key in self._routes:
+                raise ValueError(f"Callback {prefix!r} is already registered")
+            self._routes[key] = route
+            if legacy is not None:
+                if len(route.args) != 1:
+                    raise ValueError("Legacy callbacks carry exactly one argument")
+                self._legacy[legacy] = route
+            return callback
+
+        return decorator
+
+    def resolve(self, data: str) -> tuple[CallbackRoute, dict[str, Any]] | None:
+        prefix, values = unpack(data)
+        route = self._routes.get((prefix, len(values)))
+        if route is None and not values and self._legacy:
+            # `confirm_REC-1`: try every "…_" head of the data, there are only a few.
+            cut = data.find("_")
+            while cut != -1 and route is None:
+                route = self._legacy.get(data[: cut + 1])
+                values = [data[cut + 1 :]]
+                cut = data.find("_", cut + 1)
+        if route is None:
+            return None
+        kwargs = route.convert(values)
+        return None if kwargs is None else (route, kwargs)
+
+    async def match(self, callback: types.CallbackQuery) -> bool | dict[str, Any]:
+        resolved = self.resolve(callback.data or "")
+        if resolved is None:
+            return False
+        route, kwargs = resolved
+        return {"callback_route": route, "callback_args": kwargs}
+
+    async def dispatch(
+        self,
+        callback: types.CallbackQuery,
+        callback_route: CallbackRoute,
+        callback_args: dict[str, Any],
+        **data: Any,
+    ) -> Any:
+        ctx: AppContext = data["ctx"]
+        if self._admin_only and not is_admin(ctx, callback.from_user.id):
+            await callback.answer(NO_ACCESS_TEXT, show_alert=True)
+            return None
+        return await callback_route.handler.call(callback, **data, **callback_args)
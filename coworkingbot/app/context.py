@@ -10,7 +10,12 @@ import pytz
 from aiogram import Bot
 
 if TYPE_CHECKING:
+    from coworkingbot.services.broadcast import NotificationDispatcher
     from coworkingbot.services.gas import GasClient
+    from coworkingbot.services.loop_monitor import LoopMonitor
+    from coworkingbot.services.metrics import BotMetrics
+    from coworkingbot.services.outbox import Outbox
+    from coworkingbot.services.scheduler import Scheduler
 
 
 ENV_FILE_HINT = "/etc/default/coworking-bot"
@@ -26,6 +31,36 @@ class Settings:
     admin_ids: tuple[int, ...]
     admin_alerts_chat_id: int | None
     tz_name: str
+    gas_batch_enabled: bool = False
+    gas_hedging_enabled: bool = False
+    gas_idempotent_writes: bool = False
+    replica_db_path: str = ""
+    replica_sync_seconds: float = 15.0
+    replica_max_staleness_seconds: float = 60.0
+    fsm_storage_path: str = ""
+    fsm_state_ttl_seconds: float = 86400.0
+    bot_mode: str = "polling"
+    webhook_url: str = ""
+    webhook_secret: str = ""
+    webhook_host: str = "127.0.0.1"
+    webhook_port: int = 8080
+    webhook_path: str = "/telegram/webhook"
+    webhook_max_concurrency: int = 32
+    update_concurrency: int = 16
+    scheduler_enabled: bool = False
+    scheduler_state_path: str = "/var/lib/coworkingbot/scheduler.json"
+    reminders_cron: str = "*/10 * * * *"
+    auto_cancel_cron: str = "*/15 * * * *"
+    daily_report_cron: str = "0 21 * * *"
+    outbox_path: str = ""
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    loop_stall_ms: float = 250.0
+    callback_ack_ms: float = 300.0
+    log_format: str = "json"
+    log_level: str = "INFO"
+    log_rate_per_second: float = 50.0
+    log_sampling: str = "aiogram.event=0.1"
 
 
 @dataclass(frozen=True)
@@ -34,6 +69,11 @@ class AppContext:
     bot: Bot
     tz: pytz.tzinfo.BaseTzInfo
     gas: GasClient
+    scheduler: Scheduler | None = None
+    notifier: NotificationDispatcher | None = None
+    outbox: Outbox | None = None
+    metrics: BotMetrics | None = None
+    loop_monitor: LoopMonitor | None = None
 
 
 def _parse_admin_ids(raw: str | None) -> tuple[int, ...]:
@@ -64,6 +104,30 @@ def _parse_alerts_chat_id(raw: str | None) -> int | None:
         return None
 
 
+def _parse_float(raw: str | None, default: float) -> float:
+    if not raw or not raw.strip():
+        return default
+    try:
+        return float(raw.strip())
+    except ValueError:
+        logger.warning("Invalid number %s (using %s)", raw, default)
+        return default
+
+
+def _parse_int(raw: str | None, default: int) -> int:
+    if not raw or not raw.strip():
+        return default
+    try:
+        return int(raw.strip())
+    except ValueError:
+        logger.warning("Invalid integer %s (using %s)", raw, default)
+        return default
+
+
+def _parse_flag(raw: str | None) -> bool:
+    return (raw or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
 def load_settings() -> Settings:
     return Settings(
         bot_token=os.environ.get("BOT_TOKEN", "").strip(),
@@ -72,6 +136,40 @@ def load_settings() -> Settings:
         admin_ids=_parse_admin_ids(os.environ.get("ADMIN_IDS")),
         admin_alerts_chat_id=_parse_alerts_chat_id(os.environ.get("ADMIN_ALERTS_CHAT_ID")),
         tz_name=os.environ.get("TZ", "Europe/Moscow").strip(),
+        gas_batch_enabled=_parse_flag(os.environ.get("GAS_BATCH_ENABLED")),
+        gas_hedging_enabled=_parse_flag(os.environ.get("GAS_HEDGING")),
+        gas_idempotent_writes=_parse_flag(os.environ.get("GAS_IDEMPOTENT_WRITES")),
+        replica_db_path=os.environ.get("REPLICA_DB_PATH", "").strip(),
+        replica_sync_seconds=_parse_float(os.environ.get("REPLICA_SYNC_SECONDS"), 15.0),
+        replica_max_staleness_seconds=_parse_float(
+            os.environ.get("REPLICA_MAX_STALENESS_SECONDS"), 60.0
+        ),
+        fsm_storage_path=os.environ.get("FSM_STORAGE_PATH", "").strip(),
+        fsm_state_ttl_seconds=_parse_float(os.environ.get("FSM_STATE_TTL_SECONDS"), 86400.0),
+        bot_mode=os.environ.get("BOT_MODE", "polling").strip().lower() or "polling",
+        webhook_url=os.environ.get("WEBHOOK_URL", "").strip(),
+        webhook_secret=os.environ.get("WEBHOOK_SECRET", "").strip(),
+        webhook_host=os.environ.get("WEBHOOK_HOST", "127.0.0.1").strip(),
+        webhook_port=_parse_int(os.environ.get("WEBHOOK_PORT"), 8080),
+        webhook_path=os.environ.get("WEBHOOK_PATH", "/telegram/webhook").strip(),
+        webhook_max_concurrency=max(1, _parse_int(os.environ.get("WEBHOOK_MAX_CONCURRENCY"), 32)),
+        update_concurrency=max(1, _parse_int(os.environ.get("UPDATE_CONCURRENCY"), 16)),
+        scheduler_enabled=_parse_flag(os.environ.get("SCHEDULER_ENABLED")),
+        scheduler_state_path=os.environ.get(
+            "SCHEDULER_STATE_PATH", "/var/lib/coworkingbot/scheduler.json"
+        ).strip(),
+        reminders_cron=os.environ.get("REMINDERS_CRON", "*/10 * * * *").strip(),
+        auto_cancel_cron=os.environ.get("AUTO_CANCEL_CRON", "*/15 * * * *").strip(),
+        daily_report_cron=os.environ.get("DAILY_REPORT_CRON", "0 21 * * *").strip(),
+        outbox_path=os.environ.get("OUTBOX_PATH", "").strip(),
+        metrics_host=os.environ.get("METRICS_HOST", "127.0.0.1").strip(),
+        metrics_port=_parse_int(os.environ.get("METRICS_PORT"), 0),
+        loop_stall_ms=_parse_float(os.environ.get("LOOP_STALL_MS"), 250.0),
+        callback_ack_ms=max(0.0, _parse_float(os.environ.get("CALLBACK_ACK_MS"), 300.0)),
+        log_format=os.environ.get("LOG_FORMAT", "json").strip().lower() or "json",
+        log_level=os.environ.get("LOG_LEVEL", "INFO").strip().upper() or "INFO",
+        log_rate_per_second=_parse_float(os.environ.get("LOG_RATE_PER_SECOND"), 50.0),
+        log_sampling=os.environ.get("LOG_SAMPLING", "aiogram.event=0.1").strip(),
     )
 
 
@@ -87,6 +185,27 @@ def validate_settings(settings: Settings) -> Sequence[str]:
         missing.append("API_TOKEN")
     if not settings.admin_ids:
         missing.append("ADMIN_IDS")
+    if settings.bot_mode not in {"polling", "webhook"}:
+        missing.append("BOT_MODE (polling|webhook)")
+    elif settings.bot_mode == "webhook":
+        if not settings.webhook_url:
+            missing.append("WEBHOOK_URL")
+        if not settings.webhook_secret:
+            missing.append("WEBHOOK_SECRET")
+    if settings.scheduler_enabled:
+        from coworkingbot.services.scheduler import CronSpec
+
+        for name, expr in (
+            ("REMINDERS_CRON", settings.reminders_cron),
+            ("AUTO_CANCEL_CRON", settings.auto_cancel_cron),
+            ("DAILY_REPORT_CRON", settings.daily_report_cron),
+        ):
+            if not expr:
+                continue
+            try:
+                CronSpec.parse(expr)
+            except ValueError:
+                missing.append(f"{name} (invalid)")
     return missing
 
 
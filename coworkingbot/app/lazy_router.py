@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import Router
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+Wants = Callable[[TelegramObject, dict[str, Any]], bool]
+
+
+class LazyRouter(Router):
+    """Stands in for `<module>.router` until the first update that may need it.
+
+    Put it where the real router would be included. Updates that reach it go
+    through `wants(event, data)`; the first one that says yes imports the module
+    (off the event loop) and includes its router here, so it handles that update
+    and every later one. Only message and callback_query updates are watched.
+    """
+
+    def __init__(self, module: str, wants: Wants) -> None:
+        super().__init__(name=f"lazy:{module}")
+        self._module = module
+        self._wants = wants
+        self._lock = asyncio.Lock()
+        for observer in (self.message, self.callback_query):
+            observer.outer_middleware(self._load_if_wanted)
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.sub_routers)
+
+    async def _load_if_wanted(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        if not self.loaded and self._wants(event, data):
+            await self.load()
+        return await handler(event, data)
+
+    async def load(self) -> Router:
+        async with self._lock:
+            if not self.loaded:
+                started = time.perf_counter()
+                module = await asyncio.to_thread(importlib.import_module, self._module)
+                self.include_router(module.router)
+                logger.info(
+                    "Loaded %s in %.0f ms", self._module, (time.perf_counter() - started) * 1000
+                )
+        return self.sub_routers[0]
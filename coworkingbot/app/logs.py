@@ -0,0 +1,252 @@
+"""Logging pipeline: records are queued on the loop thread and written by a listener thread.
+
+Loop thread (`QueueHandler`): trace id is attached, records are sampled and rate
+limited, then put on a bounded queue without blocking; a full queue drops the
+record and counts it. Listener thread: phones and names are redacted and the
+record is written as one JSON object (or a text line) to stderr, i.e. journald.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+
+from coworkingbot.services.tracing import TraceLogFilter
+
+if TYPE_CHECKING:
+    from coworkingbot.app.context import Settings
+
+QUEUE_SIZE = 10_000
+RATE_PER_SECOND = 50.0
+RATE_BURST = 200.0
+# The same warning/error (logger + message template) at most this often per minute.
+REPEAT_PER_MINUTE = 20
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s"
+
+# 11-digit Russian numbers in any of the spellings users type. Bare 10-digit "9..."
+# numbers look like Telegram user ids, so those are only masked under a phone key.
+_PHONE_RE = re.compile(r"(?<![\w+])(?:\+7|7|8)(?:[\s()\-]*\d){10}(?!\w)")
+_PII_FIELD_RE = re.compile(
+    r"""(?<!\w)(?P<key>['"]?(?:client_)?(?:name|phone)['"]?\s*[:=]\s*)"""
+    r"""(?:(?P<quote>['"])(?P<quoted>.*?)(?P=quote)|(?P<bare>[^\s'",}]+))""",
+    re.IGNORECASE,
+)
+
+
+def _mask_field(match: re.Match[str]) -> str:
+    quote = match.group("quote") or ""
+    value = match.group("quoted") if quote else match.group("bare")
+    if not value:
+        return match.group()
+    return f"{match.group('key')}{quote}***{quote}"
+
+
+def redact(text: str) -> str:
+    """Mask phone numbers (keeping the last 2 digits) and name/phone fields."""
+    text = _PHONE_RE.sub(lambda m: "***" + re.sub(r"\D", "", m.group())[-2:], text)
+    return _PII_FIELD_RE.sub(_mask_field, text)
+
+
+def parse_sampling(raw: str) -> dict[str, float]:
+    """`logger=rate,...` -> {logger: rate}; bad entries are ignored."""
+    rates: dict[str, float] = {}
+    for chunk in raw.split(","):
+        name, _, value = chunk.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            continue
+    return {name: rate for name, rate in rates.items() if name}
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of sub-WARNING records from chatty loggers (and their children)."""
+
+    def __init__(self, rates: Mapping[str, float], rng: random.Random | None = None) -> None:
+        super().__init__()
+        self._rates = dict(rates)
+        self._rng = rng or random.Random()
+
+    def _rate(self, name: str) -> float:
+        while name:
+            if name in self._rates:
+                return self._rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or self._rng.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per logger for INFO/DEBUG; per message template for WARNING and up.
+
+    The next record that gets through carries `suppressed`, the number dropped before it.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_PER_SECOND,
+        burst: float = RATE_BURST,
+        repeat_per_minute: int = REPEAT_PER_MINUTE,
+    ) -> None:
+        super().__init__()
+        self._rate = rate
+        self._burst = burst
+        self._repeat_rate = repeat_per_minute / 60.0
+        self._repeat_burst = float(repeat_per_minute)
+        self._buckets: dict[Any, tuple[float, float]] = {}
+        self._suppressed: dict[Any, int] = {}
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            key: Any = (record.name, record.msg)
+            rate, burst = self._repeat_rate, self._repeat_burst
+        else:
+            key = record.name
+            rate, burst = self._rate, self._burst
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            self.dropped += 1
+            return False
+        self._buckets[key] = (tokens - 1.0, now)
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Never waits for the listener: when the queue is full the record is dropped."""
+
+    def __init__(self, log_queue: queue.Queue[logging.LogRecord]) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like the stdlib version, but keeps the traceback apart from the message so
+        # the listener can put it in its own JSON field.
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact(record.getMessage()),
+            "trace_id": getattr(record, "trace_id", "-"),
+        }
+        for field in ("trace", "suppressed"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        elif record.exc_text:
+            entry["exc"] = redact(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = redact(super().format(record))
+        suppressed = getattr(record, "suppressed", None)
+        return f"{text} (+{suppressed} similar suppressed)" if suppressed else text
+
+
+class LogPipeline:
+    """Owns the queue, its listener thread and the filters, for stats and shutdown."""
+
+    def __init__(
+        self,
+        *,
+        fmt: str = "json",
+        level: int = logging.INFO,
+        sampling: Mapping[str, float] | None = None,
+        rate: float = RATE_PER_SECOND,
+        stream: Any = None,
+    ) -> None:
+        self._queue: queue.Queue[logging.LogRecord] = queue.Queue(QUEUE_SIZE)
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if fmt == "json" else RedactingFormatter(TEXT_FORMAT))
+        self.handler = NonBlockingQueueHandler(self._queue)
+        self.handler.setLevel(level)
+        self.handler.addFilter(TraceLogFilter())
+        self.handler.addFilter(SamplingFilter(sampling or {}))
+        self.rate_limit = RateLimitFilter(rate=rate, burst=max(rate * 4, 1.0))
+        self.handler.addFilter(self.rate_limit)
+        self._listener = logging.handlers.QueueListener(
+            self._queue, output, respect_handler_level=False
+        )
+        self._lock = threading.Lock()
+        self._started = False
+
+    def install(self, root: logging.Logger | None = None) -> None:
+        root = root or logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(self.handler.level)
+        with self._lock:
+            if not self._started:
+                self._listener.start()
+                self._started = True
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the listener thread."""
+        with self._lock:
+            if self._started:
+                self._listener.stop()
+                self._started = False
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "dropped_full": self.handler.dropped,
+            "dropped_rate": self.rate_limit.dropped,
+        }
+
+
+def setup_logging(settings: Settings) -> LogPipeline:
+    level = logging.getLevelName(settings.log_level)
+    pipeline = LogPipeline(
+        fmt=settings.log_format,
+        level=level if isinstance(level, int) else logging.INFO,
+        sampling=parse_sampling(settings.log_sampling),
+        rate=settings.log_rate_per_second,
+    )
+    pipeline.install()
+    return pipeline
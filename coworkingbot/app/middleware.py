@@ -1,11 +1,33 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
 from collections.abc import Awaitable, Callable
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from aiogram import BaseMiddleware
+from aiogram import BaseMiddleware, Bot
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Update
 
 from coworkingbot.app.context import AppContext
+from coworkingbot.app.update_queue import LATEST_WINS, LatestWins, UpdateScheduler, event_key
+from coworkingbot.services.callback_answers import CallbackAnswers
+from coworkingbot.services.tracing import Trace, current_trace, log_summary, new_trace_id, traced
+
+if TYPE_CHECKING:
+    from coworkingbot.services.metrics import BotMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def _handler_callback(data: dict[str, Any]) -> Any:
+    """The function that takes the event; for table callbacks, the routed handler."""
+    route = data.get("callback_route")
+    if route is not None:
+        return route.callback
+    return getattr(data.get("handler"), "callback", None)
 
 
 class ContextMiddleware(BaseMiddleware):
@@ -21,3 +43,180 @@ class ContextMiddleware(BaseMiddleware):
     ) -> Any:
         data["ctx"] = self._ctx
         return await handler(event, data)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer update middleware: total processing time per update type."""
+
+    def __init__(self, metrics: BotMetrics) -> None:
+        super().__init__()
+        self._metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        started = time.monotonic()
+        failed = True
+        try:
+            result = await handler(event, data)
+            failed = False
+            return result
+        finally:
+            event_type = getattr(event, "event_type", None) or "unknown"
+            self._metrics.observe_update(event_type, time.monotonic() - started, failed)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: run time of the handler that matched, by router module."""
+
+    def __init__(self, metrics: BotMetrics) -> None:
+        super().__init__()
+        self._metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        callback = _handler_callback(data)
+        router = getattr(callback, "__module__", "unknown").rsplit(".", 1)[-1]
+        name = getattr(callback, "__name__", "unknown")
+        started = time.monotonic()
+        failed = True
+        try:
+            result = await handler(event, data)
+            failed = False
+            return result
+        finally:
+            self._metrics.observe_handler(router, name, time.monotonic() - started, failed)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Outer update middleware: one trace per update and one summary line when it is done."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        trace = Trace(
+            trace_id=new_trace_id(),
+            update_id=getattr(event, "update_id", None),
+            user_id=user.id if user is not None else None,
+            event=getattr(event, "event_type", None) or "unknown",
+        )
+        failed = True
+        with traced(trace):
+            try:
+                result = await handler(event, data)
+                failed = False
+                return result
+            finally:
+                log_summary(trace, failed)
+
+
+class TraceHandlerMiddleware(BaseMiddleware):
+    """Inner middleware: records which handler took the update."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        trace = current_trace()
+        callback = _handler_callback(data)
+        if trace is not None and callback is not None:
+            trace.handler = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+        return await handler(event, data)
+
+
+class CallbackAckMiddleware(BaseMiddleware):
+    """Outer callback_query middleware: stops the button spinner while slow handlers run.
+
+    A handler that has not answered within `deadline` seconds gets an empty answer
+    sent for it in the background; one that never answers gets it when it returns.
+    With `arrived` as an arrival hook of `ScheduledDispatcher`, the deadline counts
+    from the update's arrival, not from the end of the chat's previous update.
+    Its own later `callback.answer()` is dropped by `CallbackAnswerDedupe`, or sent
+    as a message if it is an alert.
+    """
+
+    def __init__(self, answers: CallbackAnswers, deadline: float) -> None:
+        super().__init__()
+        self._answers = answers
+        self._deadline = deadline
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+
+    def arrived(self, bot: Bot, update: Update) -> None:
+        query = update.callback_query
+        if query is not None and query.id not in self._timers:
+            self._timers[query.id] = self._start_timer(bot, query)
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        bot = data.get("bot")
+        if not isinstance(event, CallbackQuery) or bot is None:
+            return await handler(event, data)
+        timer = self._timers.pop(event.id, None) or self._start_timer(bot, event)
+        try:
+            return await handler(event, data)
+        finally:
+            timer.cancel()
+            if not self._answers.answered(event.id):
+                await self._ack(bot, event.id)
+
+    def _start_timer(self, bot: Bot, query: CallbackQuery) -> asyncio.TimerHandle:
+        chat = query.message.chat if query.message is not None else query.from_user
+        self._answers.remember_chat(query.id, chat.id)
+        return asyncio.get_running_loop().call_later(
+            self._deadline, self._ack_in_background, bot, query.id
+        )
+
+    def _ack_in_background(self, bot: Bot, query_id: str) -> None:
+        self._timers.pop(query_id, None)
+        if self._answers.answered(query_id):
+            return
+        task = asyncio.create_task(self._ack(bot, query_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _ack(self, bot: Bot, query_id: str) -> None:
+        try:
+            await bot.answer_callback_query(query_id)
+        except TelegramAPIError as exc:
+            logger.debug("Could not acknowledge callback %s: %s", query_id, exc)
+
+
+class LatestWinsMiddleware(BaseMiddleware):
+    """Inner middleware: handlers flagged `latest_wins` give way to the chat's next update.
+
+    Every handler can also ask for a `latest_wins` argument to run just a lookup that way.
+    """
+
+    def __init__(self, scheduler: UpdateScheduler) -> None:
+        super().__init__()
+        self._scheduler = scheduler
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        key = event_key(data)
+        data[LATEST_WINS] = LatestWins(self._scheduler, key)
+        if not get_flag(data, LATEST_WINS):
+            return await handler(event, data)
+        return await self._scheduler.run_latest_wins(key, lambda: handler(event, data))
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+STATE_TTL_SECONDS = 24 * 60 * 60
+FLUSH_INTERVAL_SECONDS = 1.0
+HOT_CACHE_SIZE = 1000
+PURGE_INTERVAL_SECONDS = 10 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fsm_updated_at ON fsm (updated_at);
+"""
+
+
+@dataclass
+class _Record:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    updated_at: float = 0.0
+
+    def is_empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+def _storage_key(key: StorageKey) -> str:
+    return ":".join(
+        str(part if part is not None else "")
+        for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id,
+            key.business_connection_id,
+            key.destiny,
+        )
+    )
+
+
+class SqliteStorage(BaseStorage):
+    """FSM storage that survives restarts.
+
+    Reads and writes hit a bounded in-process cache; dirty records are written to
+    SQLite in one transaction per `flush_interval`, so a burst of updates costs one
+    fsync. After startup, cache misses and flushes touch SQLite in a worker thread,
+    never on the loop; `stats` and `state_counts` report what the last flush counted.
+    States untouched for `ttl` seconds are treated as abandoned and purged.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        ttl: float = STATE_TTL_SECONDS,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        cache_size: int = HOT_CACHE_SIZE,
+    ) -> None:
+        self._path = Path(path)
+        self._ttl = ttl
+        self._flush_interval = flush_interval
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, _Record] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._stored = 0
+        self._state_counts: dict[str, int] = {}
+        with self._lock:
+            self._count()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._load(_storage_key(key))
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(_storage_key(key), record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(_storage_key(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = await self._load(_storage_key(key))
+        record.data = dict(data)
+        self._touch(_storage_key(key), record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._load(_storage_key(key))).data)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        with self._lock:
+            self._conn.close()
+
+    async def flush(self) -> None:
+        """Write every dirty record in one transaction (off the event loop)."""
+        keys, self._dirty = self._dirty, set()
+        upserts, deletes = self._snapshot(keys)
+        now = time.time()
+        purge = (now - self._last_purge) >= PURGE_INTERVAL_SECONDS
+        if not upserts and not deletes and not purge:
+            return
+        try:
+            await asyncio.to_thread(
+                self._write, upserts, deletes, now - self._ttl if purge else None
+            )
+        except sqlite3.Error as exc:
+            logger.error("Failed to flush FSM storage %s: %s", self._path, exc)
+            self._dirty |= keys
+            return
+        if purge:
+            self._last_purge = now
+
+    def stats(self) -> dict[str, int]:
+        return {"cached": len(self._cache), "dirty": len(self._dirty), "stored": self._stored}
+
+    def state_counts(self) -> dict[str, int]:
+        """Live records per FSM state, as of the last flush."""
+        return dict(self._state_counts)
+
+    def _expired(self, record: _Record) -> bool:
+        return (time.time() - record.updated_at) > self._ttl
+
+    async def _load(self, skey: str) -> _Record:
+        record = self._cache.get(skey)
+        if record is None:
+            row = await asyncio.to_thread(self._read, skey)
+            # A write to the same key may have been cached while the row was read.
+            record = self._cache.get(skey)
+            if record is None:
+                if row is None:
+                    return _Record()
+                record = _Record(state=row[0], data=json.loads(row[1]), updated_at=row[2])
+        self._remember(skey, record)
+        if self._expired(record):
+            return _Record()
+        return _Record(state=record.state, data=dict(record.data), updated_at=record.updated_at)
+
+    def _read(self, skey: str) -> tuple[str | None, str, float] | None:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT state, data, updated_at FROM fsm WHERE key = ?", (skey,)
+            ).fetchone()
+
+    def _touch(self, skey: str, record: _Record) -> None:
+        record.updated_at = time.time()
+        self._remember(skey, record)
+        self._dirty.add(skey)
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    def _remember(self, skey: str, record: _Record) -> None:
+        self._cache[skey] = record
+        self._cache.move_to_end(skey)
+        if len(self._cache) <= self._cache_size:
+            return
+        # Dirty records stay until flushed; everything else is cheap to reload.
+        for candidate in list(self._cache):
+            if len(self._cache) <= self._cache_size:
+                break
+            if candidate not in self._dirty:
+                del self._cache[candidate]
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(self._flush_interval)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    def _snapshot(
+        self, keys: set[str]
+    ) -> tuple[list[tuple[str, str | None, str, float]], list[tuple[str]]]:
+        upserts: list[tuple[str, str | None, str, float]] = []
+        deletes: list[tuple[str]] = []
+        for skey in keys:
+            record = self._cache.get(skey)
+            if record is None:
+                continue
+            if record.is_empty():
+                deletes.append((skey,))
+            else:
+                data = json.dumps(record.data, ensure_ascii=False, default=str)
+                upserts.append((skey, record.state, data, record.updated_at))
+        return upserts, deletes
+
+    def _write(
+        self,
+        upserts: list[tuple[str, str | None, str, float]],
+        deletes: list[tuple[str]],
+        purge_before: float | None,
+    ) -> None:
+        with self._lock, self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                    upserts,
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+            if purge_before is not None:
+                self._conn.execute("DELETE FROM fsm WHERE updated_at < ?", (purge_before,))
+            self._count()
+
+    def _count(self) -> None:
+        # Called with the lock held, at startup and by `_write` in the flush thread.
+        (self._stored,) = self._conn.execute("SELECT COUNT(*) FROM fsm").fetchone()
+        rows = self._conn.execute(
+            "SELECT state, COUNT(*) FROM fsm WHERE state IS NOT NULL AND updated_at >= ? "
+            "GROUP BY state",
+            (time.time() - self._ttl,),
+        ).fetchall()
+        self._state_counts = dict(rows)
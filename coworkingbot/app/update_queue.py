@@ -0,0 +1,225 @@
+"""Per-chat ordering of updates with a shared concurrency limit.
+
+Polling and the webhook both start a task per update, so two taps on the same
+button used to run their handlers side by side: both read the FSM state before
+either changed it, and both called `create_booking`. `UpdateScheduler` runs the
+updates of one chat one after another, in the order they arrived, and lets
+different chats run concurrently up to `max_concurrency` handlers at once.
+
+The wait happens in `Dispatcher.feed_update`, before aiogram's own middlewares
+read the FSM state, so a queued update sees the state its predecessor left.
+Arrival hooks run before the wait, for work that must not queue behind the
+chat's earlier updates (the callback ack timer).
+
+Handlers registered with `flags={"latest_wins": True}` (read-only screens such
+as "my bookings") give way to the chat's next update instead of holding it up:
+if a newer update is already queued they are skipped, and if one arrives while
+they run they are cancelled together with their GAS request. Only use the flag
+on handlers that may stop at any `await` without harm. Handlers that change the
+FSM state take a `latest_wins: LatestWins` argument instead and pass only their
+lookup through it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LATEST_WINS = "latest_wins"
+
+
+class _ChatQueue:
+    __slots__ = ("depth", "latest_wins", "lock", "superseded")
+
+    def __init__(self) -> None:
+        # asyncio.Lock wakes waiters first in, first out.
+        self.lock = asyncio.Lock()
+        self.depth = 0
+        # The running `latest_wins` handler, and the one a newer update cancelled.
+        self.latest_wins: asyncio.Future[Any] | None = None
+        self.superseded: asyncio.Future[Any] | None = None
+
+    def supersede(self) -> None:
+        if self.latest_wins is not None:
+            self.superseded, self.latest_wins = self.latest_wins, None
+            self.superseded.cancel()
+
+
+def chat_key(update: Update) -> int | None:
+    """The chat an update belongs to (the user for chat-less updates), if any."""
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.chat is not None:
+        return context.chat.id
+    if context.user is not None:
+        return context.user.id
+    return None
+
+
+def event_key(data: dict[str, Any]) -> int | None:
+    """`chat_key` for middlewares, from the context aiogram put in `data`."""
+    chat = data.get("event_chat")
+    if chat is not None:
+        return chat.id
+    user = data.get("event_from_user")
+    return user.id if user is not None else None
+
+
+class LatestWins:
+    """Runs one lookup of the current update the way the `latest_wins` flag runs a handler.
+
+    Handlers get it as their `latest_wins` argument; a result of None means a
+    newer update of the chat superseded the lookup. The default instance, used
+    when no scheduler is set up, just runs the lookup.
+    """
+
+    __slots__ = ("_key", "_scheduler")
+
+    def __init__(self, scheduler: UpdateScheduler | None = None, key: int | None = None) -> None:
+        self._scheduler = scheduler
+        self._key = key
+
+    async def __call__(self, call: Callable[[], Awaitable[T]]) -> T | None:
+        if self._scheduler is None:
+            return await call()
+        return await self._scheduler.run_latest_wins(self._key, call)
+
+
+RUN_TO_END = LatestWins()
+
+
+class UpdateScheduler:
+    """Runs calls with the same key in arrival order, at most `max_concurrency` at once.
+
+    The depth of a chat counts its updates that are waiting or running; chats
+    with nothing left are forgotten.
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._chats: dict[int, _ChatQueue] = {}
+        self._total = 0
+        self._running = 0
+        self.superseded = 0
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def depths(self) -> dict[int, int]:
+        return {key: chat.depth for key, chat in self._chats.items()}
+
+    def depth(self, key: int) -> int:
+        chat = self._chats.get(key)
+        return chat.depth if chat is not None else 0
+
+    async def run(
+        self,
+        key: int | None,
+        call: Callable[[], Awaitable[T]],
+        on_wait: Callable[[], None] | None = None,
+    ) -> T:
+        """Run `call` after the earlier calls with `key`; `on_wait` is called if it has to wait."""
+        self._total += 1
+        if key is None:
+            try:
+                return await self._run_in_slot(call)
+            finally:
+                self._total -= 1
+
+        chat = self._chats.get(key)
+        if chat is None:
+            chat = self._chats[key] = _ChatQueue()
+        chat.depth += 1
+        chat.supersede()
+        try:
+            if on_wait is not None and chat.lock.locked():
+                on_wait()
+            async with chat.lock:
+                return await self._run_in_slot(call)
+        finally:
+            chat.depth -= 1
+            self._total -= 1
+            if not chat.depth:
+                del self._chats[key]
+
+    async def run_latest_wins(self, key: int | None, call: Callable[[], Awaitable[T]]) -> T | None:
+        """Run the handler of the chat's current update unless a newer update supersedes it.
+
+        Meant to be called from within `run` for the same key. Returns None
+        without calling when a newer update of the chat is already waiting, and
+        when one arrives before `call` finishes.
+        """
+        chat = self._chats.get(key) if key is not None else None
+        if chat is None:
+            return await call()
+        if chat.depth > 1:
+            self.superseded += 1
+            logger.debug("Skipped an update of chat %s: a newer one is waiting", key)
+            return None
+
+        task = asyncio.ensure_future(call())
+        chat.latest_wins = task
+        try:
+            return await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if chat.superseded is not task or (current is not None and current.cancelling()):
+                raise
+            self.superseded += 1
+            logger.debug("Cancelled an update of chat %s: a newer one arrived", key)
+            return None
+        finally:
+            if chat.latest_wins is task:
+                chat.latest_wins = None
+            if chat.superseded is task:
+                chat.superseded = None
+
+    async def _run_in_slot(self, call: Callable[[], Awaitable[T]]) -> T:
+        async with self._slots:
+            self._running += 1
+            try:
+                return await call()
+            finally:
+                self._running -= 1
+
+
+class ScheduledDispatcher(Dispatcher):
+    """Dispatcher whose updates go through an `UpdateScheduler`, keyed by chat.
+
+    `arrival_hooks` are called with each update as it arrives, before it waits
+    for the chat's earlier updates; `on_wait` is called if it has to wait.
+    """
+
+    def __init__(self, *, scheduler: UpdateScheduler, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+        self.arrival_hooks: list[Callable[[Bot, Update], None]] = []
+
+    async def feed_update(
+        self,
+        bot: Bot,
+        update: Update,
+        *,
+        on_wait: Callable[[], None] | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        for hook in self.arrival_hooks:
+            hook(bot, update)
+        feed = functools.partial(super().feed_update, bot, update, **kwargs)
+        return await self.scheduler.run(chat_key(update), feed, on_wait)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import signal
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from coworkingbot.app.context import Settings
+from coworkingbot.app.update_queue import ScheduledDispatcher
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# systemd sends SIGKILL after TimeoutStopSec (90 s by default); finish well before that.
+DRAIN_TIMEOUT_SECONDS = 30
+
+
+class WebhookHandler:
+    """Accept Telegram updates over HTTP and process them in background tasks.
+
+    At most `max_concurrency` updates are handled at once; further requests wait for
+    a free slot before they are acknowledged, which pushes back on Telegram instead
+    of piling up tasks. With a `ScheduledDispatcher` an update gives its slot back
+    when it has to wait for the same chat's earlier updates, so one busy chat does
+    not hold up the others. After `close()` new updates get 503 and Telegram
+    redelivers them to whichever instance is up next.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, *, secret: str, max_concurrency: int) -> None:
+        self._bot = bot
+        self._dp = dp
+        self._secret = secret
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self._closing = False
+
+    @property
+    def inflight(self) -> int:
+        return len(self._tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), self._secret.encode()):
+            return web.Response(status=401)
+        if self._closing:
+            return web.Response(status=503)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        await self._slots.acquire()
+        if self._closing:
+            self._slots.release()
+            return web.Response(status=503)
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: dict[str, Any]) -> None:
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._slots.release()
+
+        try:
+            if isinstance(self._dp, ScheduledDispatcher):
+                await self._dp.feed_raw_update(self._bot, update, on_wait=release)
+            else:
+                await self._dp.feed_raw_update(self._bot, update)
+        except Exception as exc:
+            logger.exception("Webhook update %s failed: %s", update.get("update_id"), exc)
+        finally:
+            release()
+
+    def close(self) -> None:
+        self._closing = True
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> None:
+        """Wait for in-flight handlers; cancel whatever is still running after `timeout`."""
+        self.close()
+        if not self._tasks:
+            return
+        logger.info("Waiting for %s in-flight updates", len(self._tasks))
+        _done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Cancelled %s updates still running after %ss", len(pending), timeout)
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def build_webhook_app(handler: WebhookHandler, path: str) -> web.Application:
+    app = web.Application()
+    app.router.add_post(path, handler.handle)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, settings: Settings) -> None:
+    handler = WebhookHandler(
+        bot,
+        dp,
+        secret=settings.webhook_secret,
+        max_concurrency=settings.webhook_max_concurrency,
+    )
+    runner = web.AppRunner(build_webhook_app(handler, settings.webhook_path), handle_signals=False)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    try:
+        await dp.emit_startup(bot=bot, **workflow_data)
+        await runner.setup()
+        await web.TCPSite(runner, settings.webhook_host, settings.webhook_port).start()
+        # Unlike polling, keep updates that queued up at Telegram while we were down.
+        await bot.set_webhook(
+            settings.webhook_url,
+            secret_token=settings.webhook_secret,
+            max_connections=settings.webhook_max_concurrency,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False,
+        )
+        logger.info(
+            "Webhook listening on %s:%s%s",
+            settings.webhook_host,
+            settings.webhook_port,
+            settings.webhook_path,
+        )
+        await stop.wait()
+        logger.info("Stopping webhook, draining in-flight updates...")
+        await handler.drain()
+    finally:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(sig)
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+        await bot.session.close()
@@ -1,9 +1,22 @@
 import os
+from functools import lru_cache
+from typing import Any
 
 from aiogram import Bot
 
-# Для тестов/импортов подставляем валидный по формату токен-заглушку,
-# если переменная окружения BOT_TOKEN не задана.
-BOT_TOKEN = os.getenv("BOT_TOKEN", "123456:TESTTOKEN")
 
-bot = Bot(token=BOT_TOKEN)
+@lru_cache(maxsize=1)
+def get_bot() -> Bot:
+    # Для тестов/импортов подставляем валидный по формату токен-заглушку,
+    # если переменная окружения BOT_TOKEN не задана.
+    return Bot(token=os.getenv("BOT_TOKEN", "123456:TESTTOKEN"))
+
+
+def __getattr__(name: str) -> Any:
+    # `from coworkingbot.bot import bot` still works, but the Bot (and its HTTP
+    # session) is only created when someone asks for it, not on import.
+    if name == "bot":
+        return get_bot()
+    if name == "BOT_TOKEN":
+        return os.getenv("BOT_TOKEN", "123456:TESTTOKEN")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
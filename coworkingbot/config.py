@@ -1,4 +1,10 @@
+"""Legacy module-level settings, read from the environment when first accessed.
+
+New code takes `Settings` from `coworkingbot.app.context.load_settings()`.
+"""
+
 import os
+from typing import Any
 
 ENV_FILE_HINT = "/etc/default/coworking-bot"
 
@@ -24,8 +30,17 @@ def _get_int_list(name: str) -> list[int]:
     return output
 
 
-BOT_TOKEN = _get("BOT_TOKEN")
-GAS_WEBAPP_URL = _get("GAS_WEBAPP_URL")
-API_TOKEN = _get("API_TOKEN")
-ADMIN_IDS = _get_int_list("ADMIN_IDS")
-TZ = _get("TZ", "Europe/Moscow")
+_SETTINGS = {
+    "BOT_TOKEN": lambda: _get("BOT_TOKEN"),
+    "GAS_WEBAPP_URL": lambda: _get("GAS_WEBAPP_URL"),
+    "API_TOKEN": lambda: _get("API_TOKEN"),
+    "ADMIN_IDS": lambda: _get_int_list("ADMIN_IDS"),
+    "TZ": lambda: _get("TZ", "Europe/Moscow"),
+}
+
+
+def __getattr__(name: str) -> Any:
+    # Importing this module must not depend on the environment being loaded yet.
+    if name in _SETTINGS:
+        return _SETTINGS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
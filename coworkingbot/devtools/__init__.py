@@ -0,0 +1 @@
+"""Developer tooling: fake backends and load/benchmark harnesses (not used in production)."""
@@ -0,0 +1,306 @@
+"""Microbenchmarks for helpers that run on every relevant update.
+
+Each benchmark is timed with `timeit` (median of several autoranged runs) and
+its peak allocation per call is taken with `tracemalloc`. Results are compared
+against `benchmarks/baseline.json`; the run fails when a benchmark gets slower
+or allocates more than the margins stored there (or given on the command line).
+
+    python -m coworkingbot.devtools.bench            # compare, exit 1 on regression
+    python -m coworkingbot.devtools.bench --update   # rewrite the baseline
+
+Absolute timings depend on the machine, so the gate compares each benchmark
+relative to a fixed pure-Python calibration loop timed in the same run. The
+ratio still moves a little between interpreter versions: record the baseline
+with the Python that CI uses. Allocation sizes are stable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import pytz
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import CallbackQuery, User
+
+from coworkingbot.keyboards.main import main_menu_keyboard
+from coworkingbot.routers import admin, booking, errors, help, start
+from coworkingbot.routers.booking import (
+    _build_my_bookings_keyboard,
+    format_my_bookings,
+    format_phone,
+    format_reviews_for_telegram,
+    parse_date,
+    validate_phone,
+)
+from coworkingbot.services.common import is_past_booking
+
+BASELINE_PATH = Path(__file__).resolve().parents[2] / "benchmarks" / "baseline.json"
+DEFAULT_TIME_MARGIN = 0.5
+DEFAULT_ALLOC_MARGIN = 0.1
+# Allocation noise below this many bytes (interned strings, freelists) is ignored.
+ALLOC_SLACK_BYTES = 256
+REPEAT = 5
+
+
+@dataclass(frozen=True)
+class _BenchCtx:
+    tz: pytz.tzinfo.BaseTzInfo
+
+
+def _bookings(count: int) -> list[dict[str, Any]]:
+    today = datetime.now()
+    rows = []
+    for i in range(count):
+        day = today + timedelta(days=i - count // 2)
+        rows.append(
+            {
+                "id": f"ID_{i}",
+                "date": day.strftime("%d.%m.%Y"),
+                "time": "10:00-12:00",
+                "price": 500,
+                "status": "Оплачено" if i % 2 else "Не оплачено",
+            }
+        )
+    return rows
+
+
+def _reviews(count: int) -> dict[str, Any]:
+    return {
+        "status": "success",
+        "count": count,
+        "average_rating": 4.6,
+        "reviews": [
+            {
+                "rating": 5 - i % 2,
+                "client_name": f"Гость {i}",
+                "review_text": "Тихо, быстрый интернет, удобные кресла. " * (1 + i % 2),
+                "review_date": "12.10.2026 18:40",
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def _callback_router(data: str) -> Callable[[], HandlerObject | None]:
+    """Find the handler for a callback the way the dispatcher does, without running it."""
+    routers: tuple[Router, ...] = (
+        start.router,
+        help.router,
+        booking.router,
+        admin.router,
+        errors.router,
+    )
+    query = CallbackQuery(
+        id="1",
+        from_user=User(id=1, is_bot=False, first_name="Bench"),
+        chat_instance="ci",
+        data=data,
+    )
+
+    async def resolve() -> HandlerObject | None:
+        for router in routers:
+            for handler in router.callback_query.handlers:
+                matched, _ = await handler.check(query)
+                if matched:
+                    return handler
+        return None
+
+    loops: list[asyncio.AbstractEventLoop] = []
+
+    def run_sync() -> HandlerObject | None:
+        # aiogram runs plain (non-async) filters such as F.data in a worker thread,
+        # so this needs a real loop; one is kept per benchmark.
+        if not loops:
+            loops.append(asyncio.new_event_loop())
+        return loops[0].run_until_complete(resolve())
+
+    return run_sync
+
+
+def _calibration() -> object:
+    """Fixed interpreter work (dict, str, int and sort) that every timing is divided by."""
+    totals: dict[str, int] = {}
+    for i in range(200):
+        key = f"slot-{i % 17}"
+        totals[key] = totals.get(key, 0) + i
+    return sorted(totals.items())
+
+
+def _machine() -> str:
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as cpuinfo:
+            cpu = next(
+                (
+                    line.split(":", 1)[1].strip()
+                    for line in cpuinfo
+                    if line.startswith("model name")
+                ),
+                cpu,
+            )
+    except OSError:
+        pass
+    return f"{platform.system()} {platform.machine()}, {cpu or 'unknown CPU'}"
+
+
+def _benchmarks() -> dict[str, Callable[[], object]]:
+    ctx = _BenchCtx(pytz.timezone("Europe/Moscow"))
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y")
+    bookings = _bookings(10)
+    reviews = _reviews(8)
+    return {
+        "validate_phone": lambda: validate_phone("+7 (999) 123-45-67"),
+        "format_phone": lambda: format_phone("8 999 123 45 67"),
+        "parse_date": lambda: parse_date(ctx, tomorrow),
+        "is_past_booking": lambda: is_past_booking(ctx, "01.10.2026"),
+        "format_reviews_for_telegram": lambda: format_reviews_for_telegram(reviews),
+        "build_my_bookings_keyboard": lambda: _build_my_bookings_keyboard(bookings),
+        "main_menu_keyboard": main_menu_keyboard,
+        "format_my_bookings": lambda: format_my_bookings(ctx, bookings, "coworking_bot"),
+        "callback_dispatch_admin": _callback_router("confirm_REC-1"),
+        "callback_dispatch_booking": _callback_router("booking_cancel:REC-1"),
+    }
+
+
+BENCHMARK_NAMES = tuple(_benchmarks())
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2) -> dict[str, float]:
+    """Median ns per call over `REPEAT` runs of at least `min_time` s, plus peak bytes."""
+    func()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(int(number * min_time / 0.2), 1)
+    runs = [timer.timeit(number) / number for _ in range(REPEAT)]
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ns_per_call": round(statistics.median(runs) * 1e9, 1), "peak_bytes": peak - before}
+
+
+def calibrate(min_time: float = 0.2) -> float:
+    """ns per call of the calibration loop on this machine and interpreter."""
+    return measure(_calibration, min_time)["ns_per_call"]
+
+
+def run(
+    names: tuple[str, ...] = BENCHMARK_NAMES,
+    min_time: float = 0.2,
+    calibration_ns: float | None = None,
+) -> dict[str, dict]:
+    """Measure `names`; `relative` is ns per call in units of the calibration loop."""
+    if calibration_ns is None:
+        calibration_ns = calibrate(min_time)
+    benchmarks = _benchmarks()
+    results = {}
+    for name in names:
+        result = measure(benchmarks[name], min_time)
+        result["relative"] = round(result["ns_per_call"] / calibration_ns, 3)
+        results[name] = result
+    return results
+
+
+def compare(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    time_margin: float = DEFAULT_TIME_MARGIN,
+    alloc_margin: float = DEFAULT_ALLOC_MARGIN,
+) -> list[str]:
+    """Human-readable regressions; an empty list means the run passes."""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            problems.append(f"{name}: no baseline (run with --update)")
+            continue
+        if result["relative"] > base["relative"] * (1 + time_margin):
+            problems.append(
+                f"{name}: {result['relative']:.2f}x calibration vs baseline "
+                f"{base['relative']:.2f}x (+{time_margin:.0%} allowed)"
+            )
+        allowed = base["peak_bytes"] * (1 + alloc_margin) + ALLOC_SLACK_BYTES
+        if result["peak_bytes"] > allowed:
+            problems.append(
+                f"{name}: {result['peak_bytes']} peak bytes/call vs baseline "
+                f"{base['peak_bytes']} (+{alloc_margin:.0%} allowed)"
+            )
+    return problems
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> dict[str, Any]:
+    if not path.exists():
+        return {"benchmarks": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    parser.add_argument("--update", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--only", nargs="*", choices=BENCHMARK_NAMES, default=None)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    parser.add_argument("--time-margin", type=float, default=None)
+    parser.add_argument("--alloc-margin", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    time_margin = args.time_margin
+    if time_margin is None:
+        time_margin = baseline.get("time_margin", DEFAULT_TIME_MARGIN)
+    alloc_margin = args.alloc_margin
+    if alloc_margin is None:
+        alloc_margin = baseline.get("alloc_margin", DEFAULT_ALLOC_MARGIN)
+
+    calibration_ns = calibrate(args.min_time)
+    print(f"{'calibration':<30}{calibration_ns:>12.0f} ns")
+    results = run(tuple(args.only or BENCHMARK_NAMES), args.min_time, calibration_ns)
+    for name, result in results.items():
+        base = baseline["benchmarks"].get(name, {})
+        print(
+            f"{name:<30}{result['ns_per_call']:>12.0f} ns{result['relative']:>9.3f}x"
+            f"{result['peak_bytes']:>10} B"
+            f"   (baseline {base.get('relative', '-')}x, {base.get('peak_bytes', '-')} B)"
+        )
+
+    if args.update:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        merged = {**baseline["benchmarks"], **results}
+        payload = {
+            "time_margin": time_margin,
+            "alloc_margin": alloc_margin,
+            "python": sys.version.split()[0],
+            "machine": _machine(),
+            "calibration_ns": calibration_ns,
+            "benchmarks": dict(sorted(merged.items())),
+        }
+        args.baseline.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    problems = compare(results, baseline["benchmarks"], time_margin, alloc_margin)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+"""In-memory stand-in for the Apps Script web app, for offline tests and benchmarks.
+
+Implements every action the bot sends (see `ACTIONS`) with the reply shapes the
+routers read, plus `batch`. Latency, error rate and cold starts are injected per
+`FaultProfile`, so GAS incidents can be reproduced on a laptop:
+
+    python -m coworkingbot.devtools.fake_gas --port 8081 --latency-ms 400 --p99-ms 2500 \\
+        --error-rate 0.02 --cold-start-ms 4000
+
+Point the bot at it with `GAS_WEBAPP_URL=http://127.0.0.1:8081/exec API_TOKEN=dev`.
+`GET /stats` returns per-action call counts and the injected faults.
+
+Writes are deduplicated by `idempotency_key` the way the Apps Script should do
+it: a known key gets the stored reply back with `"replayed": true`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import time
+from collections import Counter, deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytz
+from aiohttp import web
+
+from coworkingbot.services.gas_idempotency import IDEMPOTENCY_FIELD, REPLAYED_FIELD
+
+DEFAULT_SLOT_GRID = (
+    "10:00-12:00",
+    "12:00-14:00",
+    "14:00-16:00",
+    "16:00-18:00",
+    "18:00-20:00",
+    "20:00-22:00",
+)
+SLOT_PRICE = 500
+PAID = "Оплачено"
+UNPAID = "Не оплачено"
+
+
+@dataclass
+class FaultProfile:
+    """Latency is log-normal with the given median and p99; errors are HTTP 500s.
+
+    A request that arrives after `cold_idle_seconds` without traffic pays
+    `cold_start_ms` extra, like an Apps Script container spinning up.
+    With `lost_reply_rate`, a request is carried out but answered with a 500, as
+    when the reply times out after GAS has written.
+    """
+
+    latency_ms: float = 0.0
+    p99_ms: float = 0.0
+    error_rate: float = 0.0
+    lost_reply_rate: float = 0.0
+    cold_start_ms: float = 0.0
+    cold_idle_seconds: float = 300.0
+    per_action_latency_ms: dict[str, float] = field(default_factory=dict)
+
+    def sample_latency(self, action: str, rng: random.Random) -> float:
+        median = self.per_action_latency_ms.get(action, self.latency_ms)
+        if median <= 0:
+            return 0.0
+        p99 = max(self.p99_ms, median)
+        # p99 of a log-normal is median * exp(2.326 * sigma).
+        sigma = math.log(p99 / median) / 2.326 if p99 > median else 0.0
+        return median * math.exp(rng.gauss(0.0, sigma)) / 1000.0
+
+
+class FakeGasStore:
+    """Bookings, exceptions, settings, bans and reviews kept in memory."""
+
+    def __init__(self, tz: pytz.tzinfo.BaseTzInfo, slot_grid: tuple[str, ...]) -> None:
+        self.tz = tz
+        self.slot_grid = list(slot_grid)
+        self.bookings: dict[str, dict[str, Any]] = {}
+        self.exceptions: list[dict[str, str]] = []
+        self.settings: dict[str, Any] = {
+            "rules_text": "Тишина в зале, еда только на кухне.",
+            "booking_limit": 3,
+            "time_windows": "10:00-22:00",
+            "auto_cancel_minutes": 60,
+        }
+        self.banned: set[int] = set()
+        self.reviews: list[dict[str, Any]] = []
+        self.changes: list[dict[str, Any]] = []
+        self._ids = itertools.count(1)
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def new_id(self, prefix: str = "ID") -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def log_change(self, booking: dict[str, Any]) -> None:
+        self.changes.append(dict(booking))
+
+    def active(self) -> list[dict[str, Any]]:
+        return [b for b in self.bookings.values() if not b.get("deleted")]
+
+    def on_date(self, date_str: str) -> list[dict[str, Any]]:
+        return sorted((b for b in self.active() if b["date"] == date_str), key=lambda b: b["time"])
+
+    def closed_slots(self, date_str: str) -> set[str] | None:
+        """Closed slots of a date, or None when the whole date is closed."""
+        closed: set[str] = set()
+        for item in self.exceptions:
+            if item["date"] != date_str:
+                continue
+            if not item.get("slot"):
+                return None
+            closed.add(item["slot"])
+        return closed
+
+
+def _parse_date(date_str: str) -> datetime | None:
+    try:
+        return datetime.strptime((date_str or "").strip(), "%d.%m.%Y")
+    except ValueError:
+        return None
+
+
+def _ok(**fields: Any) -> dict[str, Any]:
+    return {"status": "success", **fields}
+
+
+def _error(message: str) -> dict[str, Any]:
+    return {"status": "error", "message": message}
+
+
+class FakeGasActions:
+    def __init__(self, store: FakeGasStore) -> None:
+        self.store = store
+
+    # --- slots and bookings --------------------------------------------------
+
+    def get_free_slots(self, payload: dict[str, Any]) -> dict[str, Any]:
+        date_str = str(payload.get("date", ""))
+        day = _parse_date(date_str)
+        if day is None:
+            return _error("Некорректная дата")
+        closed = self.store.closed_slots(date_str)
+        if closed is None:
+            return _ok(free_slots=[])
+        taken = {b["time"] for b in self.store.on_date(date_str)}
+        free = [slot for slot in self.store.slot_grid if slot not in taken and slot not in closed]
+        current = self.store.now()
+        if day.date() == current.date():
+            free = [slot for slot in free if slot.split("-", 1)[0] > current.strftime("%H:%M")]
+        return _ok(free_slots=free)
+
+    def get_busy_slots(self, payload: dict[str, Any]) -> dict[str, Any]:
+        busy = [
+            {"time": b["time"], "name": b["name"], "status": "YES" if b["paid"] else "NO"}
+            for b in self.store.on_date(str(payload.get("date", "")))
+        ]
+        return _ok(busy_slots=busy)
+
+    def create_booking(self, payload: dict[str, Any]) -> dict[str, Any]:
+        date_str = str(payload.get("date", ""))
+        slot = str(payload.get("time", ""))
+        user_id = str(payload.get("user_id", ""))
+        if user_id.isdigit() and int(user_id) in self.store.banned:
+            return _error("Пользователь заблокирован")
+        if slot not in self.get_free_slots({"date": date_str}).get("free_slots", []):
+            return _error("Конфликт: слот уже занят или закрыт")
+        limit = int(self.store.settings.get("booking_limit") or 0)
+        mine = [b for b in self.store.active() if b["user_id"] == user_id and not b["paid"]]
+        if limit and len(mine) >= limit:
+            return _error(f"Превышен лимит неоплаченных броней ({limit})")
+        record_id = self.store.new_id()
+        booking = {
+            "id": record_id,
+            "date": date_str,
+            "time": slot,
+            "name": str(payload.get("name", "")),
+            "phone": str(payload.get("phone", "")),
+            "price": SLOT_PRICE,
+            "user_id": user_id,
+            "status": UNPAID,
+            "paid": False,
+            "deleted": False,
+            "created_at": time.time(),
+        }
+        self.store.bookings[record_id] = booking
+        self.store.log_change(booking)
+        return _ok(record_id=record_id)
+
+    def _public(self, booking: dict[str, Any]) -> dict[str, Any]:
+        return {key: value for key, value in booking.items() if key != "created_at"}
+
+    def get_user_bookings(self, payload: dict[str, Any]) -> dict[str, Any]:
+        user_id = str(payload.get("user_id", ""))
+        today = self.store.now().date()
+        bookings = [b for b in self.store.active() if b["user_id"] == user_id]
+        if payload.get("active_only"):
+            bookings = [b for b in bookings if _parse_date(b["date"]).date() >= today]
+        bookings.sort(key=lambda b: (_parse_date(b["date"]), b["time"]))
+        return _ok(bookings=[self._public(b) for b in bookings])
+
+    def get_today_bookings(self, payload: dict[str, Any]) -> dict[str, Any]:
+        today = self.store.now().strftime("%d.%m.%Y")
+        return _ok(bookings=[self._public(b) for b in self.store.on_date(today)])
+
+    def get_reminder_targets(self, payload: dict[str, Any]) -> dict[str, Any]:
+        rows = [
+            {key: b[key] for key in ("id", "date", "time", "name", "user_id")}
+            for b in self.store.on_date(str(payload.get("date", "")))
+        ]
+        return _ok(bookings=rows)
+
+    def get_booking_info(self, payload: dict[str, Any]) -> dict[str, Any]:
+        booking = self.store.bookings.get(str(payload.get("record_id", "")))
+        if booking is None or booking["deleted"]:
+            return _error("Бронь не найдена")
+        return _ok(
+            client_name=booking["name"],
+            booking_date=booking["date"],
+            booking_time=booking["time"],
+            client_chat_id=booking["user_id"],
+            status=booking["status"],
+            price=booking["price"],
+        )
+
+    def cancel_booking(self, payload: dict[str, Any]) -> dict[str, Any]:
+        booking = self.store.bookings.get(str(payload.get("record_id", "")))
+        if booking is None or booking["deleted"]:
+            return _error("Бронь не найдена")
+        user_id = payload.get("user_id")
+        if user_id is not None and str(user_id) != booking["user_id"] and not payload.get("force"):
+            return _error("Это не ваша бронь")
+        if booking["paid"] and (payload.get("only_unpaid") or not payload.get("force")):
+            return _error("Оплаченную бронь отменяет администратор")
+        booking["deleted"] = True
+        self.store.log_change(booking)
+        return _ok(message="Бронь отменена")
+
+    def confirm_payment(self, payload: dict[str, Any]) -> dict[str, Any]:
+        booking = self.store.bookings.get(str(payload.get("record_id", "")))
+        if booking is None or booking["deleted"]:
+            return _error("Бронь не найдена")
+        already = booking["paid"]
+        booking["paid"] = True
+        booking["status"] = PAID
+        if not already:
+            self.store.log_change(booking)
+        return _ok(
+            already_confirmed=already,
+            client_name=booking["name"],
+            booking_date=booking["date"],
+            booking_time=booking["time"],
+            client_chat_id=booking["user_id"],
+        )
+
+    def auto_cancel(self, payload: dict[str, Any]) -> dict[str, Any]:
+        cutoff = time.time() - 60 * float(self.store.settings.get("auto_cancel_minutes") or 60)
+        cancelled = 0
+        for booking in self.store.active():
+            if not booking["paid"] and booking["created_at"] < cutoff:
+                booking["deleted"] = True
+                self.store.log_change(booking)
+                cancelled += 1
+        return _ok(cancelled_count=cancelled)
+
+    def get_changes(self, payload: dict[str, Any]) -> dict[str, Any]:
+        try:
+            since = int(payload.get("since") or 0)
+        except ValueError:
+            since = 0
+        page = self.store.changes[since : since + 500]
+        cursor = since + len(page)
+        exceptions = [{"date": e["date"], "slot": e.get("slot", "")} for e in self.store.exceptions]
+        return _ok(
+            cursor=str(cursor),
+            has_more=cursor < len(self.store.changes),
+            changes=[self._public(b) for b in page],
+            slot_grid=self.store.slot_grid,
+            exceptions=exceptions,
+        )
+
+    # --- admin -----------------------------------------------------------------
+
+    def get_exceptions(self, payload: dict[str, Any]) -> dict[str, Any]:
+        return _ok(exceptions=list(self.store.exceptions))
+
+    def add_exception(self, payload: dict[str, Any]) -> dict[str, Any]:
+        if _parse_date(str(payload.get("date", ""))) is None:
+            return _error("Некорректная дата")
+        item = {
+            "id": self.store.new_id("EX"),
+            "date": str(payload["date"]),
+            "slot": str(payload.get("slot", "")) if payload.get("type") == "slot" else "",
+        }
+        self.store.exceptions.append(item)
+        return _ok(id=item["id"])
+
+    def remove_exception(self, payload: dict[str, Any]) -> dict[str, Any]:
+        before = len(self.store.exceptions)
+        self.store.exceptions = [e for e in self.store.exceptions if e["id"] != payload.get("id")]
+        if len(self.store.exceptions) == before:
+            return _error("Исключение не найдено")
+        return _ok()
+
+    def get_settings(self, payload: dict[str, Any]) -> dict[str, Any]:
+        return _ok(settings=dict(self.store.settings))
+
+    def update_settings(self, payload: dict[str, Any]) -> dict[str, Any]:
+        self.store.settings.update(payload)
+        return _ok(settings=dict(self.store.settings))
+
+    def list_banned_users(self, payload: dict[str, Any]) -> dict[str, Any]:
+        return _ok(users=sorted(self.store.banned))
+
+    def ban_user(self, payload: dict[str, Any]) -> dict[str, Any]:
+        self.store.banned.add(int(payload.get("user_id", 0)))
+        return _ok()
+
+    def unban_user(self, payload: dict[str, Any]) -> dict[str, Any]:
+        self.store.banned.discard(int(payload.get("user_id", 0)))
+        return _ok()
+
+    def get_stats(self, payload: dict[str, Any]) -> dict[str, Any]:
+        active = self.store.active()
+        paid = [b for b in active if b["paid"]]
+        stats = {
+            "total_bookings": len(active),
+            "paid_bookings": len(paid),
+            "revenue": sum(b["price"] for b in paid),
+        }
+        text = (
+            "📊 <b>Статистика</b>\n\n"
+            f"Броней: {stats['total_bookings']}\n"
+            f"Оплачено: {stats['paid_bookings']}\n"
+            f"Выручка: {stats['revenue']} ₽"
+        )
+        return _ok(stats=stats, formatted_telegram=text)
+
+    def get_report(self, payload: dict[str, Any]) -> dict[str, Any]:
+        report_type = str(payload.get("report_type", "daily"))
+        days = {"daily": 1, "weekly": 7, "monthly": 30}.get(report_type, 30)
+        since = (self.store.now() - timedelta(days=days)).replace(tzinfo=None)
+        rows = [b for b in self.store.active() if _parse_date(b["date"]) >= since]
+        data = {
+            "report_type": report_type,
+            "period": payload.get("period", "current"),
+            "bookings": len(rows),
+            "revenue": sum(b["price"] for b in rows if b["paid"]),
+        }
+        text = (
+            f"📈 <b>Отчет ({report_type})</b>\n\n"
+            f"Броней: {data['bookings']}\nВыручка: {data['revenue']} ₽"
+        )
+        return _ok(data=data, formatted_telegram=text)
+
+    def send_reminders(self, payload: dict[str, Any]) -> dict[str, Any]:
+        return _ok(stats={"day_before": 0, "two_hours_before": 0, "errors": 0})
+
+    def setup_triggers(self, payload: dict[str, Any]) -> dict[str, Any]:
+        return _ok()
+
+    def test_connection(self, payload: dict[str, Any]) -> dict[str, Any]:
+        return _ok(message="fake GAS", timestamp=self.store.now().isoformat())
+
+    # --- reviews ---------------------------------------------------------------
+
+    def get_reviews(self, payload: dict[str, Any]) -> dict[str, Any]:
+        reviews = self.store.reviews
+        if payload.get("public_only"):
+            reviews = [r for r in reviews if r["is_public"]]
+        limit = int(payload.get("limit") or 10)
+        average = sum(r["rating"] for r in reviews) / len(reviews) if reviews else 0
+        return _ok(reviews=reviews[-limit:], count=len(reviews), average_rating=round(average, 2))
+
+    def save_review(self, payload: dict[str, Any]) -> dict[str, Any]:
+        booking = self.store.bookings.get(str(payload.get("record_id", "")))
+        if booking is None:
+            return _error("Бронь не найдена")
+        self.store.reviews.append(
+            {
+                "record_id": booking["id"],
+                "client_name": booking["name"],
+                "rating": int(payload.get("rating") or 0),
+                "review_text": str(payload.get("review_text", "")),
+                "review_date": self.store.now().strftime("%d.%m.%Y %H:%M"),
+                "is_public": True,
+            }
+        )
+        return _ok()
+
+
+ACTIONS: tuple[str, ...] = tuple(
+    name
+    for name, value in vars(FakeGasActions).items()
+    if callable(value) and not name.startswith("_")
+)
+
+
+class FakeGasServer:
+    def __init__(
+        self,
+        *,
+        token: str = "dev",
+        faults: FaultProfile | None = None,
+        tz_name: str = "Europe/Moscow",
+        slot_grid: tuple[str, ...] = DEFAULT_SLOT_GRID,
+        seed: int | None = None,
+    ) -> None:
+        self.token = token
+        self.faults = faults or FaultProfile()
+        self.store = FakeGasStore(pytz.timezone(tz_name), slot_grid)
+        self.actions = FakeGasActions(self.store)
+        self.calls: Counter[str] = Counter()
+        self.injected: Counter[str] = Counter()
+        self.trace_ids: deque[str] = deque(maxlen=1000)
+        self.replies: dict[str, dict[str, Any]] = {}
+        self._rng = random.Random(seed)
+        self._last_request = 0.0
+
+    def dispatch(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
+        if action == "batch":
+            return self._batch(payload)
+        handler: Callable[[dict[str, Any]], dict[str, Any]] | None = getattr(
+            self.actions, action, None
+        )
+        if handler is None or action not in ACTIONS:
+            return _error(f"Неизвестное действие: {action}")
+        key = payload.pop(IDEMPOTENCY_FIELD, None)
+        if key is None:
+            return handler(payload)
+        stored = self.replies.get(f"{action}:{key}")
+        if stored is not None:
+            return {**stored, REPLAYED_FIELD: True}
+        reply = handler(payload)
+        if reply.get("status") == "success":
+            self.replies[f"{action}:{key}"] = reply
+        return reply
+
+    def _batch(self, payload: dict[str, Any]) -> dict[str, Any]:
+        results: list[dict[str, Any]] = []
+        failed = False
+        for call in payload.get("calls") or []:
+            if failed and payload.get("stop_on_error"):
+                results.append({"status": "skipped"})
+                continue
+            call = dict(call)
+            action = str(call.pop("action", ""))
+            self.calls[action] += 1
+            result = self.dispatch(action, call)
+            failed = failed or result.get("status") != "success"
+            results.append(result)
+        return _ok(results=results)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        action = str(body.pop("action", ""))
+        token = body.pop("token", None)
+        trace_id = body.pop("trace_id", None)
+        if trace_id:
+            self.trace_ids.append(trace_id)
+        self.calls[action] += 1
+
+        delay = self.faults.sample_latency(action, self._rng)
+        current = time.monotonic()
+        if (
+            self.faults.cold_start_ms
+            and self._last_request
+            and current - self._last_request > self.faults.cold_idle_seconds
+        ):
+            self.injected["cold_start"] += 1
+            delay += self.faults.cold_start_ms / 1000.0
+        self._last_request = current
+        if delay:
+            await asyncio.sleep(delay)
+        if self._rng.random() < self.faults.error_rate:
+            self.injected["error"] += 1
+            return web.Response(status=500, text="injected failure")
+
+        if token != self.token:
+            return web.json_response(_error("Unauthorized"))
+        reply = self.dispatch(action, body)
+        if self.faults.lost_reply_rate and self._rng.random() < self.faults.lost_reply_rate:
+            self.injected["lost_reply"] += 1
+            return web.Response(status=500, text="injected failure after the write")
+        return web.json_response(reply)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"calls": dict(self.calls), "injected": dict(self.injected), "actions": ACTIONS}
+        )
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/exec", self.handle)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake Apps Script backend for the coworking bot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--token", default="dev")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="median latency")
+    parser.add_argument("--p99-ms", type=float, default=0.0, help="p99 latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP 500s")
+    parser.add_argument(
+        "--lost-reply-rate", type=float, default=0.0, help="share of 500s after the write"
+    )
+    parser.add_argument("--cold-start-ms", type=float, default=0.0)
+    parser.add_argument("--cold-idle-seconds", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server = FakeGasServer(
+        token=args.token,
+        faults=FaultProfile(
+            latency_ms=args.latency_ms,
+            p99_ms=args.p99_ms,
+            error_rate=args.error_rate,
+            lost_reply_rate=args.lost_reply_rate,
+            cold_start_ms=args.cold_start_ms,
+            cold_idle_seconds=args.cold_idle_seconds,
+        ),
+        seed=args.seed,
+    )
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""Load generator that drives virtual users through the real Dispatcher, offline.
+
+The bot is built by `create_app()` exactly as in production, but its Telegram
+session is replaced by `RecordingSession` and GAS is served by the in-process
+`FakeGasServer`. Each virtual user goes /start → «Забронировать» → date → slot →
+name → phone → «Подтвердить»; admins walk the admin panel and /stats.
+
+    python -m coworkingbot.devtools.loadtest --users 200 --concurrency 50 \\
+        --gas-latency-ms 400 --gas-p99-ms 2500 --json report.json
+
+Feature flags are read from the environment as usual (`GAS_BATCH_ENABLED=1`,
+`FSM_STORAGE_PATH=...`), so configurations can be compared run by run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from collections.abc import AsyncGenerator, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, TelegramMethod
+from aiogram.types import Chat, Message, ReplyKeyboardMarkup, User
+from aiohttp import web
+
+from coworkingbot.devtools.fake_gas import FakeGasServer, FaultProfile
+
+BOT_TOKEN = "123456:loadtest"
+GAS_TOKEN = "loadtest"
+ADMIN_ID_BASE = 1000
+USER_ID_BASE = 100000
+SLOT_RE = re.compile(r"^\d{2}:\d{2}-\d{2}:\d{2}$")
+BOOKING_STEPS = ("start", "menu", "date", "slot", "name", "phone", "confirm")
+ADMIN_STEPS = ("admin", "hub_view", "summary", "summary_today", "stats")
+
+
+@contextmanager
+def _patched_env(values: dict[str, str]) -> Iterator[None]:
+    """Set `values` in os.environ for the block, then put back what was there."""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class RecordingSession(BaseSession):
+    """Telegram session that answers every method locally and keeps what was sent."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self._latency = latency
+        self._message_ids = itertools.count(1)
+        self.calls: defaultdict[str, int] = defaultdict(int)
+        self.outgoing: defaultdict[int, list[TelegramMethod[Any]]] = defaultdict(list)
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None
+    ) -> Any:
+        self.calls[type(method).__name__] += 1
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(chat_id, int):
+            self.outgoing[chat_id].append(method)
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        if isinstance(method, GetMe):
+            return User(id=int(bot.token.split(":")[0]), is_bot=True, first_name="loadtest")
+        if method.__returning__ is Message:
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        """There are no files to download: every stream is empty."""
+        for chunk in ():
+            yield chunk
+
+    async def close(self) -> None:
+        pass
+
+    def last_reply_buttons(self, chat_id: int) -> list[str]:
+        """Reply-keyboard buttons of the latest message to `chat_id` that had any."""
+        for method in reversed(self.outgoing[chat_id]):
+            markup = getattr(method, "reply_markup", None)
+            if isinstance(markup, ReplyKeyboardMarkup):
+                return [button.text for row in markup.keyboard for button in row]
+        return []
+
+
+class _ErrorCounter(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+
+
+@dataclass
+class LoadTestConfig:
+    users: int = 50
+    admins: int = 2
+    concurrency: int = 20
+    days_ahead: int = 14
+    think_ms: float = 0.0
+    telegram_latency_ms: float = 0.0
+    faults: FaultProfile = field(default_factory=FaultProfile)
+    # Admin alerts are paced at 1/s per chat; don't wait for the backlog by default.
+    drain_seconds: float = 0.0
+    seed: int | None = None
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class LoadTest:
+    def __init__(self, config: LoadTestConfig) -> None:
+        self.config = config
+        self.fake_gas = FakeGasServer(token=GAS_TOKEN, faults=config.faults, seed=config.seed)
+        self.session = RecordingSession(config.telegram_latency_ms / 1000.0)
+        self.samples: defaultdict[str, list[float]] = defaultdict(list)
+        self._rng = random.Random(config.seed)
+        self._update_ids = itertools.count(1)
+        self._bot: Bot | None = None
+        self._dp: Dispatcher | None = None
+
+    async def _feed(self, step: str, update: dict[str, Any]) -> None:
+        assert self._bot is not None and self._dp is not None
+        update["update_id"] = next(self._update_ids)
+        started = time.perf_counter()
+        await self._dp.feed_raw_update(self._bot, update)
+        self.samples[step].append(time.perf_counter() - started)
+        if self.config.think_ms:
+            await asyncio.sleep(self._rng.uniform(0.5, 1.5) * self.config.think_ms / 1000.0)
+
+    @staticmethod
+    def _user(user_id: int) -> dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def _message(self, user_id: int, text: str) -> dict[str, Any]:
+        message: dict[str, Any] = {
+            "message_id": next(self._update_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return {"message": message}
+
+    def _callback(self, user_id: int, data: str) -> dict[str, Any]:
+        return {
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": 1,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "…",
+                },
+            }
+        }
+
+    async def run_user(self, index: int) -> None:
+        user_id = USER_ID_BASE + index
+        day = datetime.now() + timedelta(days=1 + index % self.config.days_ahead)
+        await self._feed("start", self._message(user_id, "/start"))
+        await self._feed("menu", self._message(user_id, "📅 Забронировать"))
+        await self._feed("date", self._message(user_id, day.strftime("%d.%m.%Y")))
+        slots = [b for b in self.session.last_reply_buttons(user_id) if SLOT_RE.match(b)]
+        if not slots:
+            return
+        slot = slots[(index // self.config.days_ahead) % len(slots)]
+        await self._feed("slot", self._message(user_id, slot))
+        await self._feed("name", self._message(user_id, f"Гость {index}"))
+        await self._feed("phone", self._message(user_id, f"+7999{index:07d}"))
+        await self._feed("confirm", self._message(user_id, "✅ Подтвердить"))
+
+    async def run_admin(self, index: int) -> None:
+        user_id = ADMIN_ID_BASE + index
+        await self._feed("admin", self._message(user_id, "/admin"))
+        await self._feed("hub_view", self._callback(user_id, "admin_hub_view"))
+        await self._feed("summary", self._callback(user_id, "admin_summary"))
+        await self._feed("summary_today", self._callback(user_id, "admin_summary_today"))
+        await self._feed("stats", self._message(user_id, "/stats"))
+
+    async def run(self) -> dict[str, Any]:
+        runner = web.AppRunner(self.fake_gas.make_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+
+        env = {
+            "BOT_TOKEN": BOT_TOKEN,
+            "GAS_WEBAPP_URL": f"http://127.0.0.1:{port}/exec",
+            "API_TOKEN": GAS_TOKEN,
+            "ADMIN_IDS": ",".join(
+                str(ADMIN_ID_BASE + i) for i in range(max(self.config.admins, 1))
+            ),
+        }
+        with _patched_env(env):
+            try:
+                return await self._run_app()
+            finally:
+                await runner.cleanup()
+
+    async def _run_app(self) -> dict[str, Any]:
+        from coworkingbot.working_bot_app import create_app
+
+        bot, dp, ctx = create_app()
+        for middleware in bot.session.middleware:
+            self.session.middleware(middleware)
+        bot.session = self.session
+        self._bot, self._dp = bot, dp
+        errors = _ErrorCounter()
+        logging.getLogger("coworkingbot").addHandler(errors)
+
+        workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+        limit = asyncio.Semaphore(self.config.concurrency)
+
+        async def bounded(flow: Any, index: int) -> None:
+            async with limit:
+                await flow(index)
+
+        flows = [bounded(self.run_user, i) for i in range(self.config.users)]
+        flows += [bounded(self.run_admin, i) for i in range(self.config.admins)]
+        self._rng.shuffle(flows)
+
+        await dp.emit_startup(bot=bot, **workflow_data)
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*flows)
+            elapsed = time.perf_counter() - started
+            notifier = ctx.notifier.snapshot() if ctx.notifier is not None else {}
+        finally:
+            if ctx.notifier is not None:
+                await ctx.notifier.stop(timeout=self.config.drain_seconds)
+            await dp.emit_shutdown(bot=bot, **workflow_data)
+            logging.getLogger("coworkingbot").removeHandler(errors)
+        return self.report(elapsed, errors.count, notifier)
+
+    def report(self, elapsed: float, errors: int, notifier: dict[str, Any]) -> dict[str, Any]:
+        user_ids = {str(USER_ID_BASE + i) for i in range(self.config.users)}
+        completed = sum(1 for b in self.fake_gas.store.active() if b["user_id"] in user_ids)
+        updates = sum(len(samples) for samples in self.samples.values())
+        gas_calls = dict(sorted(self.fake_gas.calls.items()))
+        steps = {}
+        for step in (*BOOKING_STEPS, *ADMIN_STEPS):
+            ordered = sorted(self.samples.get(step, ()))
+            if not ordered:
+                continue
+            steps[step] = {
+                "count": len(ordered),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        return {
+            "users": self.config.users,
+            "admins": self.config.admins,
+            "concurrency": self.config.concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "updates": updates,
+            "updates_per_s": round(updates / elapsed, 1) if elapsed else 0.0,
+            "bookings_completed": completed,
+            "bookings_per_s": round(completed / elapsed, 2) if elapsed else 0.0,
+            "failed_users": self.config.users - completed,
+            "handler_errors": errors,
+            "steps": steps,
+            "gas_calls": gas_calls,
+            "gas_calls_per_booking": (
+                round(sum(gas_calls.values()) / completed, 2) if completed else None
+            ),
+            "gas_faults": dict(self.fake_gas.injected),
+            "telegram_calls": dict(sorted(self.session.calls.items())),
+            # Admin alerts still queued behind the per-chat rate limit when the run ended.
+            "notifier": notifier,
+        }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [
+        f"users={report['users']} admins={report['admins']} concurrency={report['concurrency']}",
+        f"elapsed {report['elapsed_s']} s, {report['updates']} updates "
+        f"({report['updates_per_s']}/s)",
+        f"bookings: {report['bookings_completed']} completed ({report['bookings_per_s']}/s), "
+        f"{report['failed_users']} failed, {report['handler_errors']} handler errors",
+        f"GAS calls per booking: {report['gas_calls_per_booking']}",
+        "",
+        f"{'step':<15}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for step, row in report["steps"].items():
+        lines.append(
+            f"{step:<15}{row['count']:>7}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+            f"{row['p99_ms']:>10}{row['max_ms']:>10}"
+        )
+    lines.append("")
+    lines.append("GAS: " + ", ".join(f"{k}={v}" for k, v in report["gas_calls"].items()))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline load test of the booking flow")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--days-ahead", type=int, default=14, help="spread bookings over N days")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between steps")
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--gas-latency-ms", type=float, default=0.0, help="median GAS latency")
+    parser.add_argument("--gas-p99-ms", type=float, default=0.0)
+    parser.add_argument("--gas-error-rate", type=float, default=0.0)
+    parser.add_argument("--drain-seconds", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", default="", help="also write the report here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    config = LoadTestConfig(
+        users=args.users,
+        admins=args.admins,
+        concurrency=max(1, args.concurrency),
+        days_ahead=max(1, args.days_ahead),
+        think_ms=args.think_ms,
+        telegram_latency_ms=args.telegram_latency_ms,
+        drain_seconds=args.drain_seconds,
+        faults=FaultProfile(
+            latency_ms=args.gas_latency_ms, p99_ms=args.gas_p99_ms, error_rate=args.gas_error_rate
+        ),
+        seed=args.seed,
+    )
+    report = asyncio.run(LoadTest(config).run())
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
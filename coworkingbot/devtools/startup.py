@@ -0,0 +1,178 @@
+"""Startup benchmark: import time, time to first update and RSS, against budgets.
+
+Each run is a fresh interpreter (`--probe`), so imports are measured cold:
+
+1. import `coworkingbot.working_bot_app`;
+2. `create_app()` and the dispatcher's startup hooks;
+3. one `/start` update, fed like polling would, with GAS served by the
+   in-process fake and Telegram by `RecordingSession`.
+
+The time to first update is the sum of the three (the fakes are not counted).
+The median of `--runs` probes is compared with `benchmarks/startup_budget.json`;
+the command exits with 1 when a number is over budget.
+
+    python -m coworkingbot.devtools.startup
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+BUDGET_PATH = Path(__file__).resolve().parents[2] / "benchmarks" / "startup_budget.json"
+METRICS = ("import_ms", "startup_ms", "first_update_ms", "time_to_first_update_ms", "rss_mib")
+BUDGETED = ("import_ms", "time_to_first_update_ms", "rss_mib")
+BOT_TOKEN = "123456:STARTUP"
+GAS_TOKEN = "startup-token"
+USER_ID = 5000
+
+
+def _rss_mib() -> float:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _start_update() -> dict[str, Any]:
+    return {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Startup"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+def probe() -> dict[str, Any]:
+    started = time.perf_counter()
+    from coworkingbot import working_bot_app
+
+    import_seconds = time.perf_counter() - started
+
+    import asyncio
+
+    from aiohttp import web
+
+    from coworkingbot.devtools.fake_gas import FakeGasServer
+    from coworkingbot.devtools.loadtest import RecordingSession
+
+    async def run() -> dict[str, Any]:
+        runner = web.AppRunner(FakeGasServer(token=GAS_TOKEN).make_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        os.environ.update(
+            BOT_TOKEN=BOT_TOKEN,
+            GAS_WEBAPP_URL=f"http://127.0.0.1:{port}/exec",
+            API_TOKEN=GAS_TOKEN,
+            ADMIN_IDS="1",
+        )
+        session = RecordingSession()
+        try:
+            started = time.perf_counter()
+            bot, dp, _ctx = working_bot_app.create_app()
+            for middleware in bot.session.middleware:
+                session.middleware(middleware)
+            bot.session = session
+            workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+            await dp.emit_startup(bot=bot, **workflow_data)
+            startup_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            await dp.feed_raw_update(bot, _start_update())
+            first_update_seconds = time.perf_counter() - started
+            if not session.outgoing[USER_ID]:
+                raise RuntimeError("/start got no reply")
+            rss = _rss_mib()
+            await dp.emit_shutdown(bot=bot, **workflow_data)
+        finally:
+            await runner.cleanup()
+        return {
+            "import_ms": round(import_seconds * 1000, 1),
+            "startup_ms": round(startup_seconds * 1000, 1),
+            "first_update_ms": round(first_update_seconds * 1000, 1),
+            "time_to_first_update_ms": round(
+                (import_seconds + startup_seconds + first_update_seconds) * 1000, 1
+            ),
+            "rss_mib": round(rss, 1),
+            "admin_loaded": "coworkingbot.routers.admin" in sys.modules,
+        }
+
+    return asyncio.run(run())
+
+
+def measure(runs: int = 3) -> dict[str, Any]:
+    """Median of `runs` probes, each in its own interpreter."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "coworkingbot.devtools.startup", "--probe"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    result: dict[str, Any] = {
+        metric: round(statistics.median(sample[metric] for sample in samples), 1)
+        for metric in METRICS
+    }
+    result["admin_loaded"] = any(sample["admin_loaded"] for sample in samples)
+    return result
+
+
+def check(result: dict[str, Any], budget: dict[str, float]) -> list[str]:
+    """Human-readable budget overruns; an empty list means the run passes."""
+    problems = [
+        f"{metric}: {result[metric]} over budget {budget[metric]}"
+        for metric in BUDGETED
+        if metric in budget and result[metric] > budget[metric]
+    ]
+    if result.get("admin_loaded"):
+        problems.append("admin_loaded: routers/admin.py was imported before any admin update")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Startup time and memory budget")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", type=Path, default=BUDGET_PATH)
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(probe()))
+        return 0
+
+    result = measure(max(args.runs, 1))
+    budget = json.loads(args.budget.read_text(encoding="utf-8"))
+    for metric in METRICS:
+        limit = budget.get(metric)
+        print(f"{metric:<26}{result[metric]:>10}" + (f"   (budget {limit})" if limit else ""))
+    print(f"{'admin_loaded':<26}{result['admin_loaded']!s:>10}")
+    problems = check(result, budget)
+    for problem in problems:
+        print(f"OVER BUDGET {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
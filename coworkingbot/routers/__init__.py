@@ -1,3 +1,3 @@
-from coworkingbot.routers import admin, booking, errors, help, start
+"""Handler routers; `working_bot_app` imports them (admin only on first use)."""
 
 __all__ = ["admin", "booking", "errors", "help", "start"]
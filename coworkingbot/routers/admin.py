@@ -3,15 +3,17 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import time
 from datetime import timedelta
 
-from aiogram import F, Router, types
-from aiogram.filters import Command
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import BufferedInputFile, InlineKeyboardButton, InlineKeyboardMarkup
 
 from coworkingbot import __version__
+from coworkingbot.app.callbacks import CallbackTable, pack
 from coworkingbot.app.context import AppContext
 from coworkingbot.services.common import is_admin, now
 from coworkingbot.services.content_store import (
@@ -20,15 +22,23 @@ from coworkingbot.services.content_store import (
     reset_client_content,
     set_client_content_field,
 )
+from coworkingbot.services.gas_idempotency import (
+    REPLAYED_FIELD,
+    new_idempotency_key,
+    payment_key,
+)
 from coworkingbot.services.notifications import (
     notify_admin_about_payment_confirmation,
     send_admin_notification,
 )
+from coworkingbot.services.profiling import DEFAULT_CPU_SECONDS, MAX_CPU_SECONDS, profiler
 from coworkingbot.services.texts import admin_help_text
 
 logger = logging.getLogger(__name__)
 
 router = Router()
+# Every callback of this router is admin-only; the table checks it before the handler runs.
+callbacks = CallbackTable(router, admin_only=True)
 
 
 class AdminStates(StatesGroup):
@@ -107,32 +117,40 @@ def admin_client_content_keyboard() -> InlineKeyboardMarkup:
         inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text="✏️ Приветствие", callback_data="admin_content_edit:welcome"
+                    text="✏️ Приветствие", callback_data=pack("admin_content_edit", "welcome")
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="✏️ Условия", callback_data=pack("admin_content_edit", "rules")
                 )
             ],
-            [InlineKeyboardButton(text="✏️ Условия", callback_data="admin_content_edit:rules")],
-            [InlineKeyboardButton(text="✏️ Поддержка", callback_data="admin_content_edit:support")],
             [
                 InlineKeyboardButton(
-                    text="✏️ Объявление", callback_data="admin_content_edit:announcement"
+                    text="✏️ Поддержка", callback_data=pack("admin_content_edit", "support")
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="✏️ Объявление", callback_data=pack("admin_content_edit", "announcement")
                 )
             ],
             [
                 InlineKeyboardButton(
                     text="✏️ Кнопка «Забронировать»",
-                    callback_data="admin_content_edit:booking_button_label",
+                    callback_data=pack("admin_content_edit", "booking_button_label"),
                 )
             ],
             [
                 InlineKeyboardButton(
                     text="✏️ Текст после успешной брони",
-                    callback_data="admin_content_edit:booking_success",
+                    callback_data=pack("admin_content_edit", "booking_success"),
                 )
             ],
             [
                 InlineKeyboardButton(
                     text="✏️ Текст отмены/переноса",
-                    callback_data="admin_content_edit:booking_cancel_reschedule",
+                    callback_data=pack("admin_content_edit", "booking_cancel_reschedule"),
                 )
             ],
             [
@@ -232,12 +250,8 @@ async def cmd_admin(message: types.Message, ctx: AppContext) -> None:
     )
 
 
-@router.callback_query(F.data == "admin_hub_manage")
+@callbacks.route("admin_hub_manage")
 async def action_admin_hub_manage(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Управление')}\n\n⚠️ Операционные действия изменяют данные.",
         parse_mode="HTML",
@@ -246,12 +260,8 @@ async def action_admin_hub_manage(callback: types.CallbackQuery, ctx: AppContext
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_hub_view")
+@callbacks.route("admin_hub_view")
 async def action_admin_hub_view(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Просмотр')}\n\nТолько просмотр, без изменений.",
         parse_mode="HTML",
@@ -260,12 +270,8 @@ async def action_admin_hub_view(callback: types.CallbackQuery, ctx: AppContext)
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_hub_system")
+@callbacks.route("admin_hub_system")
 async def action_admin_hub_system(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Система')}\n\nСервисные функции и настройки.",
         parse_mode="HTML",
@@ -274,12 +280,8 @@ async def action_admin_hub_system(callback: types.CallbackQuery, ctx: AppContext
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_client_content")
+@callbacks.route("admin_client_content")
 async def action_admin_client_content(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     content = await get_client_content(ctx)
     text = (
         f"{_admin_breadcrumb('Система', 'Контент для клиента')}\n\n"
@@ -306,15 +308,10 @@ async def action_admin_client_content(callback: types.CallbackQuery, ctx: AppCon
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin_content_edit:"))
+@callbacks.route("admin_content_edit", args={"field": str})
 async def action_admin_content_edit(
-    callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
+    callback: types.CallbackQuery, state: FSMContext, field: str
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
-    field = callback.data.split(":", maxsplit=1)[-1]
     if field not in ALLOWED_FIELDS:
         await callback.answer("Неизвестное поле", show_alert=True)
         return
@@ -355,26 +352,18 @@ async def handle_admin_content_value(message: types.Message, state: FSMContext)
     )
 
 
-@router.callback_query(F.data == "admin_content_cancel")
+@callbacks.route("admin_content_cancel")
 async def action_admin_content_cancel(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.clear()
     await action_admin_client_content(callback, ctx)
 
 
-@router.callback_query(F.data == "admin_content_save")
+@callbacks.route("admin_content_save")
 async def action_admin_content_save(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     data = await state.get_data()
     field = data.get("content_field", "")
     value = data.get("content_value", "")
@@ -387,14 +376,10 @@ async def action_admin_content_save(
     await action_admin_client_content(callback, ctx)
 
 
-@router.callback_query(F.data == "admin_content_reset")
+@callbacks.route("admin_content_reset")
 async def action_admin_content_reset(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.confirming_client_content_reset)
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Система', 'Контент для клиента', 'Сброс')}\n\n⚠️ Действие изменит тексты для всех клиентов.\nПодтвердите сброс к значениям по умолчанию.",
@@ -412,14 +397,10 @@ async def action_admin_content_reset(
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_content_reset_confirm")
+@callbacks.route("admin_content_reset_confirm")
 async def action_admin_content_reset_confirm(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await reset_client_content(ctx)
     await state.clear()
     await action_admin_client_content(callback, ctx)
@@ -453,6 +434,60 @@ async def _run_self_check(ctx: AppContext) -> tuple[str, bool]:
         gas_ok = "❌ Ошибка"
         gas_detail = str(exc)
 
+    pool = ctx.gas.pool_stats()
+    pool_detail = (
+        f"активных {pool['acquired']}/{pool['limit']}, простаивают {pool['idle']}, "
+        f"новых {pool['created']}, переиспользовано {pool['reused']}"
+    )
+    cache = ctx.gas.cache_stats()
+    cache_detail = (
+        f"попаданий {cache['hits']}, промахов {cache['misses']}, "
+        f"сбросов {cache['invalidations']}, дат в кэше {cache['size']}"
+    )
+    flights = ctx.gas.coalesce_stats()
+    coalesce_detail = (
+        f"запросов {flights['started']}, объединено {flights['coalesced']}, "
+        f"отменено {flights['abandoned']}, в полёте {flights['inflight']}"
+    )
+
+    breakers = ctx.gas.breaker_stats()
+    tripped = [
+        f"{action}: {info['state']}" + (f" (ещё {info['retry_in']} с)" if info["retry_in"] else "")
+        for action, info in breakers.items()
+        if info["state"] != "closed"
+    ]
+    breaker_detail = (
+        ", ".join(tripped) if tripped else f"все закрыты ({len(breakers)} действий)"
+    ) + f"; повторов {ctx.gas.retries}, хеджей {ctx.gas.hedged}"
+
+    if ctx.gas.replica is None:
+        replica_detail = "выключена"
+    else:
+        replica = ctx.gas.replica.stats()
+        age = "ещё не синхронизирована" if replica["age"] is None else f"возраст {replica['age']} с"
+        replica_detail = f"строк {replica['rows']}, ответов {replica['served']}, {age}"
+
+    if ctx.notifier is None:
+        notify_detail = "напрямую"
+    else:
+        sent = ctx.notifier.snapshot()
+        notify_detail = (
+            f"отправлено {sent['sent']}, ошибок {sent['failed']}, повторов {sent['retried']}, "
+            f"в очереди {sent['depth']}, отброшено {sent['dropped']}, p95 {sent['p95_seconds']} с"
+        )
+    if ctx.outbox is not None:
+        pending = await asyncio.to_thread(ctx.outbox.stats)
+        notify_detail += f"; outbox: ждут {pending['pending']}, не доставлено {pending['dead']}"
+
+    if ctx.loop_monitor is None:
+        loop_detail = "мониторинг выключен"
+    else:
+        lag = ctx.loop_monitor.stats()
+        loop_detail = (
+            f"задержка p50 {lag['p50_ms']} / p95 {lag['p95_ms']} / p99 {lag['p99_ms']} мс, "
+            f"макс {lag['max_ms']} мс, блокировок {lag['stalls']}"
+        )
+
     content_ok = "✅ OK"
     content_detail = ""
     try:
@@ -485,6 +520,13 @@ async def _run_self_check(ctx: AppContext) -> tuple[str, bool]:
         f"• Env: {env_ok}\n"
         f"• Импорт: {import_ok}\n"
         f"• GAS: {gas_ok} {gas_detail}\n"
+        f"• GAS-пул: {pool_detail}\n"
+        f"• GAS-предохранители: {breaker_detail}\n"
+        f"• Кэш слотов: {cache_detail}\n"
+        f"• Объединение запросов: {coalesce_detail}\n"
+        f"• Локальная реплика: {replica_detail}\n"
+        f"• Уведомления: {notify_detail}\n"
+        f"• Event loop: {loop_detail}\n"
         f"• Content store: {content_ok} {content_detail}\n"
         f"• Версия: {__version__}\n"
         f"• Время: {now(ctx).strftime('%H:%M %d.%m.%Y')}\n\n"
@@ -510,6 +552,84 @@ async def cmd_self_check(message: types.Message, ctx: AppContext) -> None:
     await message.answer(report, parse_mode="HTML")
 
 
+# Keeps running profile tasks referenced until they finish.
+_profile_tasks: set[asyncio.Task[None]] = set()
+
+
+async def _send_cpu_profile(message: types.Message, seconds: float) -> None:
+    try:
+        result = await profiler.profile_cpu(seconds)
+    except RuntimeError:
+        await message.answer("⏱ Профилирование уже идёт. Остановить: /profile_stop")
+        return
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    await message.answer_document(
+        BufferedInputFile(result.render().encode(), filename=f"cpu-profile-{stamp}.txt"),
+        caption=f"⏱ CPU-профиль за {result.seconds:.0f} с, {result.samples} замеров",
+    )
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: types.Message, command: CommandObject, ctx: AppContext) -> None:
+    if not is_admin(ctx, message.from_user.id):
+        await message.answer("⛔ Только для администраторов.")
+        return
+    if profiler.cpu_running:
+        await message.answer("⏱ Профилирование уже идёт. Остановить: /profile_stop")
+        return
+
+    try:
+        seconds = int(command.args) if command.args else DEFAULT_CPU_SECONDS
+    except ValueError:
+        await message.answer(f"Использование: /profile [секунд, до {MAX_CPU_SECONDS}]")
+        return
+    seconds = min(max(seconds, 1), MAX_CPU_SECONDS)
+    task = asyncio.create_task(_send_cpu_profile(message, seconds))
+    _profile_tasks.add(task)
+    task.add_done_callback(_profile_tasks.discard)
+    await message.answer(
+        f"⏱ Снимаю CPU-профиль {seconds} с. Отчёт придёт файлом; раньше: /profile_stop"
+    )
+
+
+@router.message(Command("profile_stop"))
+async def cmd_profile_stop(message: types.Message, ctx: AppContext) -> None:
+    if not is_admin(ctx, message.from_user.id):
+        await message.answer("⛔ Только для администраторов.")
+        return
+    if not profiler.stop_cpu():
+        await message.answer("⏱ Профилирование не запущено.")
+
+
+@router.message(Command("mem_snapshot"))
+async def cmd_mem_snapshot(message: types.Message, ctx: AppContext) -> None:
+    if not is_admin(ctx, message.from_user.id):
+        await message.answer("⛔ Только для администраторов.")
+        return
+
+    started = profiler.memory_tracing
+    report = await profiler.memory_snapshot()
+    if not started:
+        await message.answer(f"🧠 {report}Повторите /mem_snapshot позже; выключить: /mem_stop")
+        return
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    await message.answer_document(
+        BufferedInputFile(report.encode(), filename=f"memory-{stamp}.txt"),
+        caption="🧠 Память: топ мест выделения и прирост с прошлого снимка",
+    )
+
+
+@router.message(Command("mem_stop"))
+async def cmd_mem_stop(message: types.Message, ctx: AppContext) -> None:
+    if not is_admin(ctx, message.from_user.id):
+        await message.answer("⛔ Только для администраторов.")
+        return
+    stopped = profiler.stop_memory()
+    await message.answer(
+        "🧠 tracemalloc выключен." if stopped else "🧠 tracemalloc не был включён."
+    )
+
+
 @router.message(Command("confirm"))
 async def cmd_confirm(message: types.Message, ctx: AppContext) -> None:
     if not is_admin(ctx, message.from_user.id):
@@ -528,11 +648,13 @@ async def cmd_confirm(message: types.Message, ctx: AppContext) -> None:
     record_id = args[1]
 
     result = await ctx.gas.request(
-        "confirm_payment", {"record_id": record_id, "admin_id": str(message.from_user.id)}
+        "confirm_payment",
+        {"record_id": record_id, "admin_id": str(message.from_user.id)},
+        idempotency_key=payment_key(record_id, message.chat.id, message.message_id),
     )
 
     if result.get("status") == "success":
-        if result.get("already_confirmed"):
+        if result.get("already_confirmed") or result.get(REPLAYED_FIELD):
             await message.answer("✅ Оплата уже была подтверждена ранее")
         else:
             await message.answer(
@@ -574,7 +696,7 @@ async def cmd_stats(message: types.Message, ctx: AppContext) -> None:
             inline_keyboard=[
                 [
                     InlineKeyboardButton(
-                        text="📊 Подробный отчет", callback_data="report_detailed_current"
+                        text="📊 Подробный отчет", callback_data=pack("report_detailed", "current")
                     )
                 ],
                 [InlineKeyboardButton(text="↩️ В админ-панель", callback_data="admin_back")],
@@ -634,19 +756,14 @@ async def cmd_test_notify(message: types.Message, ctx: AppContext) -> None:
 
     for msg in test_messages:
         await send_admin_notification(ctx, f"🔔 {msg}\n⏰ {now(ctx).strftime('%H:%M')}")
-        await asyncio.sleep(1)
 
     await message.answer("✅ Тестовые уведомления отправлены!")
 
 
-@router.callback_query(F.data == "admin_back")
+@callbacks.route("admin_back")
 async def action_admin_back(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.clear()
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Главная')}\n\nВыберите действие:",
@@ -656,12 +773,8 @@ async def action_admin_back(
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_back_manage")
+@callbacks.route("admin_back_manage")
 async def action_admin_back_manage(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Управление')}\n\n⚠️ Операционные действия изменяют данные.",
         parse_mode="HTML",
@@ -670,12 +783,8 @@ async def action_admin_back_manage(callback: types.CallbackQuery, ctx: AppContex
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_back_view")
+@callbacks.route("admin_back_view")
 async def action_admin_back_view(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Просмотр')}\n\nТолько просмотр, без изменений.",
         parse_mode="HTML",
@@ -684,12 +793,8 @@ async def action_admin_back_view(callback: types.CallbackQuery, ctx: AppContext)
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_back_system")
+@callbacks.route("admin_back_system")
 async def action_admin_back_system(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Система')}\n\nСервисные функции и настройки.",
         parse_mode="HTML",
@@ -698,12 +803,8 @@ async def action_admin_back_system(callback: types.CallbackQuery, ctx: AppContex
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_confirm_payment_help")
+@callbacks.route("admin_confirm_payment_help")
 async def action_admin_confirm_payment_help(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Управление', 'Подтверждение оплаты')}\n\n⚠️ Действие изменяет статус оплаты.\n\n"
         "Используйте команду:\n"
@@ -739,7 +840,7 @@ async def _request_confirmation(
     await message.answer(f"⚠️ {prompt}", parse_mode="HTML", reply_markup=_confirm_keyboard())
 
 
-@router.callback_query(F.data == "admin_action_cancel")
+@callbacks.route("admin_action_cancel")
 async def action_admin_cancel(callback: types.CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await callback.message.edit_text(
@@ -753,7 +854,7 @@ async def action_admin_cancel(callback: types.CallbackQuery, state: FSMContext)
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_action_confirm")
+@callbacks.route("admin_action_confirm")
 async def action_admin_confirm(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
@@ -809,12 +910,8 @@ async def action_admin_confirm(
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_summary")
+@callbacks.route("admin_summary")
 async def action_admin_summary(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
@@ -832,12 +929,8 @@ async def action_admin_summary(callback: types.CallbackQuery, ctx: AppContext) -
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_summary_today")
+@callbacks.route("admin_summary_today")
 async def action_admin_summary_today(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     result = await get_report_from_gas(ctx, "daily")
     text = (
         result["formatted_text"] if result.get("success") else f"❌ Ошибка: {result.get('error')}"
@@ -852,12 +945,8 @@ async def action_admin_summary_today(callback: types.CallbackQuery, ctx: AppCont
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_summary_week")
+@callbacks.route("admin_summary_week")
 async def action_admin_summary_week(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     result = await get_report_from_gas(ctx, "weekly")
     text = (
         result["formatted_text"] if result.get("success") else f"❌ Ошибка: {result.get('error')}"
@@ -872,12 +961,8 @@ async def action_admin_summary_week(callback: types.CallbackQuery, ctx: AppConte
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_exceptions")
+@callbacks.route("admin_exceptions")
 async def action_admin_exceptions(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="📋 Список", callback_data="admin_exceptions_list")],
@@ -903,12 +988,8 @@ async def action_admin_exceptions(callback: types.CallbackQuery, ctx: AppContext
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_exceptions_list")
+@callbacks.route("admin_exceptions_list")
 async def action_admin_exceptions_list(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     result = await ctx.gas.request("get_exceptions", {})
     if result.get("status") == "success":
         exceptions = result.get("exceptions", [])
@@ -942,27 +1023,19 @@ async def action_admin_exceptions_list(callback: types.CallbackQuery, ctx: AppCo
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_exceptions_add_date")
+@callbacks.route("admin_exceptions_add_date")
 async def action_admin_exceptions_add_date(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_exception_date)
     await callback.message.answer("Введите дату в формате ДД.ММ.ГГГГ, которую нужно закрыть.")
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_exceptions_add_slot")
+@callbacks.route("admin_exceptions_add_slot")
 async def action_admin_exceptions_add_slot(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_exception_slot)
     await callback.message.answer(
         "Введите слот в формате ДД.ММ.ГГГГ 10:00-12:00, который нужно закрыть."
@@ -970,14 +1043,10 @@ async def action_admin_exceptions_add_slot(
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_exceptions_remove")
+@callbacks.route("admin_exceptions_remove")
 async def action_admin_exceptions_remove(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_exception_remove)
     await callback.message.answer("Введите ID исключения для удаления.")
     await callback.answer()
@@ -1047,12 +1116,8 @@ async def handle_exception_remove(
     )
 
 
-@router.callback_query(F.data == "admin_settings")
+@callbacks.route("admin_settings")
 async def action_admin_settings(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     result = await ctx.gas.request("get_settings", {})
     if result.get("status") == "success":
         settings = result.get("settings", {})
@@ -1081,40 +1146,28 @@ async def action_admin_settings(callback: types.CallbackQuery, ctx: AppContext)
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_settings_rules")
+@callbacks.route("admin_settings_rules")
 async def action_admin_settings_rules(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_setting_rules)
     await callback.message.answer("Введите новый текст правил.")
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_settings_limit")
+@callbacks.route("admin_settings_limit")
 async def action_admin_settings_limit(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_setting_limit)
     await callback.message.answer("Введите новый лимит бронирований (число).")
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_settings_window")
+@callbacks.route("admin_settings_window")
 async def action_admin_settings_window(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_setting_window)
     await callback.message.answer("Введите новые окна времени (например: 10:00-22:00).")
     await callback.answer()
@@ -1165,12 +1218,8 @@ async def handle_settings_window(message: types.Message, state: FSMContext) -> N
     )
 
 
-@router.callback_query(F.data == "admin_users")
+@callbacks.route("admin_users")
 async def action_admin_users(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="📋 Список банов", callback_data="admin_users_list")],
@@ -1187,12 +1236,8 @@ async def action_admin_users(callback: types.CallbackQuery, ctx: AppContext) ->
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_users_list")
+@callbacks.route("admin_users_list")
 async def action_admin_users_list(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     result = await ctx.gas.request("list_banned_users", {})
     if result.get("status") == "success":
         users = result.get("users", [])
@@ -1215,27 +1260,19 @@ async def action_admin_users_list(callback: types.CallbackQuery, ctx: AppContext
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_users_ban")
+@callbacks.route("admin_users_ban")
 async def action_admin_users_ban(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_user_ban)
     await callback.message.answer("Введите ID пользователя для бана.")
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_users_unban")
+@callbacks.route("admin_users_unban")
 async def action_admin_users_unban(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_user_unban)
     await callback.message.answer("Введите ID пользователя для разбана.")
     await callback.answer()
@@ -1271,12 +1308,8 @@ async def handle_users_unban(message: types.Message, state: FSMContext) -> None:
     )
 
 
-@router.callback_query(F.data == "admin_system_state")
+@callbacks.route("admin_system_state")
 async def action_admin_system_state(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     report, _ = await _run_self_check(ctx)
     await callback.message.edit_text(
         f"{_admin_breadcrumb('Система', 'Состояние системы')}\n\n{report}",
@@ -1290,12 +1323,8 @@ async def action_admin_system_state(callback: types.CallbackQuery, ctx: AppConte
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_view_today")
+@callbacks.route("admin_view_today")
 async def action_admin_view_today(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     try:
         result = await ctx.gas.request("get_today_bookings", {})
 
@@ -1357,12 +1386,8 @@ async def action_admin_view_today(callback: types.CallbackQuery, ctx: AppContext
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_view_tomorrow")
+@callbacks.route("admin_view_tomorrow")
 async def action_admin_view_tomorrow(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     try:
         tomorrow = (now(ctx) + timedelta(days=1)).strftime("%d.%m.%Y")
 
@@ -1427,12 +1452,8 @@ async def action_admin_view_tomorrow(callback: types.CallbackQuery, ctx: AppCont
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_stats")
+@callbacks.route("admin_stats")
 async def handle_admin_stats(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.answer("📊 Получаю статистику...")
 
     result = await get_stats_from_gas(ctx)
@@ -1442,7 +1463,7 @@ async def handle_admin_stats(callback: types.CallbackQuery, ctx: AppContext) ->
             inline_keyboard=[
                 [
                     InlineKeyboardButton(
-                        text="📊 Подробный отчет", callback_data="report_detailed_current"
+                        text="📊 Подробный отчет", callback_data=pack("report_detailed", "current")
                     )
                 ],
                 [InlineKeyboardButton(text="↩️ В админ-панель", callback_data="admin_back_view")],
@@ -1464,12 +1485,8 @@ async def handle_admin_stats(callback: types.CallbackQuery, ctx: AppContext) ->
         )
 
 
-@router.callback_query(F.data == "report_menu")
+@callbacks.route("report_menu")
 async def action_report_menu(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
@@ -1505,12 +1522,8 @@ async def action_report_menu(callback: types.CallbackQuery, ctx: AppContext) ->
     await callback.answer()
 
 
-@router.callback_query(F.data == "report_daily")
+@callbacks.route("report_daily")
 async def action_report_daily(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     try:
         result = await get_report_from_gas(ctx, "daily")
 
@@ -1542,12 +1555,8 @@ async def action_report_daily(callback: types.CallbackQuery, ctx: AppContext) ->
     await callback.answer()
 
 
-@router.callback_query(F.data == "report_weekly")
+@callbacks.route("report_weekly")
 async def action_report_weekly(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     try:
         result = await get_report_from_gas(ctx, "weekly")
 
@@ -1579,12 +1588,8 @@ async def action_report_weekly(callback: types.CallbackQuery, ctx: AppContext) -
     await callback.answer()
 
 
-@router.callback_query(F.data == "report_monthly")
+@callbacks.route("report_monthly")
 async def action_report_monthly(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     try:
         result = await get_report_from_gas(ctx, "monthly")
 
@@ -1616,26 +1621,26 @@ async def action_report_monthly(callback: types.CallbackQuery, ctx: AppContext)
     await callback.answer()
 
 
-@router.callback_query(F.data == "report_detailed")
+@callbacks.route("report_detailed")
 async def action_report_detailed(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     try:
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
                 [
                     InlineKeyboardButton(
-                        text="📅 Текущий месяц", callback_data="report_detailed_current"
+                        text="📅 Текущий месяц", callback_data=pack("report_detailed", "current")
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="📅 Предыдущий месяц", callback_data=pack("report_detailed", "last")
                     )
                 ],
                 [
                     InlineKeyboardButton(
-                        text="📅 Предыдущий месяц", callback_data="report_detailed_last"
+                        text="📅 За всё время", callback_data=pack("report_detailed", "all")
                     )
                 ],
-                [InlineKeyboardButton(text="📅 За всё время", callback_data="report_detailed_all")],
                 [InlineKeyboardButton(text="↩️ Назад", callback_data="report_menu")],
             ]
         )
@@ -1653,15 +1658,11 @@ async def action_report_detailed(callback: types.CallbackQuery, ctx: AppContext)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("report_detailed_"))
-async def action_report_detailed_period(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
+@callbacks.route("report_detailed", args={"period": str}, legacy="report_detailed_")
+async def action_report_detailed_period(
+    callback: types.CallbackQuery, ctx: AppContext, period: str
+) -> None:
     try:
-        period = callback.data.replace("report_detailed_", "")
-
         result = await get_report_from_gas(ctx, "detailed", period)
 
         if result["success"]:
@@ -1710,15 +1711,25 @@ async def action_report_detailed_period(callback: types.CallbackQuery, ctx: AppC
     await callback.answer()
 
 
-@router.callback_query(F.data == "report_quick_stats")
+@callbacks.route("report_quick_stats")
 async def action_report_quick_stats(callback: types.CallbackQuery, ctx: AppContext) -> None:
     await handle_admin_stats(callback, ctx)
 
 
-@router.callback_query(F.data == "report_setup_triggers")
+@callbacks.route("report_setup_triggers")
 async def action_report_setup_triggers(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
+    if ctx.scheduler is not None:
+        settings = ctx.settings
+        await callback.message.answer(
+            "✅ <b>Автозадачи выполняет бот</b>\n\n"
+            "📅 Расписание (cron):\n"
+            f"• Напоминания: <code>{settings.reminders_cron or 'выкл.'}</code>\n"
+            f"• Автоотмена: <code>{settings.auto_cancel_cron or 'выкл.'}</code>\n"
+            f"• Ежедневный отчет: <code>{settings.daily_report_cron or 'выкл.'}</code>\n\n"
+            "Триггеры Apps Script не нужны.",
+            parse_mode="HTML",
+        )
+        await callback.answer()
         return
 
     await callback.answer("🔄 Настраиваю автоотчеты...")
@@ -1742,12 +1753,8 @@ async def action_report_setup_triggers(callback: types.CallbackQuery, ctx: AppCo
     await callback.answer()
 
 
-@router.callback_query(F.data == "report_test_connection")
+@callbacks.route("report_test_connection")
 async def action_report_test_connection(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.answer("🔗 Тестирую подключение...")
 
     try:
@@ -1772,15 +1779,30 @@ async def action_report_test_connection(callback: types.CallbackQuery, ctx: AppC
         )
 
 
-@router.callback_query(F.data == "admin_auto_cancel")
-async def action_auto_cancel(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
+async def _run_scheduled_job(ctx: AppContext, name: str, gas_action: str) -> dict:
+    """Run a bot-side job now and shape its summary like the GAS reply.
+
+    Jobs the bot does not run itself (scheduler off, or the job's cron empty) are
+    still left to the GAS action.
+    """
+    if ctx.scheduler is None:
+        return await ctx.gas.request(gas_action, {})
+    try:
+        summary = await ctx.scheduler.run_now(name) or {}
+    except KeyError:
+        return await ctx.gas.request(gas_action, {})
+    except RuntimeError:
+        return {"status": "error", "message": "Задача уже выполняется"}
+    if summary.get("error"):
+        return {"status": "error", "message": summary["error"]}
+    return {"status": "success", "stats": summary, **summary}
+
 
+@callbacks.route("admin_auto_cancel")
+async def action_auto_cancel(callback: types.CallbackQuery, ctx: AppContext) -> None:
     await callback.message.edit_text("🔄 Запускаю автоотмену...")
 
-    result = await ctx.gas.request("auto_cancel", {})
+    result = await _run_scheduled_job(ctx, "auto_cancel", "auto_cancel")
 
     if result.get("status") == "success":
         message = f"✅ Автоотмена выполнена\nУдалено: {result.get('cancelled_count', 0)}"
@@ -1798,15 +1820,11 @@ async def action_auto_cancel(callback: types.CallbackQuery, ctx: AppContext) ->
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_send_reminders")
+@callbacks.route("admin_send_reminders")
 async def action_send_reminders(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.message.edit_text("🔔 Отправляю напоминания...")
 
-    result = await ctx.gas.request("send_reminders", {})
+    result = await _run_scheduled_job(ctx, "reminders", "send_reminders")
 
     if result.get("status") == "success":
         stats = result.get("stats", {})
@@ -1828,12 +1846,8 @@ async def action_send_reminders(callback: types.CallbackQuery, ctx: AppContext)
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_all_reviews")
+@callbacks.route("admin_all_reviews")
 async def handle_admin_all_reviews(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.answer("📝 Загружаю отзывы...")
 
     result = await get_reviews_gas(ctx, public_only=False, limit=20, mask_names=False)
@@ -1901,12 +1915,8 @@ async def handle_admin_all_reviews(callback: types.CallbackQuery, ctx: AppContex
         )
 
 
-@router.callback_query(F.data == "admin_review_stats")
+@callbacks.route("admin_review_stats")
 async def handle_admin_review_stats(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     await callback.answer("📈 Загружаю статистику...")
 
     result = await get_reviews_gas(ctx, public_only=False, limit=100, mask_names=False)
@@ -1960,12 +1970,8 @@ async def handle_admin_review_stats(callback: types.CallbackQuery, ctx: AppConte
         )
 
 
-@router.callback_query(F.data == "admin_help")
+@callbacks.route("admin_help")
 async def action_admin_help(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
     keyboard = _section_back_keyboard("system")
 
     await callback.message.edit_text(
@@ -1976,22 +1982,28 @@ async def action_admin_help(callback: types.CallbackQuery, ctx: AppContext) -> N
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("confirm_"))
-async def handle_confirm_payment(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    if not is_admin(ctx, callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-
-    record_id = callback.data.replace("confirm_", "")
-
+# The payment buttons in GAS-sent admin messages use the old `confirm_<record_id>` form.
+@callbacks.route("confirm", args={"record_id": str}, legacy="confirm_")
+async def handle_confirm_payment(
+    callback: types.CallbackQuery, ctx: AppContext, record_id: str
+) -> None:
     await callback.answer(f"Подтверждаем оплату {record_id}...")
 
+    # Scoped to the message with the button; without one, every tap is its own attempt.
+    if callback.message is not None:
+        key = payment_key(record_id, callback.message.chat.id, callback.message.message_id)
+    else:
+        key = new_idempotency_key("confirm_payment")
     result = await ctx.gas.request(
-        "confirm_payment", {"record_id": record_id, "admin_id": str(callback.from_user.id)}
+        "confirm_payment",
+        {"record_id": record_id, "admin_id": str(callback.from_user.id)},
+        idempotency_key=key,
     )
 
     if result.get("status") == "success":
-        if result.get("already_confirmed"):
+        # A second tap, here or by another admin: the client and admins already know.
+        repeated = bool(result.get("already_confirmed") or result.get(REPLAYED_FIELD))
+        if repeated:
             await callback.answer("✅ Оплата уже была подтверждена ранее", show_alert=True)
         else:
             await callback.answer("✅ Оплата подтверждена!", show_alert=True)
@@ -2000,9 +2012,10 @@ async def handle_confirm_payment(callback: types.CallbackQuery, ctx: AppContext)
         booking_date = result.get("booking_date", "")
         booking_time = result.get("booking_time", "")
 
-        await notify_admin_about_payment_confirmation(
-            ctx, record_id, client_name, callback.from_user.id
-        )
+        if not repeated:
+            await notify_admin_about_payment_confirmation(
+                ctx, record_id, client_name, callback.from_user.id
+            )
 
         await callback.message.edit_text(
             "✅ <b>Оплата подтверждена!</b>\n\n"
@@ -2025,7 +2038,7 @@ async def handle_confirm_payment(callback: types.CallbackQuery, ctx: AppContext)
 
         try:
             client_chat_id = result.get("client_chat_id")
-            if client_chat_id:
+            if client_chat_id and not repeated:
                 await ctx.bot.send_message(
                     chat_id=int(client_chat_id),
                     text=(
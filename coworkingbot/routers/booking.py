@@ -15,11 +15,14 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
 )
 
+from coworkingbot.app.callbacks import CallbackTable, pack
 from coworkingbot.app.context import AppContext
+from coworkingbot.app.update_queue import LATEST_WINS, RUN_TO_END, LatestWins
 from coworkingbot.keyboards.main import main_menu_keyboard, menu_only_keyboard
 from coworkingbot.services.common import is_admin, is_past_booking, now
 from coworkingbot.services.content_store import get_client_content
 from coworkingbot.services.errors import send_user_error
+from coworkingbot.services.gas_idempotency import REPLAYED_FIELD, new_idempotency_key
 from coworkingbot.services.notifications import (
     notify_admin_about_cancellation,
     notify_admin_about_conflict,
@@ -29,6 +32,7 @@ from coworkingbot.services.notifications import (
 logger = logging.getLogger(__name__)
 
 router = Router()
+callbacks = CallbackTable(router)
 
 
 class BookingStates(StatesGroup):
@@ -59,19 +63,16 @@ def parse_date(ctx: AppContext, date_str: str) -> tuple[datetime | None, str | N
         return None, "❌ Неверный формат даты. Используйте ДД.ММ.ГГГГ"
 
 
+_PHONE_NOISE_RE = re.compile(r"[\s\(\)\-+]")
+_PHONE_RE = re.compile(r"7\d{10}|8\d{10}|\+7\d{10}|9\d{9}")
+
+
 def validate_phone(phone: str) -> bool:
-    phone_clean = re.sub(r"[\s\(\)\-+]", "", phone)
-    patterns = [
-        r"^7\d{10}$",
-        r"^8\d{10}$",
-        r"^\+7\d{10}$",
-        r"^9\d{9}$",
-    ]
-    return any(re.match(pattern, phone_clean) for pattern in patterns)
+    return _PHONE_RE.fullmatch(_PHONE_NOISE_RE.sub("", phone)) is not None
 
 
 def format_phone(phone: str) -> str:
-    phone_clean = re.sub(r"[\s\(\)\-+]", "", phone)
+    phone_clean = _PHONE_NOISE_RE.sub("", phone)
 
     if phone_clean.startswith("8"):
         return "7" + phone_clean[1:]
@@ -168,10 +169,10 @@ def _build_my_bookings_keyboard(bookings: list[dict]) -> InlineKeyboardMarkup:
         buttons.append(
             [
                 InlineKeyboardButton(
-                    text=f"❌ Отменить {idx}", callback_data=f"booking_cancel:{record_id}"
+                    text=f"❌ Отменить {idx}", callback_data=pack("booking_cancel", record_id)
                 ),
                 InlineKeyboardButton(
-                    text=f"🔁 Перенести {idx}", callback_data=f"booking_reschedule:{record_id}"
+                    text=f"🔁 Перенести {idx}", callback_data=pack("booking_reschedule", record_id)
                 ),
             ]
         )
@@ -180,6 +181,27 @@ def _build_my_bookings_keyboard(bookings: list[dict]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def format_my_bookings(ctx: AppContext, bookings: list[dict], bot_username: str | None) -> str:
+    response = "📋 <b>Ваши брони</b>\n\n"
+    for i, booking in enumerate(bookings, 1):
+        status = booking.get("status", "Неизвестно")
+        status_emoji = "✅" if status == "Оплачено" else "⏳"
+        response += f"{i}. {status_emoji} <b>{booking.get('date')} {booking.get('time')}</b>\n"
+        response += f"   Статус: {status}\n"
+        if booking.get("price"):
+            response += f"   Цена: {booking.get('price')} ₽\n"
+        response += f"   🆔 {booking.get('id')}\n"
+
+        if status == "Оплачено" and is_past_booking(ctx, booking.get("date")):
+            response += (
+                "   📝 "
+                f"[Оставить отзыв](https://t.me/{bot_username}?start=review_{booking.get('id')})\n"
+            )
+
+        response += "\n"
+    return response
+
+
 async def send_my_bookings(message: types.Message, ctx: AppContext) -> None:
     user_id = message.from_user.id
     result = await ctx.gas.request("get_user_bookings", {"user_id": user_id, "active_only": False})
@@ -199,34 +221,15 @@ async def send_my_bookings(message: types.Message, ctx: AppContext) -> None:
         await message.answer("📭 У вас еще нет броней.", reply_markup=main_menu_keyboard())
         return
 
-    response = "📋 <b>Ваши брони</b>\n\n"
     bot_info = await ctx.bot.get_me()
-
-    for i, booking in enumerate(bookings[:10], 1):
-        status = booking.get("status", "Неизвестно")
-        status_emoji = "✅" if status == "Оплачено" else "⏳"
-        response += f"{i}. {status_emoji} <b>{booking.get('date')} {booking.get('time')}</b>\n"
-        response += f"   Статус: {status}\n"
-        if booking.get("price"):
-            response += f"   Цена: {booking.get('price')} ₽\n"
-        response += f"   🆔 {booking.get('id')}\n"
-
-        if status == "Оплачено" and is_past_booking(ctx, booking.get("date")):
-            response += (
-                "   📝 "
-                f"[Оставить отзыв](https://t.me/{bot_info.username}?start=review_{booking.get('id')})\n"
-            )
-
-        response += "\n"
-
     await message.answer(
-        response,
+        format_my_bookings(ctx, bookings[:10], bot_info.username),
         parse_mode="HTML",
         reply_markup=_build_my_bookings_keyboard(bookings[:10]),
     )
 
 
-@router.message(Command("my_bookings"))
+@router.message(Command("my_bookings"), flags={LATEST_WINS: True})
 async def cmd_my_bookings(message: types.Message, ctx: AppContext) -> None:
     await send_my_bookings(message, ctx)
 
@@ -330,7 +333,10 @@ async def send_confirmation(message: types.Message, state: FSMContext, ctx: AppC
     client_name = data.get("client_name") or _user_display_name(message.from_user)
     client_phone = data.get("client_phone")
 
-    await state.update_data(client_name=client_name)
+    # One key per set of details: pressing "Подтвердить" again is the same booking.
+    await state.update_data(
+        client_name=client_name, booking_key=new_idempotency_key("create_booking")
+    )
 
     phone_text = client_phone if client_phone else "<i>не указан</i>"
 
@@ -365,13 +371,20 @@ async def new_booking(message: types.Message, state: FSMContext, ctx: AppContext
     await start_booking_flow(message, state, ctx)
 
 
-@router.message(F.text == "🧾 Мои брони")
+@router.message(F.text == "🧾 Мои брони", flags={LATEST_WINS: True})
 async def handle_my_bookings_button(message: types.Message, ctx: AppContext) -> None:
     await send_my_bookings(message, ctx)
 
 
+# Only the free-slot lookup gives way to a newer message; the state changes after
+# it run to the end, so the next message sees a consistent step.
 @router.message(BookingStates.choosing_date)
-async def process_date(message: types.Message, state: FSMContext, ctx: AppContext) -> None:
+async def process_date(
+    message: types.Message,
+    state: FSMContext,
+    ctx: AppContext,
+    latest_wins: LatestWins = RUN_TO_END,
+) -> None:
     date_str = message.text.strip()
     parsed_date, error = parse_date(ctx, date_str)
 
@@ -388,13 +401,15 @@ async def process_date(message: types.Message, state: FSMContext, ctx: AppContex
         )
         return
 
-    await state.update_data(booking_date=parsed_date, date_str=date_str)
+    await state.update_data(date_str=date_str)
 
     await message.answer(
         f"📅 Дата: <b>{date_str}</b>\n🔍 <i>Ищу свободное время...</i>", parse_mode="HTML"
     )
 
-    free_slots = await get_free_slots_for_date(ctx, date_str)
+    free_slots = await latest_wins(lambda: get_free_slots_for_date(ctx, date_str))
+    if free_slots is None:
+        return
 
     if not free_slots:
         await message.answer(
@@ -414,7 +429,12 @@ async def process_date(message: types.Message, state: FSMContext, ctx: AppContex
 
 
 @router.message(BookingStates.choosing_time)
-async def process_time(message: types.Message, state: FSMContext, ctx: AppContext) -> None:
+async def process_time(
+    message: types.Message,
+    state: FSMContext,
+    ctx: AppContext,
+    latest_wins: LatestWins = RUN_TO_END,
+) -> None:
     selected_slot = message.text.strip()
 
     data = await state.get_data()
@@ -426,7 +446,9 @@ async def process_time(message: types.Message, state: FSMContext, ctx: AppContex
         return
 
     if selected_slot not in free_slots:
-        current_free_slots = await get_free_slots_for_date(ctx, date_str)
+        current_free_slots = await latest_wins(lambda: get_free_slots_for_date(ctx, date_str))
+        if current_free_slots is None:
+            return
 
         if selected_slot in current_free_slots:
             await state.update_data(free_slots=current_free_slots)
@@ -553,7 +575,9 @@ async def process_confirmation(message: types.Message, state: FSMContext, ctx: A
             "user_id": str(message.from_user.id),
         }
 
-        result = await ctx.gas.request("create_booking", booking_data)
+        result = await ctx.gas.request(
+            "create_booking", booking_data, idempotency_key=data.get("booking_key")
+        )
 
         if result.get("status") == "success":
             record_id = result.get("record_id", "")
@@ -577,21 +601,37 @@ async def process_confirmation(message: types.Message, state: FSMContext, ctx: A
                 ),
             )
 
-            logger.info("Created booking: %s (ID: %s)", booking_data, record_id)
+            logger.info(
+                "Created booking %s: %s %s for user %s",
+                record_id,
+                booking_data["date"],
+                booking_data["time"],
+                booking_data["user_id"],
+            )
 
-            await notify_admin_about_new_booking(ctx, booking_data, record_id, message.from_user.id)
+            if not result.get(REPLAYED_FIELD):
+                await notify_admin_about_new_booking(
+                    ctx, booking_data, record_id, message.from_user.id
+                )
 
         else:
             result_message = str(result.get("message", ""))
-            if "конфликт" in result_message.lower() or "slot" in result_message.lower():
+            conflict = "конфликт" in result_message.lower() or "slot" in result_message.lower()
+            if conflict:
                 await notify_admin_about_conflict(ctx, f"create_booking conflict: {result}")
             await send_user_error(
                 message,
                 ctx,
-                "⚠️ Не удалось создать бронь. Попробуйте позже.",
+                "⚠️ Не удалось создать бронь. Попробуйте позже."
+                if conflict
+                else "⚠️ Не удалось создать бронь. Нажмите «✅ Подтвердить» ещё раз чуть позже.",
                 f"create_booking failed: {result}",
                 "create_booking",
             )
+            if not conflict:
+                # Keep the confirmation and its key: pressing "Подтвердить" again sends
+                # the same booking, which GAS does not create twice.
+                return
 
         await state.clear()
         return
@@ -739,15 +779,25 @@ async def cmd_cancel(message: types.Message, ctx: AppContext) -> None:
 async def cancel_booking_by_admin(
     message: types.Message, record_id: str, admin_id: int, ctx: AppContext
 ) -> None:
-    booking_info = await ctx.gas.request("get_booking_info", {"record_id": record_id})
+    cancel_payload = {"record_id": record_id, "admin_id": str(admin_id), "force": True}
+    if ctx.gas.batch_enabled:
+        booking_info, cancel_result = await ctx.gas.batch(
+            [
+                ("get_booking_info", {"record_id": record_id}),
+                ("cancel_booking", cancel_payload),
+            ],
+            stop_on_error=True,
+        )
+    else:
+        booking_info = await ctx.gas.request("get_booking_info", {"record_id": record_id})
+        cancel_result = None
 
     if booking_info.get("status") != "success":
         await message.answer(f"❌ Бронь не найдена: {record_id}")
         return
 
-    cancel_result = await ctx.gas.request(
-        "cancel_booking", {"record_id": record_id, "admin_id": str(admin_id), "force": True}
-    )
+    if cancel_result is None:
+        cancel_result = await ctx.gas.request("cancel_booking", cancel_payload)
 
     if cancel_result.get("status") == "success":
         client_name = booking_info.get("client_name", "Неизвестно")
@@ -819,7 +869,7 @@ async def handle_stats_button(message: types.Message) -> None:
     )
 
 
-@router.callback_query(F.data == "leave_review_info")
+@callbacks.route("leave_review_info")
 async def action_leave_review_info(callback: types.CallbackQuery) -> None:
     info_text = (
         "⭐️ <b>Как оставить отзыв?</b>\n\n"
@@ -848,20 +898,21 @@ async def action_leave_review_info(callback: types.CallbackQuery) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "my_bookings_callback")
+@callbacks.route("my_bookings_callback")
 async def action_my_bookings_callback(callback: types.CallbackQuery, ctx: AppContext) -> None:
     await send_my_bookings(callback.message, ctx)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("booking_cancel:"))
-async def action_booking_cancel(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    record_id = callback.data.split("booking_cancel:", 1)[-1]
+@callbacks.route("booking_cancel", args={"record_id": str})
+async def action_booking_cancel(
+    callback: types.CallbackQuery, ctx: AppContext, record_id: str
+) -> None:
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text="✅ Да, отменить", callback_data=f"booking_cancel_confirm:{record_id}"
+                    text="✅ Да, отменить", callback_data=pack("booking_cancel_confirm", record_id)
                 ),
                 InlineKeyboardButton(text="↩️ Назад", callback_data="my_bookings_callback"),
             ],
@@ -874,15 +925,16 @@ async def action_booking_cancel(callback: types.CallbackQuery, ctx: AppContext)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("booking_reschedule:"))
-async def action_booking_reschedule(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    record_id = callback.data.split("booking_reschedule:", 1)[-1]
+@callbacks.route("booking_reschedule", args={"record_id": str})
+async def action_booking_reschedule(
+    callback: types.CallbackQuery, ctx: AppContext, record_id: str
+) -> None:
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
                     text="✅ Да, перенести",
-                    callback_data=f"booking_reschedule_confirm:{record_id}",
+                    callback_data=pack("booking_reschedule_confirm", record_id),
                 ),
                 InlineKeyboardButton(text="↩️ Назад", callback_data="my_bookings_callback"),
             ],
@@ -896,19 +948,49 @@ async def action_booking_reschedule(callback: types.CallbackQuery, ctx: AppConte
     await callback.answer()
 
 
-async def _find_user_booking(ctx: AppContext, user_id: int, record_id: str) -> dict | None:
-    result = await ctx.gas.request("get_user_bookings", {"user_id": user_id, "active_only": False})
+def _pick_booking(result: dict, record_id: str) -> dict | None:
     if result.get("status") != "success":
         return None
     bookings = result.get("bookings", [])
     return next((b for b in bookings if b.get("id") == record_id), None)
 
 
-@router.callback_query(F.data.startswith("booking_cancel_confirm:"))
-async def action_booking_cancel_confirm(callback: types.CallbackQuery, ctx: AppContext) -> None:
-    record_id = callback.data.split("booking_cancel_confirm:", 1)[-1]
+async def _find_user_booking(ctx: AppContext, user_id: int, record_id: str) -> dict | None:
+    result = await ctx.gas.request("get_user_bookings", {"user_id": user_id, "active_only": False})
+    return _pick_booking(result, record_id)
+
+
+async def _cancel_user_booking(
+    ctx: AppContext, user_id: int, record_id: str
+) -> tuple[dict | None, dict | None]:
+    """Look up the user's booking and cancel it; the cancel result is None when skipped."""
+    cancel_payload = {"record_id": record_id, "user_id": str(user_id)}
+    if not ctx.gas.batch_enabled:
+        booking = await _find_user_booking(ctx, user_id, record_id)
+        if not booking or booking.get("status") == "Оплачено":
+            return booking, None
+        return booking, await ctx.gas.request("cancel_booking", cancel_payload)
+
+    # One round trip: the batch dispatcher checks ownership and refuses paid bookings itself.
+    lookup, cancel_result = await ctx.gas.batch(
+        [
+            ("get_user_bookings", {"user_id": user_id, "active_only": False}),
+            ("cancel_booking", {**cancel_payload, "only_unpaid": True}),
+        ],
+        stop_on_error=True,
+    )
+    booking = _pick_booking(lookup, record_id)
+    if not booking or booking.get("status") == "Оплачено":
+        return booking, None
+    return booking, cancel_result
+
+
+@callbacks.route("booking_cancel_confirm", args={"record_id": str})
+async def action_booking_cancel_confirm(
+    callback: types.CallbackQuery, ctx: AppContext, record_id: str
+) -> None:
     user_id = callback.from_user.id
-    booking = await _find_user_booking(ctx, user_id, record_id)
+    booking, cancel_result = await _cancel_user_booking(ctx, user_id, record_id)
 
     if not booking:
         await callback.message.edit_text(
@@ -934,10 +1016,6 @@ async def action_booking_cancel_confirm(callback: types.CallbackQuery, ctx: AppC
         await callback.answer()
         return
 
-    cancel_result = await ctx.gas.request(
-        "cancel_booking", {"record_id": record_id, "user_id": str(user_id)}
-    )
-
     if cancel_result.get("status") == "success":
         await callback.message.edit_text(
             "✅ Бронь отменена.",
@@ -968,13 +1046,12 @@ async def action_booking_cancel_confirm(callback: types.CallbackQuery, ctx: AppC
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("booking_reschedule_confirm:"))
+@callbacks.route("booking_reschedule_confirm", args={"record_id": str})
 async def action_booking_reschedule_confirm(
-    callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
+    callback: types.CallbackQuery, state: FSMContext, ctx: AppContext, record_id: str
 ) -> None:
-    record_id = callback.data.split("booking_reschedule_confirm:", 1)[-1]
     user_id = callback.from_user.id
-    booking = await _find_user_booking(ctx, user_id, record_id)
+    booking, cancel_result = await _cancel_user_booking(ctx, user_id, record_id)
 
     if not booking:
         await callback.message.edit_text(
@@ -1000,10 +1077,6 @@ async def action_booking_reschedule_confirm(
         await callback.answer()
         return
 
-    cancel_result = await ctx.gas.request(
-        "cancel_booking", {"record_id": record_id, "user_id": str(user_id)}
-    )
-
     if cancel_result.get("status") == "success":
         await notify_admin_about_cancellation(ctx, record_id, booking, user_id, reason="переносом")
         content = await get_client_content(ctx)
@@ -1036,7 +1109,7 @@ async def action_booking_reschedule_confirm(
     await callback.answer()
 
 
-@router.callback_query(F.data == "reviews_back")
+@callbacks.route("reviews_back")
 async def action_reviews_back(callback: types.CallbackQuery, ctx: AppContext) -> None:
     await cmd_reviews(callback.message, ctx)
     await callback.answer()
@@ -4,11 +4,13 @@ from aiogram import F, Router, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
+from coworkingbot.app.callbacks import CallbackTable
 from coworkingbot.app.context import AppContext
 from coworkingbot.keyboards.main import main_menu_keyboard
 from coworkingbot.services.content_store import get_client_content
 
 router = Router()
+callbacks = CallbackTable(router)
 
 
 async def send_main_menu(
@@ -32,7 +34,7 @@ async def cmd_start(message: types.Message, state: FSMContext, ctx: AppContext)
     await send_main_menu(message, ctx, state)
 
 
-@router.callback_query(F.data == "main_menu")
+@callbacks.route("main_menu")
 async def handle_main_menu(
     callback: types.CallbackQuery, state: FSMContext, ctx: AppContext
 ) -> None:
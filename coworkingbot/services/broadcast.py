@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API limits: ~30 messages/s overall, ~1 message/s into one chat.
+GLOBAL_RATE_PER_SECOND = 30.0
+PER_CHAT_RATE_PER_SECOND = 1.0
+QUEUE_SIZE = 1000
+WORKERS = 8
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 1.0
+DRAIN_TIMEOUT_SECONDS = 10
+# Per-chat slots older than this are forgotten so the table does not grow forever.
+CHAT_SLOT_TTL_SECONDS = 60
+
+
+class RateLimiter:
+    """Hand out send slots at a fixed rate, per chat and globally.
+
+    Per-chat slots are reserved in call order, so messages to one chat keep their
+    order even when several workers pick them up. The global slot is taken only once
+    the chat slot has come, so a busy chat does not hold back everybody else.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = GLOBAL_RATE_PER_SECOND,
+        per_chat_rate: float = PER_CHAT_RATE_PER_SECOND,
+    ) -> None:
+        self._global_interval = 1.0 / global_rate
+        self._chat_interval = 1.0 / per_chat_rate
+        self._global_next = 0.0
+        self._chat_next: dict[int, float] = {}
+
+    def reserve_chat(self, chat_id: int) -> float:
+        """Monotonic time from which a message to `chat_id` may go out."""
+        current = time.monotonic()
+        slot = max(current, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + self._chat_interval
+        if len(self._chat_next) > 1000:
+            cutoff = current - CHAT_SLOT_TTL_SECONDS
+            self._chat_next = {k: v for k, v in self._chat_next.items() if v > cutoff}
+        return slot
+
+    def reserve_global(self) -> float:
+        slot = max(time.monotonic(), self._global_next)
+        self._global_next = slot + self._global_interval
+        return slot
+
+    async def wait(self, chat_id: int) -> None:
+        delay = self.reserve_chat(chat_id) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        delay = self.reserve_global() - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Flood control applies to the whole bot: push every future slot back."""
+        self._global_next = max(self._global_next, time.monotonic() + seconds)
+
+
+@dataclass
+class _Message:
+    chat_id: int
+    text: str
+    kwargs: dict[str, Any]
+    done: asyncio.Future[bool] | None = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def _resolve(message: _Message, ok: bool) -> None:
+    if message.done is not None and not message.done.done():
+        message.done.set_result(ok)
+
+
+@dataclass
+class DeliveryStats:
+    queued: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    dropped: int = 0
+    flood_waits: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def as_dict(self, queue_depth: int) -> dict[str, Any]:
+        recent = sorted(self.latencies[-200:])
+        p95 = recent[int(len(recent) * 0.95) - 1] if recent else 0.0
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "flood_waits": self.flood_waits,
+            "depth": queue_depth,
+            "p95_seconds": round(p95, 2),
+        }
+
+
+class NotificationDispatcher:
+    """Send Telegram messages from a bounded queue with a small pool of workers.
+
+    `submit` never waits for Telegram, so a booking handler that raises an alert is
+    not slowed down by the API; `deliver` waits for the outcome when it matters.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        queue_size: int = QUEUE_SIZE,
+        workers: int = WORKERS,
+        max_attempts: int = MAX_ATTEMPTS,
+        limiter: RateLimiter | None = None,
+    ) -> None:
+        self._bot = bot
+        self._queue: asyncio.Queue[_Message] = asyncio.Queue(maxsize=queue_size)
+        self._workers = workers
+        self._max_attempts = max_attempts
+        self._limiter = limiter or RateLimiter()
+        self._tasks: list[asyncio.Task[None]] = []
+        self.stats = DeliveryStats()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"notify-{i}") for i in range(self._workers)
+        ]
+
+    async def stop(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> None:
+        """Give queued messages `timeout` seconds to go out, then stop the workers.
+
+        Messages still queued or being sent after that are dropped; their
+        `deliver` calls return False.
+        """
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except TimeoutError:
+            logger.warning("Dropping %s undelivered notifications", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            message = self._queue.get_nowait()
+            self.stats.dropped += 1
+            _resolve(message, False)
+            self._queue.task_done()
+
+    def submit(self, chat_id: int, text: str, **kwargs: Any) -> bool:
+        """Queue a message; False when the queue is full and the message is dropped."""
+        return self._enqueue(_Message(chat_id, text, kwargs)) is not None
+
+    async def deliver(self, chat_id: int, text: str, **kwargs: Any) -> bool:
+        """Queue a message and wait until it is sent (True) or given up on (False)."""
+        done = asyncio.get_running_loop().create_future()
+        if self._enqueue(_Message(chat_id, text, kwargs, done)) is None:
+            return False
+        return await done
+
+    def snapshot(self) -> dict[str, Any]:
+        return self.stats.as_dict(self._queue.qsize())
+
+    def _enqueue(self, message: _Message) -> _Message | None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            logger.error("Notification queue full, dropped message to %s", message.chat_id)
+            return None
+        self.stats.queued += 1
+        return message
+
+    async def _worker(self) -> None:
+        while True:
+            message = await self._queue.get()
+            ok = False
+            try:
+                ok = await self._send(message)
+                self.stats.latencies.append(time.monotonic() - message.enqueued_at)
+                del self.stats.latencies[:-1000]
+            finally:
+                # Also when the worker is cancelled mid-send, so `deliver` never hangs.
+                _resolve(message, ok)
+                self._queue.task_done()
+
+    async def _send(self, message: _Message) -> bool:
+        while True:
+            message.attempts += 1
+            await self._limiter.wait(message.chat_id)
+            try:
+                await self._bot.send_message(
+                    chat_id=message.chat_id, text=message.text, **message.kwargs
+                )
+                self.stats.sent += 1
+                return True
+            except TelegramRetryAfter as exc:
+                self.stats.flood_waits += 1
+                self._limiter.pause(exc.retry_after)
+                wait = 0.0
+            except (TelegramNetworkError, TelegramServerError) as exc:
+                logger.warning("Notification to %s failed: %s", message.chat_id, exc)
+                wait = BACKOFF_BASE_SECONDS * 2 ** (message.attempts - 1)
+                wait += random.uniform(0, BACKOFF_BASE_SECONDS)
+            except Exception as exc:
+                # Blocked bot, bad chat id, malformed HTML: retrying will not help.
+                logger.error("Failed to notify chat %s: %s", message.chat_id, exc)
+                self.stats.failed += 1
+                return False
+            if message.attempts >= self._max_attempts:
+                logger.error(
+                    "Giving up on chat %s after %s attempts", message.chat_id, message.attempts
+                )
+                self.stats.failed += 1
+                return False
+            self.stats.retried += 1
+            if wait:
+                await asyncio.sleep(wait)
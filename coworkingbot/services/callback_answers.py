@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import AnswerCallbackQuery, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logger = logging.getLogger(__name__)
+
+# Callback queries can only be answered for a short while; a few thousand ids is plenty.
+REMEMBERED_QUERIES = 4096
+
+
+class CallbackAnswers:
+    """Ids of callback queries that have already been answered (or are being answered),
+    and the chat each query came from, for alerts that arrive too late.
+    """
+
+    def __init__(self, size: int = REMEMBERED_QUERIES) -> None:
+        self._size = size
+        self._answered: OrderedDict[str, None] = OrderedDict()
+        self._chats: OrderedDict[str, int] = OrderedDict()
+        self.duplicates = 0
+        self.late_alerts = 0
+
+    def remember_chat(self, query_id: str, chat_id: int) -> None:
+        self._chats[query_id] = chat_id
+        if len(self._chats) > self._size:
+            self._chats.popitem(last=False)
+
+    def chat_for(self, query_id: str) -> int | None:
+        return self._chats.get(query_id)
+
+    def answered(self, query_id: str) -> bool:
+        return query_id in self._answered
+
+    def claim(self, query_id: str) -> bool:
+        """True for the first answer to `query_id`, False for every later one."""
+        if query_id in self._answered:
+            self.duplicates += 1
+            return False
+        self._answered[query_id] = None
+        if len(self._answered) > self._size:
+            self._answered.popitem(last=False)
+        return True
+
+
+class CallbackAnswerDedupe(BaseRequestMiddleware):
+    """Sends only the first answerCallbackQuery per query; later ones succeed locally.
+
+    Telegram rejects a second answer ("query is too old or already answered"), and
+    with early acks a handler's own `callback.answer()` is often the second one.
+    A late alert (`show_alert=True`) is sent to the chat as a message instead, so
+    error alerts after a GAS call still reach the user; late toasts are dropped.
+    """
+
+    def __init__(self, answers: CallbackAnswers) -> None:
+        self._answers = answers
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if isinstance(method, AnswerCallbackQuery) and not self._answers.claim(
+            method.callback_query_id
+        ):
+            chat_id = self._answers.chat_for(method.callback_query_id)
+            if method.text and method.show_alert and chat_id is not None:
+                await self._send_late_alert(bot, chat_id, method.text)
+            elif method.text:
+                logger.debug(
+                    "Dropped late callback answer %r (query already answered)", method.text
+                )
+            return Response[TelegramType](ok=True, result=True)
+        return await make_request(bot, method)
+
+    async def _send_late_alert(self, bot: Bot, chat_id: int, text: str) -> None:
+        self._answers.late_alerts += 1
+        try:
+            await bot.send_message(chat_id, text)
+        except TelegramAPIError as exc:
+            logger.warning("Could not send late callback alert to %s: %s", chat_id, exc)
@@ -1,49 +1,508 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import random
+import time
+from collections import defaultdict
+from collections.abc import Callable, Sequence
 from typing import Any
 
 import aiohttp
 
+from coworkingbot.services.gas_breaker import CircuitBreaker, LatencyTracker
+from coworkingbot.services.gas_cache import FREE_SLOTS_TTL_SECONDS, SlotCache
+from coworkingbot.services.gas_coalesce import SingleFlight, request_key
+from coworkingbot.services.gas_idempotency import (
+    IDEMPOTENCY_FIELD,
+    WriteResults,
+    new_idempotency_key,
+)
+from coworkingbot.services.replica import MAX_STALENESS_SECONDS, REPLICA_ACTIONS, BookingReplica
+from coworkingbot.services.tracing import TRACE_HEADER, current_trace_id, span
+
 logger = logging.getLogger(__name__)
 
+REQUEST_TIMEOUT_SECONDS = 10
+POOL_LIMIT = 20
+POOL_LIMIT_PER_HOST = 10
+DNS_CACHE_TTL_SECONDS = 300
+KEEPALIVE_TIMEOUT_SECONDS = 60
+READ_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 0.3
+# No retry is started once a read has been going on for this long.
+RETRY_BUDGET_SECONDS = 12
+# Writes with an idempotency key, when Apps Script dedupes them (GAS_IDEMPOTENT_WRITES).
+# The budget leaves room for one retry after a full request timeout.
+WRITE_ATTEMPTS = 4
+WRITE_RETRY_BUDGET_SECONDS = 25
+# GAS error pages can be large and echo request fields back; log only the head.
+RESPONSE_LOG_CHARS = 300
+
+# Actions that change slot availability; a payload without "date" drops the whole cache.
+SLOT_MUTATING_ACTIONS = frozenset(
+    {
+        "create_booking",
+        "cancel_booking",
+        "add_exception",
+        "remove_exception",
+        "auto_cancel",
+        "update_settings",
+    }
+)
+
+# Writes that make the local booking replica stale (payment status included).
+BOOKING_MUTATING_ACTIONS = SLOT_MUTATING_ACTIONS | {"confirm_payment"}
+
+# Explicit allowlist: only side-effect-free actions may share an in-flight request.
+# Anything that writes (create_booking, confirm_payment, ...) must never be coalesced.
+COALESCED_ACTIONS = frozenset(
+    {
+        "get_free_slots",
+        "get_busy_slots",
+        "get_user_bookings",
+        "get_today_bookings",
+        "get_booking_info",
+        "get_changes",
+        "get_reminder_targets",
+        "get_reviews",
+        "get_stats",
+        "get_report",
+        "get_exceptions",
+        "get_settings",
+        "list_banned_users",
+        "test_connection",
+    }
+)
+
+
+class GasTransportError(Exception):
+    """GAS did not give a usable reply (timeout, network, HTTP or JSON error)."""
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
 
 class GasClient:
-    def __init__(self, base_url: str, api_token: str) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        api_token: str,
+        *,
+        timeout: float = REQUEST_TIMEOUT_SECONDS,
+        pool_limit: int = POOL_LIMIT,
+        pool_limit_per_host: int = POOL_LIMIT_PER_HOST,
+        slots_ttl: float = FREE_SLOTS_TTL_SECONDS,
+        batch_enabled: bool = False,
+        hedging: bool = False,
+        idempotent_writes: bool = False,
+    ) -> None:
         self._base_url = base_url
         self._api_token = api_token
+        self._timeout = timeout
+        self._pool_limit = pool_limit
+        self._pool_limit_per_host = pool_limit_per_host
+        self._session: aiohttp.ClientSession | None = None
+        self._connections_created = 0
+        self._connections_reused = 0
+        self.slots = SlotCache(slots_ttl)
+        self._flights = SingleFlight()
+        self._batch_enabled = batch_enabled
+        self._replica: BookingReplica | None = None
+        self._replica_max_staleness = MAX_STALENESS_SECONDS
+        self._hedging = hedging
+        self._idempotent_writes = idempotent_writes
+        self.writes = WriteResults()
+        self._write_flights = SingleFlight()
+        self._breakers: defaultdict[str, CircuitBreaker] = defaultdict(CircuitBreaker)
+        self._latency: defaultdict[str, LatencyTracker] = defaultdict(LatencyTracker)
+        self.retries = 0
+        self.hedged = 0
+        self._hooks: list[Callable[[str, float, str], None]] = []
+
+    @property
+    def batch_enabled(self) -> bool:
+        """True when the deployed Apps Script understands the `batch` action."""
+        return self._batch_enabled
+
+    @property
+    def replica(self) -> BookingReplica | None:
+        return self._replica
+
+    def attach_replica(
+        self, replica: BookingReplica, max_staleness: float = MAX_STALENESS_SECONDS
+    ) -> None:
+        """Serve reads from the local mirror while it is at most `max_staleness` seconds old."""
+        self._replica = replica
+        self._replica_max_staleness = max_staleness
+
+    async def start(self) -> None:
+        """Open the shared session; Apps Script sits behind TLS, so handshakes are costly."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self._pool_limit,
+            limit_per_host=self._pool_limit_per_host,
+            ttl_dns_cache=DNS_CACHE_TTL_SECONDS,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS,
+            enable_cleanup_closed=True,
+        )
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_created)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self._timeout),
+            trace_configs=[trace_config],
+        )
+
+    async def close(self) -> None:
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        if not session.closed:
+            await session.close()
+
+    def cache_stats(self) -> dict[str, int]:
+        return self.slots.stats()
 
-    async def request(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
+    def coalesce_stats(self) -> dict[str, int]:
+        return self._flights.stats()
+
+    def write_stats(self) -> dict[str, int]:
+        return self.writes.stats()
+
+    def add_hook(self, hook: Callable[[str, float, str], None]) -> None:
+        """Call `hook(action, seconds, outcome)` after every GAS call that went out.
+
+        Outcomes: ok, error (GAS replied with an error), transport, breaker_open.
+        """
+        self._hooks.append(hook)
+
+    def breaker_stats(self) -> dict[str, dict[str, object]]:
+        return {
+            action: {
+                "state": breaker.state,
+                "retry_in": round(breaker.retry_in(), 1),
+                "opened": breaker.opened,
+                "rejected": breaker.rejected,
+                "p95": self._latency[action].percentile(0.95),
+            }
+            for action, breaker in sorted(self._breakers.items())
+        }
+
+    def pool_stats(self) -> dict[str, int]:
+        stats = {
+            "limit": self._pool_limit,
+            "limit_per_host": self._pool_limit_per_host,
+            "acquired": 0,
+            "idle": 0,
+            "created": self._connections_created,
+            "reused": self._connections_reused,
+        }
+        session = self._session
+        if session is None or session.closed:
+            return stats
+        connector = session.connector
+        # aiohttp has no public pool introspection, so read the connector internals defensively.
+        stats["acquired"] = len(getattr(connector, "_acquired", ()))
+        stats["idle"] = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+        return stats
+
+    async def _on_connection_created(self, *_: Any) -> None:
+        self._connections_created += 1
+
+    async def _on_connection_reused(self, *_: Any) -> None:
+        self._connections_reused += 1
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    def _check_config(self) -> None:
         if not self._base_url:
             raise RuntimeError("GAS_WEBAPP_URL is empty (check /etc/default/coworking-bot)")
         if not self._api_token:
             raise RuntimeError("API_TOKEN is empty (check /etc/default/coworking-bot)")
 
+    async def request(
+        self, action: str, payload: dict[str, Any], *, idempotency_key: str | None = None
+    ) -> dict[str, Any]:
+        """Call one GAS action.
+
+        Writes (anything not in COALESCED_ACTIONS) carry an idempotency key: pass
+        the one saved with the user's intent so that a repeated submit is the same
+        write, or let each call get a fresh one.
+        """
+        with span("gas"):
+            return await self._request(action, payload, idempotency_key)
+
+    async def _request(
+        self, action: str, payload: dict[str, Any], idempotency_key: str | None = None
+    ) -> dict[str, Any]:
+        self._check_config()
+
+        local = self._read_replica(action, payload)
+        if local is not None:
+            return local
+
+        if action == "get_free_slots":
+            return await self._request_free_slots(payload)
+
+        if action in COALESCED_ACTIONS:
+            return await self._send_coalesced(action, payload)
+
+        result = await self._send_write(action, payload, idempotency_key)
+        self._after_write(action, payload)
+        return result
+
+    async def batch(
+        self, calls: Sequence[tuple[str, dict[str, Any]]], *, stop_on_error: bool = False
+    ) -> list[dict[str, Any]]:
+        """Run several actions in one POST and return one result per call, in order.
+
+        Contract of the Apps Script `batch` dispatcher (see README_RUNBOOK.md):
+        request `{"action": "batch", "calls": [{"action": ..., **payload}], "stop_on_error": bool}`,
+        reply `{"status": "success", "results": [...]}` where each entry is exactly what
+        the single action would have returned, and `{"status": "skipped"}` for calls
+        left out after a failure when `stop_on_error` is set.
+        """
+        with span("gas"):
+            return await self._batch(calls, stop_on_error)
+
+    async def _batch(
+        self, calls: Sequence[tuple[str, dict[str, Any]]], stop_on_error: bool
+    ) -> list[dict[str, Any]]:
+        self._check_config()
+
+        body = {
+            "calls": [
+                {"action": action, **self._with_key(action, payload)} for action, payload in calls
+            ],
+            "stop_on_error": stop_on_error,
+        }
+        reply = await self._send("batch", body)
+        results = reply.get("results")
+        if (
+            reply.get("status") != "success"
+            or not isinstance(results, list)
+            or len(results) != len(calls)
+        ):
+            logger.error("Malformed GAS batch reply: %s", reply)
+            message = reply.get("message") or "Некорректный ответ сервера на пакетный запрос"
+            results = [{"status": "error", "message": message} for _ in calls]
+        results = [
+            item if isinstance(item, dict) else {"status": "error", "message": str(item)}
+            for item in results
+        ]
+
+        for action, payload in calls:
+            self._after_write(action, payload)
+        return results
+
+    def _read_replica(self, action: str, payload: dict[str, Any]) -> dict[str, Any] | None:
+        replica = self._replica
+        if replica is None or action not in REPLICA_ACTIONS:
+            return None
+        if not replica.is_fresh(self._replica_max_staleness):
+            return None
+        try:
+            return replica.answer(action, payload)
+        except Exception as exc:
+            logger.error("Replica read failed for %s, falling back to GAS: %s", action, exc)
+            return None
+
+    def _after_write(self, action: str, payload: dict[str, Any]) -> None:
+        if action in SLOT_MUTATING_ACTIONS:
+            self.slots.invalidate(payload.get("date"))
+        if self._replica is not None and action in BOOKING_MUTATING_ACTIONS:
+            self._replica.mark_dirty()
+
+    async def _request_free_slots(self, payload: dict[str, Any]) -> dict[str, Any]:
+        date_str = str(payload.get("date", ""))
+        cached = self.slots.get(date_str)
+        if cached is not None:
+            return dict(cached)
+
+        generation = self.slots.generation
+        result = await self._send_coalesced("get_free_slots", payload)
+        if result.get("status") == "success":
+            self.slots.put(date_str, result, generation)
+        return result
+
+    async def _send_coalesced(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
+        if action not in COALESCED_ACTIONS:
+            return await self._send(action, payload)
+        return await self._flights.run(
+            request_key(action, payload), lambda: self._send(action, payload)
+        )
+
+    @staticmethod
+    def _with_key(action: str, payload: dict[str, Any]) -> dict[str, Any]:
+        if action in COALESCED_ACTIONS or IDEMPOTENCY_FIELD in payload:
+            return payload
+        return {**payload, IDEMPOTENCY_FIELD: new_idempotency_key(action)}
+
+    async def _send_write(
+        self, action: str, payload: dict[str, Any], idempotency_key: str | None
+    ) -> dict[str, Any]:
+        """Send a write once per key: repeats get the saved reply or join the one in flight."""
+        key = idempotency_key or new_idempotency_key(action)
+        saved = self.writes.get(key)
+        if saved is not None:
+            logger.info("GAS %s %s answered from recent writes", action, key)
+            return saved
+
+        async def send() -> dict[str, Any]:
+            reply = await self._send(action, {**payload, IDEMPOTENCY_FIELD: key})
+            self.writes.put(key, reply)
+            return reply
+
+        return await self._write_flights.run(key, send)
+
+    def _retryable(self, action: str, payload: dict[str, Any]) -> bool:
+        """Reads, and writes that Apps Script dedupes by key, may be sent more than once."""
+        if action in COALESCED_ACTIONS:
+            return True
+        if not self._idempotent_writes:
+            return False
+        if action == "batch":
+            return all(
+                call.get("action") in COALESCED_ACTIONS or IDEMPOTENCY_FIELD in call
+                for call in payload.get("calls", ())
+            )
+        return IDEMPOTENCY_FIELD in payload
+
+    async def _send(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
+        started = time.monotonic()
+        reply, outcome = await self._send_resilient(action, payload)
+        if outcome == "ok" and reply.get("status") == "error":
+            outcome = "error"
+        for hook in self._hooks:
+            hook(action, time.monotonic() - started, outcome)
+        return reply
+
+    async def _send_resilient(
+        self, action: str, payload: dict[str, Any]
+    ) -> tuple[dict[str, Any], str]:
+        """One logical call: breaker check, then retries and hedging for reads."""
+        breaker = self._breakers[action]
+        if not breaker.allow():
+            logger.warning("GAS breaker open for %s, failing fast", action)
+            return {
+                "status": "error",
+                "message": "Сервер временно недоступен. Попробуйте через минуту.",
+            }, "breaker_open"
+
+        # Only side-effect-free actions may be hedged; keyed writes may be retried.
+        idempotent = action in COALESCED_ACTIONS
+        if idempotent:
+            attempts, budget = READ_ATTEMPTS, RETRY_BUDGET_SECONDS
+        elif self._retryable(action, payload):
+            attempts, budget = WRITE_ATTEMPTS, WRITE_RETRY_BUDGET_SECONDS
+        else:
+            attempts, budget = 1, 0
+        started = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    if idempotent and self._hedging:
+                        reply = await self._post_hedged(action, payload)
+                    else:
+                        reply = await self._post_timed(action, payload)
+                except GasTransportError as exc:
+                    breaker.record(False)
+                    backoff = RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                    if (
+                        attempt == attempts
+                        or time.monotonic() - started + backoff > budget
+                        or not breaker.allow()
+                    ):
+                        return {"status": "error", "message": exc.message}, "transport"
+                    self.retries += 1
+                    logger.info(
+                        "Retrying GAS %s in %.2fs (attempt %s)", action, backoff, attempt + 1
+                    )
+                    await asyncio.sleep(backoff)
+                    continue
+                breaker.record(True)
+                return reply, "ok"
+        except BaseException:
+            # Cancelled by a newer update or an abandoned flight: there is no outcome,
+            # but a half-open breaker must not wait for this probe forever.
+            breaker.release()
+            raise
+
+    async def _post_timed(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
+        started = time.monotonic()
+        reply = await self._post(action, payload)
+        self._latency[action].add(time.monotonic() - started)
+        return reply
+
+    async def _post_hedged(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
+        """Send a second copy of a slow read once the first passes the observed p95."""
+        delay = self._latency[action].hedge_delay()
+        first = asyncio.ensure_future(self._post_timed(action, payload))
+        if delay is None:
+            return await first
+        pending: set[asyncio.Future[dict[str, Any]]] = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedged += 1
+                pending.add(asyncio.ensure_future(self._post_timed(action, payload)))
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _post(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
         data = {"token": self._api_token, "action": action, **payload}
-        logger.debug("Sending GAS request: action=%s payload=%s", action, payload)
+        headers = {}
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            # Apps Script cannot read request headers; the body field is what it logs.
+            data["trace_id"] = trace_id
+            headers[TRACE_HEADER] = trace_id
+        logger.debug("Sending GAS request: action=%s fields=%s", action, sorted(payload))
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self._base_url, json=data, timeout=10) as response:
-                    response_text = await response.text()
-                    if response.status == 200:
-                        try:
-                            return json.loads(response_text)
-                        except json.JSONDecodeError as exc:
-                            logger.error("JSON decode error: %s (text=%s)", exc, response_text)
-                            return {
-                                "status": "error",
-                                "message": f"Ошибка формата ответа: {exc}",
-                            }
-                    logger.error("HTTP error %s from GAS: %s", response.status, response_text)
-                    return {
-                        "status": "error",
-                        "message": f"Ошибка сервера: {response.status}",
-                    }
-        except TimeoutError:
+            session = await self._get_session()
+            async with session.post(self._base_url, json=data, headers=headers) as response:
+                response_text = await response.text()
+                if response.status == 200:
+                    try:
+                        return json.loads(response_text)
+                    except json.JSONDecodeError as exc:
+                        logger.error(
+                            "JSON decode error: %s (text=%s)",
+                            exc,
+                            response_text[:RESPONSE_LOG_CHARS],
+                        )
+                        raise GasTransportError(f"Ошибка формата ответа: {exc}") from exc
+                logger.error(
+                    "HTTP error %s from GAS: %s",
+                    response.status,
+                    response_text[:RESPONSE_LOG_CHARS],
+                )
+                raise GasTransportError(f"Ошибка сервера: {response.status}")
+        except GasTransportError:
+            raise
+        except TimeoutError as exc:
             logger.error("Timeout when calling GAS")
-            return {"status": "error", "message": "Сервер не отвечает. Попробуйте позже."}
+            raise GasTransportError("Сервер не отвечает. Попробуйте позже.") from exc
         except Exception as exc:
             logger.error("Network error when calling GAS: %s", exc)
-            return {"status": "error", "message": f"Ошибка сети: {exc}"}
+            raise GasTransportError(f"Ошибка сети: {exc}") from exc
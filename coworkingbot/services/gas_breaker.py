@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+BREAKER_WINDOW_SECONDS = 60
+BREAKER_MIN_CALLS = 5
+BREAKER_FAILURE_RATIO = 0.5
+BREAKER_COOLDOWN_SECONDS = 30
+
+LATENCY_SAMPLES = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.2
+
+
+class CircuitBreaker:
+    """Per-action breaker over transport failures (timeouts, 5xx, broken JSON).
+
+    Closed: calls go through and outcomes are counted over the last
+    `window` seconds. Once at least `min_calls` were seen and `failure_ratio` of
+    them failed, the breaker opens and calls fail fast for `cooldown` seconds.
+    Then one probe is let through (half-open); its outcome closes or reopens it.
+    """
+
+    def __init__(
+        self,
+        *,
+        window: float = BREAKER_WINDOW_SECONDS,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_ratio: float = BREAKER_FAILURE_RATIO,
+        cooldown: float = BREAKER_COOLDOWN_SECONDS,
+    ) -> None:
+        self._window = window
+        self._min_calls = min_calls
+        self._failure_ratio = failure_ratio
+        self._cooldown = cooldown
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._cooldown:
+            self._state = HALF_OPEN
+            self._probe_inflight = False
+        return self._state
+
+    def retry_in(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(self._cooldown - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_inflight:
+            self._probe_inflight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """A call ended without an outcome (cancelled); let the next call probe instead."""
+        if self._state == HALF_OPEN:
+            self._probe_inflight = False
+
+    def record(self, ok: bool) -> None:
+        current = time.monotonic()
+        if self._state == HALF_OPEN:
+            self._probe_inflight = False
+            if ok:
+                self._state = CLOSED
+                self._outcomes.clear()
+            else:
+                self._trip(current)
+            return
+
+        self._outcomes.append((current, ok))
+        while self._outcomes and current - self._outcomes[0][0] > self._window:
+            self._outcomes.popleft()
+        if self._state == CLOSED and len(self._outcomes) >= self._min_calls:
+            failures = sum(1 for _, good in self._outcomes if not good)
+            if failures / len(self._outcomes) >= self._failure_ratio:
+                self._trip(current)
+
+    def _trip(self, current: float) -> None:
+        self._state = OPEN
+        self._opened_at = current
+        self._outcomes.clear()
+        self.opened += 1
+
+
+class LatencyTracker:
+    """Recent successful call durations of one action, for the hedging delay."""
+
+    def __init__(self, size: int = LATENCY_SAMPLES) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    def hedge_delay(self) -> float | None:
+        """p95 of recent calls, or None until there is enough data to trust it."""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.percentile(0.95) or 0.0, HEDGE_MIN_DELAY_SECONDS)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime
+
+FREE_SLOTS_TTL_SECONDS = 30
+
+
+def normalize_date_key(date_str: str) -> str:
+    """Map "5.1.2026" and "05.01.2026" to one cache key; unknown formats pass through."""
+    raw = (date_str or "").strip()
+    try:
+        return datetime.strptime(raw, "%d.%m.%Y").strftime("%d.%m.%Y")
+    except ValueError:
+        return raw
+
+
+class SlotCache:
+    """Per-date TTL cache for `get_free_slots` results.
+
+    Every invalidation bumps a generation counter: a lookup that started before a
+    write must not put the pre-write slot list back into the cache.
+    """
+
+    def __init__(self, ttl_seconds: float = FREE_SLOTS_TTL_SECONDS) -> None:
+        self._ttl = ttl_seconds
+        self._entries: dict[str, tuple[float, dict]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, date_str: str) -> dict | None:
+        key = normalize_date_key(date_str)
+        cached = self._entries.get(key)
+        if cached is not None:
+            ts, result = cached
+            if (time.monotonic() - ts) <= self._ttl:
+                self.hits += 1
+                return result
+            self._entries.pop(key, None)
+        self.misses += 1
+        return None
+
+    def put(self, date_str: str, result: dict, generation: int) -> None:
+        if generation != self._generation:
+            return
+        self._entries[normalize_date_key(date_str)] = (time.monotonic(), result)
+
+    def invalidate(self, date_str: str | None = None) -> None:
+        """Drop one date, or everything when the touched date is unknown (e.g. cancel by ID)."""
+        self._generation += 1
+        self.invalidations += 1
+        if date_str:
+            self._entries.pop(normalize_date_key(date_str), None)
+        else:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+        }
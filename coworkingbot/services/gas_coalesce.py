@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+
+def request_key(action: str, payload: dict[str, Any]) -> str:
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{action}:{canonical}"
+
+
+class SingleFlight:
+    """Let concurrent identical requests share one in-flight call.
+
+    The shared call runs in its own task and callers await it through
+    `asyncio.shield`, so a caller that gives up does not cancel it for the rest.
+    When the last caller gives up, the call is cancelled: nobody wants the answer.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[str, asyncio.Future[dict[str, Any]]] = {}
+        self._waiters: dict[str, int] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def run(
+        self, key: str, factory: Callable[[], Awaitable[dict[str, Any]]]
+    ) -> dict[str, Any]:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                self.abandoned += 1
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+        return dict(result)
+
+    def _forget(self, key: str, task: asyncio.Future[dict[str, Any]]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "inflight": len(self._inflight),
+        }
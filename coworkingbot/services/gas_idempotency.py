@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+# Body field of a GAS write; Apps Script keeps the reply per key and returns it
+# again, with `"replayed": true`, when the same key comes back.
+IDEMPOTENCY_FIELD = "idempotency_key"
+REPLAYED_FIELD = "replayed"
+RESULTS_TTL_SECONDS = 3600
+RESULTS_MAX_ENTRIES = 2048
+
+
+def new_idempotency_key(action: str) -> str:
+    return f"{action}-{uuid.uuid4().hex}"
+
+
+def payment_key(record_id: str, chat_id: int, message_id: int) -> str:
+    """One confirmation attempt: the message whose button or /confirm command asked for it.
+
+    Taps on the same button and redeliveries of the same command are one write; a
+    later attempt, from another message, reaches GAS again even within the TTL.
+    """
+    return f"confirm_payment-{record_id}-{chat_id}-{message_id}"
+
+
+class WriteResults:
+    """Successful GAS write replies by idempotency key, for `ttl_seconds`.
+
+    A write that comes back with a known key is answered from here, marked as
+    replayed, without a GAS call. Failures are not kept: the same key may be sent
+    again, and Apps Script decides whether the first attempt went through.
+    """
+
+    def __init__(
+        self, ttl_seconds: float = RESULTS_TTL_SECONDS, max_entries: int = RESULTS_MAX_ENTRIES
+    ) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self.replayed = 0
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        cached = self._entries.get(key)
+        if cached is None:
+            return None
+        ts, result = cached
+        if time.monotonic() - ts > self._ttl:
+            del self._entries[key]
+            return None
+        self.replayed += 1
+        return {**result, REPLAYED_FIELD: True}
+
+    def put(self, key: str, result: dict[str, Any]) -> None:
+        if result.get("status") != "success":
+            return
+        self._entries[key] = (time.monotonic(), dict(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"replayed": self.replayed, "size": len(self._entries)}
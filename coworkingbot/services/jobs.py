@@ -0,0 +1,171 @@
+"""Scheduled jobs run by the bot itself instead of Apps Script triggers.
+
+Reminders use the read-only GAS action `get_reminder_targets {"date": "ДД.ММ.ГГГГ"}`, which
+returns `{"status": "success", "bookings": [{"id", "date", "time", "name", "user_id"}]}` with
+the active (not cancelled) bookings of that day.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from coworkingbot.app.context import AppContext
+from coworkingbot.services.common import now
+from coworkingbot.services.notifications import send_admin_alert
+from coworkingbot.services.scheduler import CronSpec, Job, Scheduler
+
+logger = logging.getLogger(__name__)
+
+JOB_JITTER_SECONDS = 20
+
+# Pacing when no notification dispatcher is configured (~30 messages/s per bot).
+REMINDER_SEND_INTERVAL_SECONDS = 0.05
+SENT_KEYS_KEEP_DAYS = 3
+
+# Nearest window first: a booking first seen 1 h ahead gets only the 2 h reminder.
+REMINDER_WINDOWS = (
+    ("two_hours_before", timedelta(hours=2)),
+    ("day_before", timedelta(hours=24)),
+)
+
+
+def _booking_start(ctx: AppContext, booking: dict[str, Any]) -> datetime | None:
+    start = str(booking.get("time", "")).split("-", 1)[0].strip()
+    try:
+        naive = datetime.strptime(f"{booking.get('date', '')} {start}", "%d.%m.%Y %H:%M")
+    except ValueError:
+        return None
+    return ctx.tz.localize(naive)
+
+
+def _reminder_text(kind: str, booking: dict[str, Any]) -> str:
+    when = "в ближайшие сутки" if kind == "day_before" else "через 2 часа"
+    return (
+        f"🔔 <b>Напоминание</b>\n\n"
+        f"Ваша бронь {when}:\n"
+        f"📅 {booking.get('date')}\n"
+        f"🕐 {booking.get('time')}\n\n"
+        f"📋 ID брони: <code>{booking.get('id')}</code>"
+    )
+
+
+async def _send_reminder(ctx: AppContext, chat_id: int, text: str) -> bool:
+    if ctx.notifier is not None:
+        return await ctx.notifier.deliver(chat_id, text, parse_mode="HTML")
+    for _ in range(2):
+        try:
+            await ctx.bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+            return True
+        except TelegramRetryAfter as exc:
+            await asyncio.sleep(exc.retry_after)
+        except Exception as exc:
+            logger.error("Failed to send reminder to %s: %s", chat_id, exc)
+            return False
+    return False
+
+
+def _prune_sent(sent: dict[str, str], today: datetime) -> None:
+    cutoff = (today - timedelta(days=SENT_KEYS_KEEP_DAYS)).strftime("%Y-%m-%d")
+    for key in [key for key, day in sent.items() if day < cutoff]:
+        del sent[key]
+
+
+async def send_reminders(ctx: AppContext, data: dict[str, Any]) -> dict[str, Any]:
+    """Remind clients 24 h and 2 h before their slot; each reminder is sent once."""
+    current = now(ctx)
+    sent: dict[str, str] = data.setdefault("sent", {})
+    _prune_sent(sent, current)
+    stats = {"day_before": 0, "two_hours_before": 0, "errors": 0}
+
+    bookings: list[dict[str, Any]] = []
+    for day in (current, current + timedelta(days=1)):
+        result = await ctx.gas.request("get_reminder_targets", {"date": day.strftime("%d.%m.%Y")})
+        if result.get("status") != "success":
+            logger.error("Reminder targets failed: %s", result.get("message"))
+            stats["errors"] += 1
+            continue
+        bookings.extend(result.get("bookings") or [])
+
+    # kind, chat, text, and the keys to mark once the reminder is delivered.
+    outgoing: list[tuple[str, int, str, list[str]]] = []
+    for booking in bookings:
+        start = _booking_start(ctx, booking)
+        user_id = booking.get("user_id")
+        if start is None or not user_id or start <= current:
+            continue
+        for kind, window in REMINDER_WINDOWS:
+            key = f"{booking.get('id')}:{kind}"
+            if key in sent or start - current > window:
+                continue
+            # Every window that has already opened is covered; only the nearest one is sent.
+            keys = [
+                f"{booking.get('id')}:{other}"
+                for other, other_window in REMINDER_WINDOWS
+                if start - current <= other_window
+            ]
+            outgoing.append((kind, int(user_id), _reminder_text(kind, booking), keys))
+            break
+
+    if ctx.notifier is not None:
+        # The dispatcher paces the fan-out; queue everything and wait for the outcome.
+        results = await asyncio.gather(
+            *(_send_reminder(ctx, chat_id, text) for _, chat_id, text, _ in outgoing)
+        )
+    else:
+        results = []
+        for _, chat_id, text, _ in outgoing:
+            results.append(await _send_reminder(ctx, chat_id, text))
+            await asyncio.sleep(REMINDER_SEND_INTERVAL_SECONDS)
+    for (kind, _, _, keys), ok in zip(outgoing, results, strict=True):
+        if not ok:
+            # Not marked as sent, so the next run tries again.
+            stats["errors"] += 1
+            continue
+        stats[kind] += 1
+        for key in keys:
+            sent.setdefault(key, current.strftime("%Y-%m-%d"))
+    return stats
+
+
+async def auto_cancel(ctx: AppContext, data: dict[str, Any]) -> dict[str, Any]:
+    result = await ctx.gas.request("auto_cancel", {})
+    if result.get("status") != "success":
+        logger.error("Scheduled auto-cancel failed: %s", result.get("message"))
+        return {"error": result.get("message")}
+    cancelled = int(result.get("cancelled_count", 0) or 0)
+    if cancelled:
+        await send_admin_alert(
+            ctx, f"🧹 <b>Автоотмена</b>\n\nОтменено неоплаченных броней: {cancelled}"
+        )
+    return {"cancelled_count": cancelled}
+
+
+async def daily_report(ctx: AppContext, data: dict[str, Any]) -> dict[str, Any]:
+    result = await ctx.gas.request("get_report", {"report_type": "daily", "period": "current"})
+    if result.get("status") != "success":
+        logger.error("Scheduled daily report failed: %s", result.get("message"))
+        return {"error": result.get("message")}
+    await send_admin_alert(ctx, result.get("formatted_telegram", "Отчет сформирован"))
+    return {"sent": True}
+
+
+def register_jobs(scheduler: Scheduler, ctx: AppContext) -> None:
+    settings = ctx.settings
+    specs = (
+        ("reminders", settings.reminders_cron, send_reminders),
+        ("auto_cancel", settings.auto_cancel_cron, auto_cancel),
+        ("daily_report", settings.daily_report_cron, daily_report),
+    )
+    for name, expr, func in specs:
+        if not expr:
+            continue
+
+        async def run(data: dict[str, Any], func=func) -> dict[str, Any]:
+            return await func(ctx, data)
+
+        scheduler.add(Job(name, CronSpec.parse(expr), run, JOB_JITTER_SECONDS))
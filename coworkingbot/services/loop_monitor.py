@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 0.5
+STALL_THRESHOLD_SECONDS = 0.25
+LAG_SAMPLES = 1200  # ten minutes of ticks
+STALLS_KEPT = 20
+STACK_DEPTH = 12
+
+
+@dataclass(frozen=True)
+class Stall:
+    """The event loop was blocked for `seconds`; `stack` is where it was stuck."""
+
+    at: float
+    seconds: float
+    stack: str
+
+
+class LoopMonitor:
+    """Measures event-loop lag and catches callbacks that block it.
+
+    A task sleeps `tick` seconds and records how late it woke up. A watchdog
+    thread checks the task's heartbeat; once the loop has not come back for
+    `stall_threshold`, it snapshots the loop thread's stack (the code that
+    blocks) and logs it once the stall is over, with its full duration.
+    """
+
+    def __init__(
+        self, *, tick: float = TICK_SECONDS, stall_threshold: float = STALL_THRESHOLD_SECONDS
+    ) -> None:
+        self._tick = tick
+        self._stall_threshold = stall_threshold
+        self._lags: deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.stalls: deque[Stall] = deque(maxlen=STALLS_KEPT)
+        self.stall_count = 0
+        self._heartbeat = time.monotonic()
+        self._task: asyncio.Task[None] | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._loop_thread_id: int | None = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, self._tick * 2)
+            self._thread = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            self._heartbeat = started
+            await asyncio.sleep(self._tick)
+            woke = time.monotonic()
+            self._heartbeat = woke
+            self._lags.append(max(woke - started - self._tick, 0.0))
+
+    def _watch(self) -> None:
+        poll = min(self._stall_threshold / 2, 0.05)
+        while not self._stop.wait(poll):
+            stuck_for = time.monotonic() - self._heartbeat - self._tick
+            if stuck_for < self._stall_threshold:
+                continue
+            stack = self._loop_stack()
+            beat = self._heartbeat
+            while self._heartbeat == beat and not self._stop.wait(poll):
+                pass
+            seconds = round(time.monotonic() - beat - self._tick, 3)
+            self.stalls.append(Stall(time.time(), seconds, stack))
+            self.stall_count += 1
+            logger.warning("Event loop blocked for %.3fs at:\n%s", seconds, stack)
+
+    def _loop_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return "(loop thread not found)"
+        return "".join(traceback.format_stack(frame, limit=STACK_DEPTH))
+
+    def percentile(self, q: float) -> float | None:
+        if not self._lags:
+            return None
+        ordered = sorted(self._lags)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    def stats(self) -> dict[str, Any]:
+        def ms(value: float | None) -> float | None:
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "samples": len(self._lags),
+            "p50_ms": ms(self.percentile(0.50)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(max(self._lags, default=None)),
+            "stalls": self.stall_count,
+        }
@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Any
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+    from coworkingbot.app.update_queue import UpdateScheduler
+    from coworkingbot.services.gas import GasClient
+    from coworkingbot.services.loop_monitor import LoopMonitor
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "coworkingbot_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[str, ...]
+Collect = Callable[[], Iterable[tuple[Labels, float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: defaultdict[Labels, float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] += amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: per-bucket counts (not cumulative), then sum and count.
+        self._series: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(series[-1]) if series else 0
+
+    def render(self) -> Iterable[str]:
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series, strict=False):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} "
+                    f"{_format_value(cumulative)}"
+                )
+            inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{inf} {_format_value(series[-1])}"
+            plain = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{plain} {_format_value(series[-2])}"
+            yield f"{self.name}_count{plain} {_format_value(series[-1])}"
+
+
+class Sampled:
+    """Values read at scrape time from a callback (queue depths, cache stats)."""
+
+    def __init__(
+        self, name: str, help_text: str, kind: str, labelnames: Labels, collect: Collect
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = labelnames
+        self._collect = collect
+
+    def render(self) -> Iterable[str]:
+        try:
+            samples = sorted(self._collect())
+        except Exception as exc:
+            logger.warning("Metric %s could not be collected: %s", self.name, exc)
+            return
+        for labels, value in samples:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram | Sampled] = {}
+
+    def _add(self, metric: Any) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Labels = ()) -> Counter:
+        return self._add(Counter(PREFIX + name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Labels = ()) -> Histogram:
+        return self._add(Histogram(PREFIX + name, help_text, labelnames))
+
+    def sampled(
+        self,
+        name: str,
+        help_text: str,
+        collect: Collect,
+        *,
+        kind: str = "gauge",
+        labelnames: Labels = (),
+    ) -> Sampled:
+        return self._add(Sampled(PREFIX + name, help_text, kind, labelnames, collect))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def fsm_state_counts(storage: BaseStorage) -> dict[str, int]:
+    """Users per FSM state; SqliteStorage reports them as of its last flush."""
+    counts: defaultdict[str, int] = defaultdict(int)
+    if isinstance(storage, MemoryStorage):
+        for record in storage.storage.values():
+            if record.state:
+                counts[record.state] += 1
+        return dict(counts)
+    state_counts = getattr(storage, "state_counts", None)
+    return state_counts() if state_counts is not None else {}
+
+
+class BotMetrics:
+    """The bot's metrics: handlers, GAS, Telegram API, FSM and caches."""
+
+    def __init__(self) -> None:
+        self.registry = Registry()
+        self.update_seconds = self.registry.histogram(
+            "update_seconds", "Time to process one update, by event type.", ("event",)
+        )
+        self.update_errors = self.registry.counter(
+            "update_errors_total", "Updates whose processing raised.", ("event",)
+        )
+        self.handler_seconds = self.registry.histogram(
+            "handler_seconds", "Handler run time.", ("router", "handler")
+        )
+        self.handler_errors = self.registry.counter(
+            "handler_errors_total", "Handlers that raised.", ("router", "handler")
+        )
+        self.gas_seconds = self.registry.histogram(
+            "gas_request_seconds", "GAS call time including retries.", ("action",)
+        )
+        self.gas_requests = self.registry.counter(
+            "gas_requests_total",
+            "GAS calls by outcome: ok, error (GAS said no), transport, breaker_open.",
+            ("action", "outcome"),
+        )
+        self.telegram_seconds = self.registry.histogram(
+            "telegram_request_seconds", "Telegram Bot API call time.", ("method",)
+        )
+        self.telegram_requests = self.registry.counter(
+            "telegram_requests_total",
+            "Telegram Bot API calls by outcome: ok, retry_after (429), error.",
+            ("method", "outcome"),
+        )
+
+    def observe_update(self, event: str, seconds: float, failed: bool) -> None:
+        self.update_seconds.observe(seconds, event)
+        if failed:
+            self.update_errors.inc(event)
+
+    def observe_handler(self, router: str, handler: str, seconds: float, failed: bool) -> None:
+        self.handler_seconds.observe(seconds, router, handler)
+        if failed:
+            self.handler_errors.inc(router, handler)
+
+    def observe_gas(self, action: str, seconds: float, outcome: str) -> None:
+        self.gas_seconds.observe(seconds, action)
+        self.gas_requests.inc(action, outcome)
+
+    def observe_telegram(self, method: str, seconds: float, outcome: str) -> None:
+        self.telegram_seconds.observe(seconds, method)
+        self.telegram_requests.inc(method, outcome)
+
+    def watch_gas(self, gas: GasClient) -> None:
+        gas.add_hook(self.observe_gas)
+
+        def cache() -> Iterable[tuple[Labels, float]]:
+            stats = gas.cache_stats()
+            yield ("hit",), stats["hits"]
+            yield ("miss",), stats["misses"]
+
+        def hit_ratio() -> Iterable[tuple[Labels, float]]:
+            cache_stats = gas.cache_stats()
+            lookups = cache_stats["hits"] + cache_stats["misses"]
+            yield ("slot_cache",), cache_stats["hits"] / lookups if lookups else 0.0
+            flights = gas.coalesce_stats()
+            calls = flights["started"] + flights["coalesced"]
+            yield ("coalescing",), flights["coalesced"] / calls if calls else 0.0
+
+        self.registry.sampled(
+            "gas_slot_cache_lookups_total",
+            "Free-slot cache lookups.",
+            cache,
+            kind="counter",
+            labelnames=("result",),
+        )
+        self.registry.sampled(
+            "gas_write_replays_total",
+            "Repeated writes (same idempotency key) answered without a GAS call.",
+            lambda: [((), gas.write_stats()["replayed"])],
+            kind="counter",
+        )
+        self.registry.sampled(
+            "gas_cache_hit_ratio",
+            "Share of reads answered without a GAS call of their own.",
+            hit_ratio,
+            labelnames=("cache",),
+        )
+
+    def watch_fsm(self, storage: BaseStorage) -> None:
+        self.registry.sampled(
+            "fsm_states",
+            "Users currently in each FSM state.",
+            lambda: (((state,), count) for state, count in fsm_state_counts(storage).items()),
+            labelnames=("state",),
+        )
+
+    def watch_loop(self, monitor: LoopMonitor) -> None:
+        def lag() -> Iterable[tuple[Labels, float]]:
+            for q in (0.5, 0.95, 0.99):
+                value = monitor.percentile(q)
+                if value is not None:
+                    yield (str(q),), value
+
+        self.registry.sampled(
+            "event_loop_lag_seconds",
+            "How late the loop monitor woke up, over the last ten minutes.",
+            lag,
+            labelnames=("quantile",),
+        )
+        self.registry.sampled(
+            "event_loop_stalls_total",
+            "Times the event loop was blocked past the stall threshold.",
+            lambda: [((), monitor.stall_count)],
+            kind="counter",
+        )
+
+    def watch_updates(self, scheduler: UpdateScheduler) -> None:
+        self.registry.sampled(
+            "update_queue_depth",
+            "Updates waiting or running, across all chats.",
+            lambda: [((), scheduler.total)],
+        )
+        self.registry.sampled(
+            "updates_running",
+            f"Updates being handled now (limit {scheduler.max_concurrency}).",
+            lambda: [((), scheduler.running)],
+        )
+        # Chat ids are user ids, so the per-chat queues are only exported in aggregate.
+        self.registry.sampled(
+            "update_queue_max_chat_depth",
+            "Updates waiting or running in the busiest chat.",
+            lambda: [((), max(scheduler.depths().values(), default=0))],
+        )
+        self.registry.sampled(
+            "update_queue_chats_waiting",
+            "Chats with an update waiting behind an earlier one.",
+            lambda: [((), sum(depth > 1 for depth in scheduler.depths().values()))],
+        )
+        self.registry.sampled(
+            "updates_superseded_total",
+            "Lookups skipped or cancelled because a newer update of the chat came in.",
+            lambda: [((), scheduler.superseded)],
+            kind="counter",
+        )
+
+    def watch_bot(self, bot: Bot) -> None:
+        bot.session.middleware(TelegramMetricsMiddleware(self))
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    def __init__(self, metrics: BotMetrics) -> None:
+        self._metrics = metrics
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            response = await make_request(bot, method)
+            outcome = "ok"
+            return response
+        except TelegramRetryAfter:
+            outcome = "retry_after"
+            raise
+        finally:
+            self._metrics.observe_telegram(
+                method.__api_method__, time.monotonic() - started, outcome
+            )
+
+
+class MetricsServer:
+    """Serves `GET /metrics` in Prometheus text format on a local port."""
+
+    def __init__(self, registry: Registry, host: str, port: int) -> None:
+        self._registry = registry
+        self._host = host
+        self._port = port
+        self._runner: web.AppRunner | None = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self._registry.render().encode(), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        return app
+
+    async def start(self) -> None:
+        if self._runner is not None:
+            return
+        self._runner = web.AppRunner(self.make_app(), handle_signals=False)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        logger.info("Metrics on http://%s:%s/metrics", self._host, self._port)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -23,19 +23,34 @@ _ERROR_SEND_EVERY = 5
 
 
 async def _send_message(ctx: AppContext, chat_id: int, text: str) -> None:
+    if ctx.notifier is not None:
+        # Queued: rate limits and retries are handled by the dispatcher, not the caller.
+        ctx.notifier.submit(chat_id, text, parse_mode="HTML")
+        return
     try:
         await ctx.bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
     except Exception as exc:
         logger.error("Failed to notify chat %s: %s", chat_id, exc)
 
 
+async def _send_many(ctx: AppContext, chat_ids: list[int], text: str) -> None:
+    if ctx.outbox is not None:
+        # One local transaction; the relay delivers after the handler has returned.
+        try:
+            await ctx.outbox.put_many([(chat_id, text) for chat_id in chat_ids])
+            return
+        except Exception as exc:
+            logger.error("Outbox write failed, sending directly: %s", exc)
+    for chat_id in chat_ids:
+        await _send_message(ctx, chat_id, text)
+
+
 async def send_admin_alert(ctx: AppContext, text: str) -> None:
     """Send informational alerts to service chat, fallback to admin DMs."""
     if ctx.settings.admin_alerts_chat_id is not None:
-        await _send_message(ctx, ctx.settings.admin_alerts_chat_id, text)
+        await _send_many(ctx, [ctx.settings.admin_alerts_chat_id], text)
         return
-    for admin_id in ctx.settings.admin_ids:
-        await _send_message(ctx, int(admin_id), text)
+    await _send_many(ctx, [int(admin_id) for admin_id in ctx.settings.admin_ids], text)
 
 
 async def send_admin_action_required(ctx: AppContext, text: str) -> None:
@@ -43,8 +58,7 @@ async def send_admin_action_required(ctx: AppContext, text: str) -> None:
     if not ctx.settings.admin_ids:
         logger.warning("No admin IDs configured for action-required message.")
         return
-    for admin_id in ctx.settings.admin_ids:
-        await _send_message(ctx, int(admin_id), text)
+    await _send_many(ctx, [int(admin_id) for admin_id in ctx.settings.admin_ids], text)
 
 
 async def send_admin_notification(ctx: AppContext, text: str) -> None:
@@ -109,13 +123,11 @@ async def notify_admin_about_payment_confirmation(
     )
 
     if ctx.settings.admin_alerts_chat_id is not None:
-        await _send_message(ctx, ctx.settings.admin_alerts_chat_id, message_text)
+        await _send_many(ctx, [ctx.settings.admin_alerts_chat_id], message_text)
         return
 
-    for admin in ctx.settings.admin_ids:
-        if int(admin) == admin_id:
-            continue
-        await _send_message(ctx, int(admin), message_text)
+    others = [int(admin) for admin in ctx.settings.admin_ids if int(admin) != admin_id]
+    await _send_many(ctx, others, message_text)
 
 
 async def notify_admin_about_new_booking(
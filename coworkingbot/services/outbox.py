@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from coworkingbot.services.broadcast import NotificationDispatcher
+
+logger = logging.getLogger(__name__)
+
+RELAY_BATCH_SIZE = 50
+RELAY_IDLE_SECONDS = 30
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 15 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    parse_mode TEXT,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    dead INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (dead, next_attempt_at);
+"""
+
+
+class Outbox:
+    """Messages waiting to be sent, kept in SQLite so a restart does not lose them.
+
+    Rows are written once, deleted after delivery, and marked dead after
+    `MAX_ATTEMPTS` failures so they can be inspected instead of retried forever.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._new = asyncio.Event()
+
+    async def put_many(self, messages: Sequence[tuple[int, str]], parse_mode: str = "HTML") -> None:
+        """Store messages in one transaction; the relay picks them up right away."""
+        if not messages:
+            return
+        await asyncio.to_thread(self._insert, messages, parse_mode)
+        self._new.set()
+
+    async def put(self, chat_id: int, text: str, parse_mode: str = "HTML") -> None:
+        await self.put_many([(chat_id, text)], parse_mode)
+
+    async def wait_new(self, timeout: float) -> None:
+        """Return when something was put since the last call, or after `timeout`."""
+        try:
+            await asyncio.wait_for(self._new.wait(), timeout=timeout)
+        except TimeoutError:
+            pass
+        self._new.clear()
+
+    def _insert(self, messages: Sequence[tuple[int, str]], parse_mode: str) -> None:
+        current = time.time()
+        rows = [(int(chat_id), text, parse_mode, current, current) for chat_id, text in messages]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO outbox (chat_id, text, parse_mode, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def due(self, limit: int = RELAY_BATCH_SIZE) -> list[tuple[int, int, str, str | None, int]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, chat_id, text, parse_mode, attempts FROM outbox "
+                "WHERE dead = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+
+    def next_due_in(self) -> float | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE dead = 0"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0.0)
+
+    def settle(self, delivered: Sequence[int], failed: Sequence[tuple[int, int]]) -> None:
+        """Delete delivered rows and schedule (or give up on) failed ones."""
+        current = time.time()
+        retries = []
+        dead = []
+        for row_id, attempts in failed:
+            attempts += 1
+            if attempts >= MAX_ATTEMPTS:
+                dead.append((attempts, row_id))
+            else:
+                delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+                retries.append((attempts, current + delay, row_id))
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in delivered])
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ? WHERE id = ?", retries
+            )
+            self._conn.executemany("UPDATE outbox SET attempts = ?, dead = 1 WHERE id = ?", dead)
+        if dead:
+            logger.error("Outbox gave up on %s messages after %s attempts", len(dead), MAX_ATTEMPTS)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            pending, dead = self._conn.execute(
+                "SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 1), 0) FROM outbox"
+            ).fetchone()
+        return {"pending": pending, "dead": dead}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxRelay:
+    """Background task that hands outbox rows to the notification dispatcher."""
+
+    def __init__(self, outbox: Outbox, notifier: NotificationDispatcher) -> None:
+        self._outbox = outbox
+        self._notifier = notifier
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="outbox-relay")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._outbox.close()
+
+    async def relay_once(self) -> int:
+        rows = await asyncio.to_thread(self._outbox.due)
+        if not rows:
+            return 0
+        results = await asyncio.gather(
+            *(
+                self._notifier.deliver(chat_id, text, parse_mode=parse_mode)
+                for _, chat_id, text, parse_mode, _ in rows
+            )
+        )
+        delivered = [row[0] for row, ok in zip(rows, results, strict=True) if ok]
+        failed = [(row[0], row[4]) for row, ok in zip(rows, results, strict=True) if not ok]
+        await asyncio.to_thread(self._outbox.settle, delivered, failed)
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.relay_once() == RELAY_BATCH_SIZE:
+                    pass
+                delay = await asyncio.to_thread(self._outbox.next_due_in)
+            except Exception as exc:
+                logger.error("Outbox relay failed: %s", exc)
+                delay = RETRY_BASE_SECONDS
+            await self._outbox.wait_new(
+                RELAY_IDLE_SECONDS if delay is None else min(delay, RELAY_IDLE_SECONDS)
+            )
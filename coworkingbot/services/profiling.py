@@ -0,0 +1,186 @@
+"""On-demand CPU sampling and tracemalloc snapshots for a running bot.
+
+Both are process-wide (there is one event loop and one tracemalloc), so the
+module keeps a single `profiler` instance instead of hanging one off AppContext.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import PurePath
+from types import FrameType
+
+SAMPLE_INTERVAL_SECONDS = 0.01
+DEFAULT_CPU_SECONDS = 30
+MAX_CPU_SECONDS = 300
+TRACEMALLOC_FRAMES = 10
+# tracemalloc slows every allocation; switch it off if nobody asks for a while.
+TRACEMALLOC_MAX_SECONDS = 15 * 60
+TOP_N = 25
+# Functions the loop sits in while it waits for I/O: samples here are idle time.
+IDLE_FUNCTIONS = frozenset({"select", "poll", "epoll", "kqueue", "control"})
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    path = PurePath(code.co_filename)
+    return f"{code.co_name} ({'/'.join(path.parts[-2:])}:{code.co_firstlineno})"
+
+
+@dataclass
+class CpuProfile:
+    seconds: float
+    samples: int
+    idle: int
+    own: Counter[str]
+    total: Counter[str]
+
+    def render(self) -> str:
+        busy = self.samples - self.idle
+        share = busy / self.samples * 100 if self.samples else 0.0
+        lines = [
+            f"CPU profile of the event loop thread: {self.seconds:.1f} s, "
+            f"{self.samples} samples every {SAMPLE_INTERVAL_SECONDS * 1000:.0f} ms",
+            f"Loop busy in {busy} samples ({share:.1f}%), idle (waiting for I/O) in {self.idle}",
+            "",
+            f"Top {TOP_N} functions by own samples (busy only):",
+        ]
+        lines += _table(self.own, busy)
+        lines += ["", f"Top {TOP_N} functions including callees (busy only):"]
+        lines += _table(self.total, busy)
+        return "\n".join(lines) + "\n"
+
+
+def _table(counter: Counter[str], busy: int) -> list[str]:
+    rows = [f"{'samples':>8} {'%':>6}  function"]
+    for label, count in counter.most_common(TOP_N):
+        rows.append(f"{count:>8} {count / busy * 100 if busy else 0:>6.1f}  {label}")
+    return rows
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self._cpu_stop: asyncio.Event | None = None
+        self._memory_baseline: tracemalloc.Snapshot | None = None
+        self._memory_taken_at = 0.0
+        self._memory_timer: asyncio.TimerHandle | None = None
+
+    @property
+    def cpu_running(self) -> bool:
+        return self._cpu_stop is not None
+
+    async def profile_cpu(self, seconds: float) -> CpuProfile:
+        """Sample the loop thread's stack for `seconds` (or until `stop_cpu`)."""
+        if self._cpu_stop is not None:
+            raise RuntimeError("CPU profile already running")
+        seconds = min(max(seconds, 1.0), MAX_CPU_SECONDS)
+        self._cpu_stop = stop = asyncio.Event()
+        done = threading.Event()
+        loop_thread = threading.get_ident()
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        counts = {"samples": 0, "idle": 0}
+
+        def sample() -> None:
+            # Runs in a helper thread; it only reads frames, so the loop is not paused.
+            while not done.wait(SAMPLE_INTERVAL_SECONDS):
+                frame = sys._current_frames().get(loop_thread)
+                if frame is None:
+                    continue
+                counts["samples"] += 1
+                if frame.f_code.co_name in IDLE_FUNCTIONS:
+                    counts["idle"] += 1
+                    continue
+                own[_frame_label(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    label = _frame_label(frame)
+                    if label not in seen:
+                        seen.add(label)
+                        total[label] += 1
+                    frame = frame.f_back
+
+        started = time.monotonic()
+        sampler = threading.Thread(target=sample, name="cpu-profiler", daemon=True)
+        sampler.start()
+        try:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=seconds)
+            except TimeoutError:
+                pass
+        finally:
+            done.set()
+            await asyncio.to_thread(sampler.join)
+            self._cpu_stop = None
+        return CpuProfile(time.monotonic() - started, counts["samples"], counts["idle"], own, total)
+
+    def stop_cpu(self) -> bool:
+        if self._cpu_stop is None:
+            return False
+        self._cpu_stop.set()
+        return True
+
+    @property
+    def memory_tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    async def memory_snapshot(self) -> str:
+        """Start tracing on first use; afterwards report top sites and growth since last call."""
+        if self._memory_timer is not None:
+            self._memory_timer.cancel()
+        self._memory_timer = asyncio.get_running_loop().call_later(
+            TRACEMALLOC_MAX_SECONDS, self.stop_memory
+        )
+        # Walking every traced block takes a while on a big heap; keep it off the loop.
+        return await asyncio.to_thread(self._memory_report)
+
+    def _memory_report(self) -> str:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._memory_baseline = tracemalloc.take_snapshot()
+            self._memory_taken_at = time.time()
+            return (
+                "tracemalloc started; baseline snapshot taken.\n"
+                "Run the command again later to see what grew. "
+                f"Tracing stops by itself after {TRACEMALLOC_MAX_SECONDS // 60} min.\n"
+            )
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"Traced memory: {current / 2**20:.1f} MiB now, {peak / 2**20:.1f} MiB peak",
+            "",
+            f"Top {TOP_N} allocation sites now:",
+        ]
+        for stat in snapshot.statistics("lineno")[:TOP_N]:
+            lines.append(f"{stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  {stat.traceback}")
+        if self._memory_baseline is not None:
+            since = time.strftime("%H:%M:%S", time.localtime(self._memory_taken_at))
+            lines += ["", f"Top {TOP_N} changes since {since}:"]
+            for diff in snapshot.compare_to(self._memory_baseline, "lineno")[:TOP_N]:
+                lines.append(
+                    f"{diff.size_diff / 1024:>+10.1f} KiB {diff.count_diff:>+8} blocks  "
+                    f"{diff.traceback}"
+                )
+        self._memory_baseline = snapshot
+        self._memory_taken_at = time.time()
+        return "\n".join(lines) + "\n"
+
+    def stop_memory(self) -> bool:
+        if self._memory_timer is not None:
+            self._memory_timer.cancel()
+            self._memory_timer = None
+        self._memory_baseline = None
+        if not tracemalloc.is_tracing():
+            return False
+        tracemalloc.stop()
+        return True
+
+
+profiler = Profiler()
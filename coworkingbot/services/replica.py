@@ -0,0 +1,350 @@
+"""Local SQLite mirror of the bookings sheet, filled from the GAS `get_changes` feed.
+
+Delta contract: `get_changes {"since": cursor}` returns
+`{"status": "success", "cursor": str, "has_more": bool, "changes": [row, ...]}` where a row
+carries `id, date (ДД.ММ.ГГГГ), time, name, phone, price, user_id, status, paid, deleted`.
+A row whose `status` is a cancellation ("Отменено", "Отменена", "cancelled") stays in the
+user's history but no longer takes its slot or counts as an active booking.
+Optional `slot_grid` (all slot labels of a day) and `exceptions` (`{date, slot}` items,
+empty slot = whole day) let the replica answer `get_free_slots` as well.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pytz
+
+if TYPE_CHECKING:
+    from coworkingbot.services.gas import GasClient
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL_SECONDS = 15
+MAX_STALENESS_SECONDS = 60
+SYNC_RETRY_SECONDS = 30
+
+# Read actions the replica can answer; everything else (and all writes) goes to GAS.
+REPLICA_ACTIONS = frozenset(
+    {"get_user_bookings", "get_today_bookings", "get_busy_slots", "get_free_slots"}
+)
+
+# Bumped when the tables change; an older file is emptied and synced from scratch.
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    record_id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    time TEXT NOT NULL,
+    user_id TEXT NOT NULL DEFAULT '',
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    row TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_day_time ON bookings (day, time);
+CREATE INDEX IF NOT EXISTS idx_bookings_user_id ON bookings (user_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _day_key(date_str: str) -> str | None:
+    """ДД.ММ.ГГГГ -> ГГГГ-ММ-ДД, so SQLite can sort and compare dates as text."""
+    try:
+        return datetime.strptime((date_str or "").strip(), "%d.%m.%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _is_cancelled(row: dict[str, Any]) -> bool:
+    status = str(row.get("status") or "").strip().lower()
+    return status.startswith("отмен") or status in ("cancelled", "canceled")
+
+
+class BookingReplica:
+    """Bookings mirror: synced in a worker thread, read on the event loop.
+
+    `apply_changes` writes through `_conn` under `_lock`. Reads use their own
+    connection and, with WAL, see the last committed sync without waiting for
+    the one in progress.
+    """
+
+    def __init__(self, path: str | Path, tz: pytz.tzinfo.BaseTzInfo) -> None:
+        self._path = Path(path)
+        self._tz = tz
+        self._lock = threading.Lock()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+        self._reader = sqlite3.connect(str(self._path), check_same_thread=False)
+        self._synced_at: float | None = None
+        self._dirty = False
+        self._writes = 0
+        self._on_dirty: Callable[[], None] | None = None
+        self.served = 0
+
+    def close(self) -> None:
+        self._reader.close()
+        with self._lock:
+            self._conn.close()
+
+    def _migrate(self) -> None:
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS bookings; DROP TABLE IF EXISTS meta;")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # --- freshness -------------------------------------------------------------
+
+    def set_dirty_callback(self, callback: Callable[[], None]) -> None:
+        self._on_dirty = callback
+
+    def mark_dirty(self) -> None:
+        """A write went through GAS; serve from GAS until the next sync catches up."""
+        self._dirty = True
+        self._writes += 1
+        if self._on_dirty is not None:
+            self._on_dirty()
+
+    def write_marker(self) -> int:
+        return self._writes
+
+    def is_fresh(self, max_staleness: float) -> bool:
+        if self._dirty or self._synced_at is None:
+            return False
+        return (time.monotonic() - self._synced_at) <= max_staleness
+
+    def age_seconds(self) -> float | None:
+        if self._synced_at is None:
+            return None
+        return time.monotonic() - self._synced_at
+
+    # --- sync ------------------------------------------------------------------
+
+    def cursor(self) -> str:
+        return self._get_meta("cursor") or ""
+
+    def apply_changes(self, reply: dict[str, Any]) -> int:
+        """Store one `get_changes` page; runs in a worker thread."""
+        changes = reply.get("changes") or []
+        with self._lock, self._conn:
+            for row in changes:
+                record_id = str(row.get("id") or "")
+                if not record_id:
+                    continue
+                day = _day_key(str(row.get("date", "")))
+                if row.get("deleted") or day is None:
+                    self._conn.execute("DELETE FROM bookings WHERE record_id = ?", (record_id,))
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO bookings (record_id, day, time, user_id, cancelled, row) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        record_id,
+                        day,
+                        str(row.get("time", "")),
+                        str(row.get("user_id", "")),
+                        int(_is_cancelled(row)),
+                        json.dumps(row, ensure_ascii=False),
+                    ),
+                )
+            for key in ("slot_grid", "exceptions"):
+                if key in reply:
+                    self._set_meta(key, json.dumps(reply[key], ensure_ascii=False))
+            if reply.get("cursor") is not None:
+                self._set_meta("cursor", str(reply["cursor"]))
+        return len(changes)
+
+    def mark_synced(self, started_at: float, write_marker: int) -> None:
+        self._synced_at = started_at
+        # A write that landed while this sync was running may be missing from it.
+        if write_marker == self._writes:
+            self._dirty = False
+
+    # --- reads -----------------------------------------------------------------
+
+    def answer(self, action: str, payload: dict[str, Any]) -> dict[str, Any] | None:
+        """Build the same reply GAS would give, or None when the replica cannot."""
+        if action == "get_user_bookings":
+            result = self._user_bookings(
+                str(payload.get("user_id", "")), payload.get("active_only")
+            )
+        elif action == "get_today_bookings":
+            result = self._today_bookings()
+        elif action == "get_busy_slots":
+            result = self._busy_slots(str(payload.get("date", "")))
+        elif action == "get_free_slots":
+            result = self._free_slots(str(payload.get("date", "")))
+        else:
+            result = None
+        if result is not None:
+            self.served += 1
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        (rows,) = self._reader.execute("SELECT COUNT(*) FROM bookings").fetchone()
+        age = self.age_seconds()
+        return {
+            "rows": rows,
+            "served": self.served,
+            "age": None if age is None else round(age, 1),
+            "dirty": self._dirty,
+        }
+
+    def _today(self) -> str:
+        return datetime.now(self._tz).strftime("%Y-%m-%d")
+
+    def _rows(self, sql: str, params: tuple) -> list[dict[str, Any]]:
+        fetched = self._reader.execute(sql, params).fetchall()
+        return [json.loads(raw) for (raw,) in fetched]
+
+    def _user_bookings(self, user_id: str, active_only: Any) -> dict[str, Any]:
+        if active_only:
+            rows = self._rows(
+                "SELECT row FROM bookings WHERE user_id = ? AND day >= ? AND NOT cancelled "
+                "ORDER BY day, time",
+                (user_id, self._today()),
+            )
+        else:
+            rows = self._rows(
+                "SELECT row FROM bookings WHERE user_id = ? ORDER BY day, time", (user_id,)
+            )
+        return {"status": "success", "bookings": rows, "source": "replica"}
+
+    def _today_bookings(self) -> dict[str, Any]:
+        rows = self._rows(
+            "SELECT row FROM bookings WHERE day = ? AND NOT cancelled ORDER BY time",
+            (self._today(),),
+        )
+        return {"status": "success", "bookings": rows, "source": "replica"}
+
+    def _busy_slots(self, date_str: str) -> dict[str, Any] | None:
+        day = _day_key(date_str)
+        if day is None:
+            return None
+        rows = self._rows(
+            "SELECT row FROM bookings WHERE day = ? AND NOT cancelled ORDER BY time", (day,)
+        )
+        busy = [
+            {
+                "time": row.get("time", ""),
+                "name": row.get("name", ""),
+                "status": "YES" if row.get("paid") else "NO",
+            }
+            for row in rows
+        ]
+        return {"status": "success", "busy_slots": busy, "source": "replica"}
+
+    def _free_slots(self, date_str: str) -> dict[str, Any] | None:
+        day = _day_key(date_str)
+        grid_raw = self._get_meta("slot_grid")
+        exceptions_raw = self._get_meta("exceptions")
+        if day is None or grid_raw is None or exceptions_raw is None:
+            return None
+
+        grid: list[str] = json.loads(grid_raw)
+        closed: set[str] = set()
+        for item in json.loads(exceptions_raw):
+            if _day_key(str(item.get("date", ""))) != day:
+                continue
+            slot = str(item.get("slot") or "")
+            if not slot:
+                return {"status": "success", "free_slots": [], "source": "replica"}
+            closed.add(slot)
+
+        taken = {
+            t
+            for (t,) in self._reader.execute(
+                "SELECT time FROM bookings WHERE day = ? AND NOT cancelled", (day,)
+            )
+        }
+        free = [slot for slot in grid if slot not in taken and slot not in closed]
+        if day == self._today():
+            current = datetime.now(self._tz).strftime("%H:%M")
+            free = [slot for slot in free if slot.split("-", 1)[0].strip() > current]
+        return {"status": "success", "free_slots": free, "source": "replica"}
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self._reader.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        # Called inside apply_changes, which already holds the lock.
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+class ReplicaSync:
+    """Background task that pulls `get_changes` pages into the replica."""
+
+    def __init__(
+        self,
+        gas: GasClient,
+        replica: BookingReplica,
+        interval: float = SYNC_INTERVAL_SECONDS,
+    ) -> None:
+        self._gas = gas
+        self._replica = replica
+        self._interval = interval
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        replica.set_dirty_callback(self.request_sync)
+
+    def request_sync(self) -> None:
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="replica-sync")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._replica.close()
+
+    async def sync_once(self) -> bool:
+        started_at = time.monotonic()
+        write_marker = self._replica.write_marker()
+        while True:
+            reply = await self._gas.request("get_changes", {"since": self._replica.cursor()})
+            if reply.get("status") != "success":
+                logger.error("Replica sync failed: %s", reply.get("message"))
+                return False
+            applied = await asyncio.to_thread(self._replica.apply_changes, reply)
+            logger.debug("Replica sync applied %s changes", applied)
+            if not reply.get("has_more"):
+                break
+        self._replica.mark_synced(started_at, write_marker)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                ok = await self.sync_once()
+            except Exception as exc:
+                logger.error("Replica sync crashed: %s", exc)
+                ok = False
+            delay = self._interval if ok else SYNC_RETRY_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except TimeoutError:
+                pass
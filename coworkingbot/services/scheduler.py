@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# Longest gap the loop sleeps, so a wall-clock jump or a stop() is noticed quickly.
+MAX_SLEEP_SECONDS = 60
+# After downtime a job runs once to catch up, but only if it was due this recently.
+CATCH_UP_SECONDS = 6 * 60 * 60
+
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+JobFunc = Callable[[dict[str, Any]], Awaitable[dict[str, Any] | None]]
+
+
+def _parse_field(raw: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in raw.split(","):
+        step = 1
+        if "/" in part:
+            part, step_raw = part.split("/", 1)
+            step = int(step_raw)
+            if step <= 0:
+                raise ValueError(f"bad step in {raw!r}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_raw, end_raw = part.split("-", 1)
+            start, end = int(start_raw), int(end_raw)
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end:
+            raise ValueError(f"{raw!r} is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSpec:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 = Sunday).
+
+    Supports `*`, numbers, `a-b`, lists and `/step`; names and `L`/`W` are not needed here.
+    As in cron, when both day-of-month and day-of-week are restricted (neither starts
+    with `*`), a day matching either one is enough: `0 9 1 * 1` is the 1st and Mondays.
+    """
+
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    either_day: bool = False
+
+    @classmethod
+    def parse(cls, expr: str) -> CronSpec:
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron spec needs 5 fields: {expr!r}")
+        parsed = [
+            _parse_field(raw, low, high)
+            for raw, (low, high) in zip(fields, _FIELD_RANGES, strict=True)
+        ]
+        either_day = not fields[2].startswith("*") and not fields[4].startswith("*")
+        return cls(*parsed, either_day=either_day)
+
+    def matches(self, moment: datetime) -> bool:
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.month in self.months
+            and self._day_matches(moment)
+        )
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.isoweekday() % 7) in self.weekdays
+        return day or weekday if self.either_day else day and weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`, in the same timezone."""
+        tz = moment.tzinfo
+        # Step in local wall-clock time; pytz zones must be re-attached via localize().
+        candidate = moment.replace(second=0, microsecond=0, tzinfo=None) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            if tz is None:
+                return candidate
+            if hasattr(tz, "localize"):
+                return tz.localize(candidate)
+            return candidate.replace(tzinfo=tz)
+        raise ValueError("cron spec never matches")
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    spec: CronSpec
+    func: JobFunc
+    jitter_seconds: float = 0.0
+
+
+class JobStateStore:
+    """Last-run timestamps and per-job scratch data, persisted as one JSON file."""
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._state: dict[str, dict[str, Any]] = self._read()
+        self._saving = asyncio.Lock()
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        if not self._path.exists():
+            return {}
+        try:
+            with self._path.open("r", encoding="utf-8") as file:
+                payload = json.load(file)
+                if isinstance(payload, dict):
+                    return payload
+        except Exception as exc:
+            logger.error("Failed to read scheduler state %s: %s", self._path, exc)
+        return {}
+
+    async def save(self) -> None:
+        """Write the state atomically, in a worker thread; one save at a time."""
+        # Serialized here: jobs keep changing their data dicts on the loop.
+        text = json.dumps(self._state, ensure_ascii=False, indent=2)
+        async with self._saving:
+            await asyncio.to_thread(self._write, text)
+
+    def _write(self, text: str) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix(self._path.suffix + ".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        tmp_path.replace(self._path)
+
+    def job(self, name: str) -> dict[str, Any]:
+        return self._state.setdefault(name, {})
+
+    def last_run(self, name: str) -> datetime | None:
+        raw = self.job(name).get("last_run")
+        if not raw:
+            return None
+        try:
+            return datetime.fromisoformat(raw)
+        except ValueError:
+            return None
+
+    def set_last_run(self, name: str, moment: datetime) -> None:
+        self.job(name)["last_run"] = moment.isoformat()
+
+
+class Scheduler:
+    """Run cron-style jobs inside the bot process.
+
+    A job never overlaps with itself: if the previous run is still going when the
+    next one is due, that tick is skipped. Each job gets its persisted `data` dict,
+    which is saved after every run.
+    """
+
+    def __init__(self, store: JobStateStore, tz: pytz.tzinfo.BaseTzInfo) -> None:
+        self._jobs: list[Job] = []
+        self._store = store
+        self._tz = tz
+        self._next: dict[str, datetime] = {}
+        self._running: dict[str, asyncio.Task[dict[str, Any] | None]] = {}
+        self._task: asyncio.Task[None] | None = None
+        self.skipped = 0
+
+    def add(self, job: Job) -> None:
+        self._jobs.append(job)
+
+    def _now(self) -> datetime:
+        return datetime.now(self._tz)
+
+    def _initial_due(self, job: Job, current: datetime) -> datetime:
+        last = self._store.last_run(job.name)
+        if last is not None:
+            due = job.spec.next_after(last.astimezone(self._tz))
+            if due <= current and (current - due).total_seconds() <= CATCH_UP_SECONDS:
+                return current
+        return job.spec.next_after(current)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        current = self._now()
+        for job in self._jobs:
+            self._next[job.name] = self._initial_due(job, current)
+        self._task = asyncio.create_task(self._loop(), name="scheduler")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        tasks = [self._task, *self._running.values()]
+        for task in self._running.values():
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._running.clear()
+
+    def status(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "name": job.name,
+                "next": self._next.get(job.name),
+                "last": self._store.last_run(job.name),
+                "running": job.name in self._running,
+            }
+            for job in self._jobs
+        ]
+
+    async def run_now(self, name: str) -> dict[str, Any] | None:
+        """Run a job outside its schedule and return its summary.
+
+        Raises KeyError for an unknown job and RuntimeError if it is already running.
+        """
+        job = next((job for job in self._jobs if job.name == name), None)
+        if job is None:
+            raise KeyError(name)
+        if not self._launch(job, self._now(), jitter=False):
+            raise RuntimeError(f"job {name} is already running")
+        return await asyncio.shield(self._running[name])
+
+    async def _loop(self) -> None:
+        while True:
+            current = self._now()
+            for job in self._jobs:
+                due = self._next[job.name]
+                if due > current:
+                    continue
+                self._next[job.name] = job.spec.next_after(current)
+                if not self._launch(job, current, jitter=True):
+                    self.skipped += 1
+                    logger.warning("Job %s is still running, skipping this tick", job.name)
+            wake = min(self._next.values(), default=current + timedelta(seconds=MAX_SLEEP_SECONDS))
+            delay = min(max((wake - self._now()).total_seconds(), 0.5), MAX_SLEEP_SECONDS)
+            await asyncio.sleep(delay)
+
+    def _launch(self, job: Job, scheduled: datetime, *, jitter: bool) -> bool:
+        if job.name in self._running:
+            return False
+        task = asyncio.create_task(self._execute(job, scheduled, jitter), name=f"job-{job.name}")
+        self._running[job.name] = task
+        task.add_done_callback(lambda _: self._running.pop(job.name, None))
+        return True
+
+    async def _execute(self, job: Job, scheduled: datetime, jitter: bool) -> dict[str, Any] | None:
+        if jitter and job.jitter_seconds > 0:
+            await asyncio.sleep(random.uniform(0, job.jitter_seconds))
+        data = self._store.job(job.name).setdefault("data", {})
+        started = self._now()
+        result = None
+        try:
+            result = await job.func(data)
+            logger.info(
+                "Job %s finished in %.1fs", job.name, (self._now() - started).total_seconds()
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Job %s failed: %s", job.name, exc)
+        self._store.set_last_run(job.name, scheduled)
+        try:
+            await self._store.save()
+        except OSError as exc:
+            logger.error("Failed to save scheduler state: %s", exc)
+        return result
@@ -47,6 +47,7 @@ def admin_help_text() -> str:
         "👑 <b>Админ-панель</b>\n\n"
         "<b>🛠 Управление:</b> исключения, пользователи, подтверждение оплаты.\n"
         "<b>👁 Просмотр:</b> сводка, брони на сегодня/завтра, отзывы.\n"
-        "<b>⚙️ Система:</b> настройки, диагностика, контент для клиента, помощь.\n\n"
+        "<b>⚙️ Система:</b> настройки, диагностика, контент для клиента, помощь.\n"
+        "<b>⏱ Профилирование:</b> /profile [сек], /profile_stop, /mem_snapshot, /mem_stop.\n\n"
         "Опасные действия требуют подтверждения."
     )
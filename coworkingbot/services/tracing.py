@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logger = logging.getLogger("coworkingbot.trace")
+
+SLOW_UPDATE_SECONDS = 5.0
+TRACE_HEADER = "X-Trace-Id"
+SPAN_KINDS = ("gas", "telegram")
+
+
+@dataclass
+class Trace:
+    """What one update spent its time on. Shared by everything awaited for it."""
+
+    trace_id: str
+    update_id: int | None = None
+    user_id: int | None = None
+    event: str = ""
+    handler: str = ""
+    started: float = field(default_factory=time.monotonic)
+    seconds: dict[str, float] = field(default_factory=lambda: dict.fromkeys(SPAN_KINDS, 0.0))
+    calls: dict[str, int] = field(default_factory=lambda: dict.fromkeys(SPAN_KINDS, 0))
+
+    def add(self, kind: str, seconds: float) -> None:
+        self.seconds[kind] += seconds
+        self.calls[kind] += 1
+
+    def summary(self) -> dict[str, Any]:
+        total = time.monotonic() - self.started
+        # Wall-clock time not spent waiting on GAS or Telegram. This is our code plus time
+        # queued behind other updates on the event loop, not CPU time: a busy loop inflates
+        # it for every update. Parallel spans can overlap, hence max().
+        other = max(total - sum(self.seconds.values()), 0.0)
+        return {
+            "trace_id": self.trace_id,
+            "update_id": self.update_id,
+            "user_id": self.user_id,
+            "event": self.event,
+            "handler": self.handler or "-",
+            "total_ms": round(total * 1000, 1),
+            "gas_ms": round(self.seconds["gas"] * 1000, 1),
+            "gas_calls": self.calls["gas"],
+            "telegram_ms": round(self.seconds["telegram"] * 1000, 1),
+            "telegram_calls": self.calls["telegram"],
+            "other_ms": round(other * 1000, 1),
+        }
+
+
+_current: ContextVar[Trace | None] = ContextVar("coworkingbot_trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    return _current.get()
+
+
+def current_trace_id() -> str | None:
+    trace = _current.get()
+    return trace.trace_id if trace is not None else None
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+@contextmanager
+def traced(trace: Trace) -> Iterator[Trace]:
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(kind: str) -> Iterator[None]:
+    """Charge the time spent inside the block to `kind` on the current trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        trace.add(kind, time.monotonic() - started)
+
+
+def log_summary(trace: Trace, failed: bool = False) -> None:
+    summary = trace.summary()
+    slow = summary["total_ms"] >= SLOW_UPDATE_SECONDS * 1000
+    level = logging.WARNING if failed or slow else logging.INFO
+    logger.log(
+        level,
+        "update=%s user=%s handler=%s total=%sms gas=%sms/%s telegram=%sms/%s other=%sms%s",
+        summary["update_id"],
+        summary["user_id"],
+        summary["handler"],
+        summary["total_ms"],
+        summary["gas_ms"],
+        summary["gas_calls"],
+        summary["telegram_ms"],
+        summary["telegram_calls"],
+        summary["other_ms"],
+        " FAILED" if failed else "",
+        extra={"trace": summary},
+    )
+
+
+class TraceLogFilter(logging.Filter):
+    """Adds `%(trace_id)s` to every record ("-" outside of an update)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "trace_id"):
+            record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class TraceRequestMiddleware(BaseRequestMiddleware):
+    """Charges Bot API calls made while handling an update to its trace."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with span("telegram"):
+            return await make_request(bot, method)
@@ -3,10 +3,13 @@ from __future__ import annotations
 import asyncio
 import logging
 import sys
+from typing import Any
 
 import pytz
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Message, TelegramObject
 
 from coworkingbot.app.context import (
     AppContext,
@@ -14,13 +17,47 @@ from coworkingbot.app.context import (
     log_missing_settings,
     validate_settings,
 )
-from coworkingbot.app.middleware import ContextMiddleware
-from coworkingbot.routers import admin, booking, errors, help, start
+from coworkingbot.app.lazy_router import LazyRouter
+from coworkingbot.app.logs import setup_logging
+from coworkingbot.app.middleware import (
+    CallbackAckMiddleware,
+    ContextMiddleware,
+    HandlerMetricsMiddleware,
+    LatestWinsMiddleware,
+    TraceHandlerMiddleware,
+    TracingMiddleware,
+    UpdateMetricsMiddleware,
+)
+from coworkingbot.app.storage import SqliteStorage
+from coworkingbot.app.update_queue import ScheduledDispatcher, UpdateScheduler
+from coworkingbot.app.webhook import run_webhook
+from coworkingbot.routers import booking, errors, help, start
+from coworkingbot.services.broadcast import NotificationDispatcher
+from coworkingbot.services.callback_answers import CallbackAnswerDedupe, CallbackAnswers
+from coworkingbot.services.common import is_admin
 from coworkingbot.services.gas import GasClient
+from coworkingbot.services.jobs import register_jobs
+from coworkingbot.services.loop_monitor import LoopMonitor
+from coworkingbot.services.metrics import BotMetrics, MetricsServer
+from coworkingbot.services.outbox import Outbox, OutboxRelay
+from coworkingbot.services.replica import BookingReplica, ReplicaSync
+from coworkingbot.services.scheduler import JobStateStore, Scheduler
+from coworkingbot.services.tracing import TraceRequestMiddleware
 
 logger = logging.getLogger(__name__)
 
 
+def _may_need_admin(event: TelegramObject, data: dict[str, Any]) -> bool:
+    """Updates the admin router could handle: anything from an admin, commands, buttons."""
+    user = data.get("event_from_user")
+    ctx = data.get("ctx")
+    if user is not None and ctx is not None and is_admin(ctx, user.id):
+        return True
+    if isinstance(event, CallbackQuery):
+        return True
+    return isinstance(event, Message) and (event.text or "").startswith("/")
+
+
 def create_app() -> tuple[Bot, Dispatcher, AppContext]:
     settings = load_settings()
     missing = validate_settings(settings)
@@ -30,18 +67,98 @@ def create_app() -> tuple[Bot, Dispatcher, AppContext]:
 
     bot = Bot(token=settings.bot_token)
     tz = pytz.timezone(settings.tz_name)
-    gas_client = GasClient(settings.gas_webapp_url, settings.api_token)
-    ctx = AppContext(settings=settings, bot=bot, tz=tz, gas=gas_client)
-
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    gas_client = GasClient(
+        settings.gas_webapp_url,
+        settings.api_token,
+        batch_enabled=settings.gas_batch_enabled,
+        hedging=settings.gas_hedging_enabled,
+        idempotent_writes=settings.gas_idempotent_writes,
+    )
+    scheduler = None
+    if settings.scheduler_enabled:
+        scheduler = Scheduler(JobStateStore(settings.scheduler_state_path), tz)
+    notifier = NotificationDispatcher(bot)
+    outbox = Outbox(settings.outbox_path) if settings.outbox_path else None
+    metrics = BotMetrics() if settings.metrics_port else None
+    loop_monitor = None
+    if settings.loop_stall_ms > 0:
+        loop_monitor = LoopMonitor(stall_threshold=settings.loop_stall_ms / 1000.0)
+    ctx = AppContext(
+        settings=settings,
+        bot=bot,
+        tz=tz,
+        gas=gas_client,
+        scheduler=scheduler,
+        notifier=notifier,
+        outbox=outbox,
+        metrics=metrics,
+        loop_monitor=loop_monitor,
+    )
 
+    storage: BaseStorage
+    if settings.fsm_storage_path:
+        storage = SqliteStorage(settings.fsm_storage_path, ttl=settings.fsm_state_ttl_seconds)
+    else:
+        storage = MemoryStorage()
+    update_scheduler = UpdateScheduler(settings.update_concurrency)
+    dp = ScheduledDispatcher(scheduler=update_scheduler, storage=storage)
+
+    # Registered first so that answers it drops are not counted as Bot API calls.
+    callback_answers = CallbackAnswers()
+    bot.session.middleware(CallbackAnswerDedupe(callback_answers))
+    dp.update.outer_middleware(TracingMiddleware())
+    dp.message.middleware(TraceHandlerMiddleware())
+    dp.callback_query.middleware(TraceHandlerMiddleware())
+    bot.session.middleware(TraceRequestMiddleware())
     dp.update.middleware(ContextMiddleware(ctx))
+    callback_ack = CallbackAckMiddleware(callback_answers, settings.callback_ack_ms / 1000.0)
+    dp.callback_query.outer_middleware(callback_ack)
+    dp.arrival_hooks.append(callback_ack.arrived)
+    if metrics is not None:
+        dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+        dp.message.middleware(HandlerMetricsMiddleware(metrics))
+        dp.callback_query.middleware(HandlerMetricsMiddleware(metrics))
+        metrics.watch_gas(gas_client)
+        metrics.watch_fsm(storage)
+        metrics.watch_bot(bot)
+        metrics.watch_updates(update_scheduler)
+        if loop_monitor is not None:
+            metrics.watch_loop(loop_monitor)
+        metrics_server = MetricsServer(
+            metrics.registry, settings.metrics_host, settings.metrics_port
+        )
+        dp.startup.register(metrics_server.start)
+        dp.shutdown.register(metrics_server.stop)
+    # Innermost, so a superseded handler is still traced and counted.
+    dp.message.middleware(LatestWinsMiddleware(update_scheduler))
+
+    if loop_monitor is not None:
+        dp.startup.register(loop_monitor.start)
+        dp.shutdown.register(loop_monitor.stop)
+    dp.startup.register(gas_client.start)
+    dp.startup.register(notifier.start)
+    if settings.replica_db_path:
+        replica = BookingReplica(settings.replica_db_path, tz)
+        gas_client.attach_replica(replica, settings.replica_max_staleness_seconds)
+        replica_sync = ReplicaSync(gas_client, replica, settings.replica_sync_seconds)
+        dp.startup.register(replica_sync.start)
+        dp.shutdown.register(replica_sync.stop)
+    if scheduler is not None:
+        register_jobs(scheduler, ctx)
+        dp.startup.register(scheduler.start)
+        dp.shutdown.register(scheduler.stop)
+    if outbox is not None:
+        outbox_relay = OutboxRelay(outbox, notifier)
+        dp.startup.register(outbox_relay.start)
+        dp.shutdown.register(outbox_relay.stop)
+    dp.shutdown.register(notifier.stop)
+    dp.shutdown.register(gas_client.close)
 
     dp.include_router(start.router)
     dp.include_router(help.router)
     dp.include_router(booking.router)
-    dp.include_router(admin.router)
+    # routers/admin.py is most of the bot's code and only admins use it.
+    dp.include_router(LazyRouter("coworkingbot.routers.admin", _may_need_admin))
     dp.include_router(errors.router)
 
     return bot, dp, ctx
@@ -57,18 +174,20 @@ async def run_polling(bot: Bot, dp: Dispatcher) -> None:
 
 
 def run() -> None:
-    logging.basicConfig(
-        level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
+    log_pipeline = setup_logging(load_settings())
 
     try:
-        bot, dp, _ctx = create_app()
+        bot, dp, ctx = create_app()
     except RuntimeError:
+        log_pipeline.stop()
         sys.exit(1)
 
     try:
-        asyncio.run(run_polling(bot, dp))
+        if ctx.settings.bot_mode == "webhook":
+            asyncio.run(run_webhook(bot, dp, ctx.settings))
+        else:
+            asyncio.run(run_polling(bot, dp))
     except KeyboardInterrupt:
         logger.info("Bot stopped by user.")
     finally:
-        pass
+        log_pipeline.stop()
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from coworkingbot.devtools.bench import BENCHMARK_NAMES, compare, load_baseline, run
+
+
+def test_baseline_covers_every_benchmark() -> None:
+    baseline = load_baseline()
+    assert set(BENCHMARK_NAMES) <= set(baseline["benchmarks"])
+    assert all("relative" in entry for entry in baseline["benchmarks"].values())
+
+
+def test_compare_flags_slower_and_heavier_calls() -> None:
+    baseline = {"fast": {"ns_per_call": 1000.0, "relative": 0.1, "peak_bytes": 1000}}
+    # A slower machine: absolute time doubled, the ratio to the calibration loop did not.
+    slower_box = {"fast": {"ns_per_call": 2000.0, "relative": 0.14, "peak_bytes": 1100}}
+    assert compare(slower_box, baseline) == []
+
+    problems = compare(
+        {"fast": {"ns_per_call": 1000.0, "relative": 0.2, "peak_bytes": 4000}}, baseline
+    )
+    assert len(problems) == 2
+    assert compare({"new": {"ns_per_call": 1.0, "relative": 0.1, "peak_bytes": 0}}, baseline) == [
+        "new: no baseline (run with --update)"
+    ]
+
+
+def test_run_measures_time_and_allocations() -> None:
+    results = run(("validate_phone",), min_time=0.01)
+    assert results["validate_phone"]["ns_per_call"] > 0
+    assert results["validate_phone"]["relative"] > 0
+    assert results["validate_phone"]["peak_bytes"] >= 0
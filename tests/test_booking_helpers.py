@@ -1,4 +1,7 @@
-from coworkingbot.routers.booking import format_phone, validate_phone
+import asyncio
+from types import SimpleNamespace
+
+from coworkingbot.routers.booking import _cancel_user_booking, format_phone, validate_phone
 
 
 def test_validate_phone_accepts_variants():
@@ -11,3 +14,22 @@ def test_format_phone_normalizes():
     assert format_phone("89991234567") == "79991234567"
     assert format_phone("+79991234567") == "79991234567"
     assert format_phone("9991234567") == "79991234567"
+
+
+def test_batched_cancel_is_skipped_when_the_lookup_fails():
+    cancelled = []
+
+    async def batch(calls, *, stop_on_error=False):
+        lookup = {"status": "error", "message": "timeout"}
+        if stop_on_error:
+            return [lookup, {"status": "skipped"}]
+        cancelled.append(calls[1])
+        return [lookup, {"status": "success"}]
+
+    ctx = SimpleNamespace(gas=SimpleNamespace(batch_enabled=True, batch=batch))
+
+    booking, cancel_result = asyncio.run(_cancel_user_booking(ctx, 7, "ID_1"))
+
+    assert booking is None
+    assert cancel_result is None
+    assert cancelled == []
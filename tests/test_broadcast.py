@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+from coworkingbot.services.broadcast import NotificationDispatcher, RateLimiter
+
+
+class FlakyBot:
+    def __init__(self, retry_after_first: bool = False) -> None:
+        self.sent: list[tuple[int, str, float]] = []
+        self._retry_after_first = retry_after_first
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        if self._retry_after_first:
+            self._retry_after_first = False
+            method = SendMessage(chat_id=chat_id, text=text)
+            raise TelegramRetryAfter(method=method, message="flood", retry_after=0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def test_rate_limiter_spaces_messages_per_chat_and_globally() -> None:
+    limiter = RateLimiter(global_rate=10, per_chat_rate=2)
+    start = time.monotonic()
+    same_chat = [limiter.reserve_chat(1) - start for _ in range(3)]
+    assert [round(slot, 1) for slot in same_chat] == [0.0, 0.5, 1.0]
+    assert round(limiter.reserve_chat(2) - start, 1) == 0.0
+
+    global_slots = [limiter.reserve_global() - start for _ in range(3)]
+    assert [round(slot, 1) for slot in global_slots] == [0.0, 0.1, 0.2]
+
+
+def test_dispatcher_submits_without_waiting_and_retries_flood_control() -> None:
+    async def scenario() -> None:
+        bot = FlakyBot(retry_after_first=True)
+        dispatcher = NotificationDispatcher(
+            bot, workers=4, limiter=RateLimiter(global_rate=1000, per_chat_rate=1000)
+        )
+        await dispatcher.start()
+
+        started = time.monotonic()
+        for chat_id in range(5):
+            assert dispatcher.submit(chat_id, f"alert {chat_id}")
+        assert time.monotonic() - started < 0.01
+
+        assert await dispatcher.deliver(99, "reminder") is True
+        await dispatcher.stop(timeout=5)
+
+        assert sorted(chat_id for chat_id, _, _ in bot.sent) == [0, 1, 2, 3, 4, 99]
+        stats = dispatcher.snapshot()
+        assert stats["sent"] == 6
+        assert stats["flood_waits"] == 1
+        assert stats["depth"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_dispatcher_drops_when_queue_is_full() -> None:
+    async def scenario() -> None:
+        dispatcher = NotificationDispatcher(FlakyBot(), queue_size=1)
+        assert dispatcher.submit(1, "first")
+        assert not dispatcher.submit(2, "second")
+        assert dispatcher.snapshot()["dropped"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_deliver_returns_false_for_messages_left_at_shutdown() -> None:
+    async def scenario() -> None:
+        dispatcher = NotificationDispatcher(
+            FlakyBot(), workers=1, limiter=RateLimiter(global_rate=1000, per_chat_rate=0.5)
+        )
+        await dispatcher.start()
+        # The second message to the chat waits two seconds for its slot.
+        pending = [asyncio.create_task(dispatcher.deliver(1, text)) for text in "abc"]
+        await asyncio.sleep(0.05)
+        await dispatcher.stop(timeout=0.1)
+
+        assert await asyncio.wait_for(asyncio.gather(*pending), timeout=1) == [
+            True,
+            False,
+            False,
+        ]
+        assert dispatcher.snapshot()["dropped"] == 1
+
+    asyncio.run(scenario())
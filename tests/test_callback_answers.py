@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Update, User
+from coworkingbot.app.middleware import CallbackAckMiddleware
+from coworkingbot.devtools.loadtest import RecordingSession
+from coworkingbot.services.callback_answers import CallbackAnswerDedupe, CallbackAnswers
+
+
+def callback_update(update_id: int, data: str) -> Update:
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(
+            id=f"q{update_id}",
+            from_user=User(id=1, is_bot=False, first_name="Admin"),
+            chat_instance="ci",
+            data=data,
+        ),
+    )
+
+
+def test_slow_handlers_are_acked_early_and_their_own_answers_deduplicated() -> None:
+    router = Router()
+    finished: list[str] = []
+
+    @router.callback_query(F.data == "slow")
+    async def slow(callback: CallbackQuery) -> None:
+        await asyncio.sleep(0.2)
+        await callback.answer("Готово", show_alert=True)
+        finished.append("slow")
+
+    @router.callback_query(F.data == "fast")
+    async def fast(callback: CallbackQuery) -> None:
+        await callback.answer("⛔ Нет доступа", show_alert=True)
+        await callback.answer()
+
+    @router.callback_query(F.data == "silent")
+    async def silent(callback: CallbackQuery) -> None:
+        pass
+
+    session = RecordingSession()
+    answers = CallbackAnswers()
+    session.middleware(CallbackAnswerDedupe(answers))
+    bot = Bot("42:TEST", session=session)
+    dp = Dispatcher()
+    dp.callback_query.outer_middleware(CallbackAckMiddleware(answers, deadline=0.05))
+    dp.include_router(router)
+
+    async def scenario() -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        slow_update = asyncio.create_task(dp.feed_update(bot, callback_update(1, "slow")))
+        while not session.calls["AnswerCallbackQuery"]:
+            await asyncio.sleep(0.005)
+        acked_after = loop.time() - started
+        await slow_update
+        for update_id, data in ((2, "fast"), (3, "silent"), (4, "no handler")):
+            await dp.feed_update(bot, callback_update(update_id, data))
+        return acked_after
+
+    acked_after = asyncio.run(scenario())
+
+    assert finished == ["slow"]
+    assert acked_after < 0.15
+    assert session.calls["AnswerCallbackQuery"] == 4
+    # The slow handler's late alert and the fast handler's second answer.
+    assert answers.duplicates == 2
+    # The late alert reaches the admin as a message instead of being dropped.
+    assert answers.late_alerts == 1
+    assert [method.text for method in session.outgoing[1]] == ["Готово"]
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import CallbackQuery, Update, User
+from coworkingbot.app.callbacks import CallbackTable, pack, unpack
+from coworkingbot.devtools.loadtest import RecordingSession
+
+ADMIN_ID = 1
+USER_ID = 2
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> Update:
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(
+            id=f"q{update_id}",
+            from_user=User(id=user_id, is_bot=False, first_name="Test"),
+            chat_instance="ci",
+            data=data,
+        ),
+    )
+
+
+def test_pack_round_trips_and_rejects_bad_data() -> None:
+    assert pack("booking_cancel", "REC-1") == "booking_cancel:REC-1"
+    assert unpack("booking_cancel:REC-1") == ("booking_cancel", ["REC-1"])
+    assert unpack("admin_back") == ("admin_back", [])
+    with pytest.raises(ValueError):
+        pack("confirm", "a:b")
+    with pytest.raises(ValueError):
+        pack("confirm", "x" * 64)
+
+
+def test_table_resolves_exact_packed_and_legacy_data() -> None:
+    table = CallbackTable(Router())
+
+    @table.route("report_detailed")
+    async def menu(callback: CallbackQuery) -> None: ...
+
+    @table.route("report_detailed", args={"period": str}, legacy="report_detailed_")
+    async def period(callback: CallbackQuery, period: str) -> None: ...
+
+    @table.route("page", args={"number": int})
+    async def page(callback: CallbackQuery, number: int) -> None: ...
+
+    def resolved(data: str) -> tuple[object, dict] | None:
+        found = table.resolve(data)
+        return None if found is None else (found[0].callback, found[1])
+
+    assert resolved("report_detailed") == (menu, {})
+    assert resolved("report_detailed:last") == (period, {"period": "last"})
+    assert resolved("report_detailed_last") == (period, {"period": "last"})
+    assert resolved("page:3") == (page, {"number": 3})
+    assert resolved("page:three") is None
+    assert resolved("report_weekly") is None
+    with pytest.raises(ValueError):
+        table.route("page", args={"n": int})(page)
+
+
+def test_admin_only_table_checks_access_once_for_every_handler() -> None:
+    router = Router()
+    table = CallbackTable(router, admin_only=True)
+    confirmed: list[str] = []
+
+    @table.route("confirm", args={"record_id": str}, legacy="confirm_")
+    async def confirm(callback: CallbackQuery, record_id: str) -> None:
+        confirmed.append(record_id)
+        await callback.answer()
+
+    session = RecordingSession()
+    sent: list[Any] = []
+
+    async def record(make_request: Any, bot: Bot, method: Any) -> Any:
+        sent.append(method)
+        return await make_request(bot, method)
+
+    session.middleware(record)
+    bot = Bot("42:TEST", session=session)
+    dp = Dispatcher()
+    dp["ctx"] = SimpleNamespace(settings=SimpleNamespace(admin_ids=(ADMIN_ID,)))
+    dp.include_router(router)
+
+    async def scenario() -> None:
+        await dp.feed_update(bot, callback_update(1, ADMIN_ID, "confirm_REC-1"))
+        await dp.feed_update(bot, callback_update(2, ADMIN_ID, "confirm:REC-2"))
+        await dp.feed_update(bot, callback_update(3, USER_ID, "confirm:REC-3"))
+
+    asyncio.run(scenario())
+
+    assert confirmed == ["REC-1", "REC-2"]
+    assert [(type(m).__name__, m.text) for m in sent] == [
+        ("AnswerCallbackQuery", None),
+        ("AnswerCallbackQuery", None),
+        ("AnswerCallbackQuery", "⛔ Нет доступа"),
+    ]
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from aiohttp.test_utils import TestServer
+from coworkingbot.devtools.fake_gas import ACTIONS, FakeGasServer, FaultProfile
+from coworkingbot.services.gas import GasClient
+
+PACKAGE = Path(__file__).resolve().parents[1] / "coworkingbot"
+
+
+def test_fake_gas_implements_every_action_the_bot_sends() -> None:
+    # `gas.request("action", {...})` calls and `("action", {...})` batch entries.
+    pattern = re.compile(r'(?:\.request\(|[\[(,]\s*\()\s*"([a-z_]+)",\s*\{')
+    sent: set[str] = set()
+    for path in PACKAGE.rglob("*.py"):
+        if "devtools" in path.parts:
+            continue
+        sent.update(pattern.findall(path.read_text(encoding="utf-8")))
+    assert sent <= set(ACTIONS), sorted(sent - set(ACTIONS))
+
+
+def test_booking_lifecycle_against_fake_gas() -> None:
+    fake = FakeGasServer(token="dev", seed=1)
+    day = (datetime.now() + timedelta(days=2)).strftime("%d.%m.%Y")
+
+    async def scenario() -> None:
+        server = TestServer(fake.make_app())
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "dev")
+        try:
+            free = await client.request("get_free_slots", {"date": day})
+            slot = free["free_slots"][0]
+            created = await client.request(
+                "create_booking",
+                {
+                    "date": day,
+                    "time": slot,
+                    "name": "Анна",
+                    "phone": "+79990000000",
+                    "user_id": "7",
+                },
+            )
+            record_id = created["record_id"]
+
+            again = await client.request(
+                "create_booking",
+                {
+                    "date": day,
+                    "time": slot,
+                    "name": "Борис",
+                    "phone": "+79990000001",
+                    "user_id": "8",
+                },
+            )
+            assert again["status"] == "error"
+
+            mine = await client.request("get_user_bookings", {"user_id": 7, "active_only": True})
+            assert [b["id"] for b in mine["bookings"]] == [record_id]
+
+            paid = await client.request("confirm_payment", {"record_id": record_id})
+            assert paid["already_confirmed"] is False
+            refused = await client.request(
+                "cancel_booking", {"record_id": record_id, "user_id": "7", "only_unpaid": True}
+            )
+            assert refused["status"] == "error"
+
+            free_after = await client.request("get_free_slots", {"date": day})
+            assert slot not in free_after["free_slots"]
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.run(scenario())
+    assert fake.calls["create_booking"] == 2
+
+
+def test_fake_gas_injects_errors_and_cold_starts() -> None:
+    fake = FakeGasServer(
+        faults=FaultProfile(error_rate=1.0, cold_start_ms=50, cold_idle_seconds=0), seed=1
+    )
+
+    async def scenario() -> dict:
+        server = TestServer(fake.make_app())
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "dev")
+        try:
+            await client.request("test_connection", {})
+            return await client.request("create_booking", {})
+        finally:
+            await client.close()
+            await server.close()
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "error"
+    assert fake.injected["error"] == fake.calls.total()
+    assert fake.injected["cold_start"] >= 1
+
+
+def test_lost_reply_is_retried_with_the_same_key_without_a_second_booking() -> None:
+    fake = FakeGasServer(token="dev", faults=FaultProfile(lost_reply_rate=0.5), seed=9)
+    day = (datetime.now() + timedelta(days=2)).strftime("%d.%m.%Y")
+    booking = {"date": day, "time": "10:00-12:00", "name": "Test", "phone": "+7", "user_id": "9"}
+
+    async def scenario() -> tuple[dict, dict]:
+        server = TestServer(fake.make_app())
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "dev", idempotent_writes=True)
+        try:
+            created = await client.request("create_booking", booking, idempotency_key="k-1")
+            again = await client.request("create_booking", booking, idempotency_key="k-1")
+            return created, again
+        finally:
+            await client.close()
+            await server.close()
+
+    created, again = asyncio.run(scenario())
+
+    assert fake.injected["lost_reply"] >= 1
+    assert created["status"] == "success"
+    assert again == {**created, "replayed": True}
+    assert len(fake.store.active()) == 1
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from coworkingbot.app.storage import SqliteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+def test_state_survives_restart(tmp_path) -> None:
+    path = tmp_path / "fsm.sqlite3"
+
+    async def scenario() -> None:
+        storage = SqliteStorage(path, flush_interval=60)
+        await storage.set_state(KEY, "BookingStates:choosing_time")
+        await storage.update_data(KEY, {"date_str": "02.03.2099", "free_slots": ["10:00-12:00"]})
+        await storage.close()
+
+        reopened = SqliteStorage(path)
+        assert await reopened.get_state(KEY) == "BookingStates:choosing_time"
+        assert await reopened.get_data(KEY) == {
+            "date_str": "02.03.2099",
+            "free_slots": ["10:00-12:00"],
+        }
+
+        await reopened.set_state(KEY, None)
+        await reopened.set_data(KEY, {})
+        await reopened.close()
+        assert SqliteStorage(path).stats()["stored"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_state_expires(tmp_path) -> None:
+    async def scenario() -> None:
+        storage = SqliteStorage(tmp_path / "fsm.sqlite3", ttl=0.05)
+        await storage.set_state(KEY, "BookingStates:entering_name")
+        assert await storage.get_state(KEY) == "BookingStates:entering_name"
+        await asyncio.sleep(0.1)
+        assert await storage.get_state(KEY) is None
+        assert await storage.get_data(KEY) == {}
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_hot_cache_stays_bounded(tmp_path) -> None:
+    async def scenario() -> None:
+        storage = SqliteStorage(tmp_path / "fsm.sqlite3", cache_size=5, flush_interval=0)
+        for user_id in range(20):
+            key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+            await storage.set_data(key, {"n": user_id})
+            await storage.flush()
+        stats = storage.stats()
+        assert stats["cached"] <= 5
+        assert stats["stored"] == 20
+        old = StorageKey(bot_id=1, chat_id=0, user_id=0)
+        assert await storage.get_data(old) == {"n": 0}
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_read_from_disk_does_not_overwrite_a_newer_write(tmp_path) -> None:
+    path = tmp_path / "fsm.sqlite3"
+
+    async def scenario() -> str | None:
+        storage = SqliteStorage(path)
+        await storage.set_state(KEY, "BookingStates:choosing_date")
+        await storage.close()
+
+        reopened = SqliteStorage(path, flush_interval=60)
+        read = reopened._read
+        written = threading.Event()
+        reads = 0
+
+        def first_read_finishes_last(skey: str):
+            nonlocal reads
+            reads += 1
+            if reads == 1:
+                written.wait(timeout=5)
+            return read(skey)
+
+        reopened._read = first_read_finishes_last
+        slow_read = asyncio.create_task(reopened.get_state(KEY))
+        await asyncio.sleep(0.05)
+        await reopened.set_state(KEY, "BookingStates:choosing_time")
+        written.set()
+        await slow_read
+        state = await reopened.get_state(KEY)
+        await reopened.close()
+        return state
+
+    assert asyncio.run(scenario()) == "BookingStates:choosing_time"
+
+
+def test_counts_do_not_wait_for_a_flush_in_progress(tmp_path) -> None:
+    async def scenario() -> None:
+        storage = SqliteStorage(tmp_path / "fsm.sqlite3", flush_interval=60)
+        await storage.set_state(KEY, "BookingStates:choosing_date")
+        await storage.flush()
+
+        flushing = threading.Event()
+
+        def slow_flush() -> None:
+            with storage._lock:
+                flushing.set()
+                time.sleep(0.3)
+
+        flush = threading.Thread(target=slow_flush)
+        flush.start()
+        flushing.wait()
+        started = time.monotonic()
+        assert storage.state_counts() == {"BookingStates:choosing_date": 1}
+        assert storage.stats()["stored"] == 1
+        elapsed = time.monotonic() - started
+        flush.join()
+        await storage.close()
+        assert elapsed < 0.2
+
+    asyncio.run(scenario())
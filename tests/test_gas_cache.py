@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from coworkingbot.services.gas_cache import SlotCache, normalize_date_key
+
+
+def test_normalize_date_key_pads_day_and_month() -> None:
+    assert normalize_date_key("5.1.2026") == "05.01.2026"
+    assert normalize_date_key(" 05.01.2026 ") == "05.01.2026"
+    assert normalize_date_key("tomorrow") == "tomorrow"
+
+
+def test_slot_cache_hits_and_invalidation() -> None:
+    cache = SlotCache(ttl_seconds=60)
+    result = {"status": "success", "free_slots": ["10:00-12:00"]}
+
+    assert cache.get("05.01.2026") is None
+    cache.put("05.01.2026", result, cache.generation)
+    assert cache.get("5.1.2026") == result
+
+    cache.invalidate("05.01.2026")
+    assert cache.get("05.01.2026") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "invalidations": 1, "size": 0}
+
+
+def test_slot_cache_ignores_results_from_before_a_write() -> None:
+    cache = SlotCache(ttl_seconds=60)
+    generation = cache.generation
+
+    cache.invalidate()
+    cache.put("05.01.2026", {"status": "success", "free_slots": []}, generation)
+
+    assert cache.get("05.01.2026") is None
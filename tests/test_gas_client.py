@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from coworkingbot.services.gas import GasClient
+from coworkingbot.services.gas_breaker import CircuitBreaker
+from coworkingbot.services.gas_idempotency import payment_key
+
+
+def _make_app(calls: list[dict]) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        body = await request.json()
+        calls.append(body)
+        return web.json_response({"status": "success", "echo": body["action"]})
+
+    app = web.Application()
+    app.router.add_post("/exec", handle)
+    return app
+
+
+def test_gas_client_reuses_pooled_connection() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> dict[str, int]:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            await client.start()
+            for _ in range(3):
+                result = await client.request("test_connection", {})
+                assert result == {"status": "success", "echo": "test_connection"}
+            return client.pool_stats()
+        finally:
+            await client.close()
+            await server.close()
+
+    stats = asyncio.run(scenario())
+
+    assert len(calls) == 3
+    assert calls[0]["token"] == "token"
+    assert stats["created"] == 1
+    assert stats["reused"] == 2
+
+
+def test_gas_client_starts_session_lazily() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> None:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            result = await client.request("get_stats", {})
+            assert result["status"] == "success"
+        finally:
+            await client.close()
+            await server.close()
+        assert client.pool_stats()["acquired"] == 0
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_gas_client_caches_free_slots_until_a_write() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> None:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            await client.request("get_free_slots", {"date": "05.01.2026"})
+            await client.request("get_free_slots", {"date": "5.1.2026"})
+            await client.request("create_booking", {"date": "05.01.2026", "time": "10:00"})
+            await client.request("get_free_slots", {"date": "05.01.2026"})
+        finally:
+            await client.close()
+            await server.close()
+        assert client.cache_stats()["hits"] == 1
+
+    asyncio.run(scenario())
+    assert [call["action"] for call in calls] == [
+        "get_free_slots",
+        "create_booking",
+        "get_free_slots",
+    ]
+
+
+def test_gas_client_never_coalesces_writes() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> None:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            await asyncio.gather(
+                *(client.request("get_reviews", {"limit": 10}) for _ in range(3)),
+                *(client.request("confirm_payment", {"record_id": "ID_1"}) for _ in range(2)),
+            )
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.run(scenario())
+    actions = [call["action"] for call in calls]
+    assert actions.count("get_reviews") == 1
+    assert actions.count("confirm_payment") == 2
+
+
+def test_gas_client_batch_returns_per_call_results() -> None:
+    calls: list[dict] = []
+
+    async def handle(request: web.Request) -> web.Response:
+        body = await request.json()
+        calls.append(body)
+        results = [{"status": "success", "echo": call["action"]} for call in body["calls"]]
+        return web.json_response({"status": "success", "results": results})
+
+    app = web.Application()
+    app.router.add_post("/exec", handle)
+
+    async def scenario() -> list[dict]:
+        server = TestServer(app)
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token", batch_enabled=True)
+        try:
+            return await client.batch(
+                [
+                    ("get_booking_info", {"record_id": "ID_1"}),
+                    ("cancel_booking", {"record_id": "ID_1", "force": True}),
+                ],
+                stop_on_error=True,
+            )
+        finally:
+            await client.close()
+            await server.close()
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert calls[0]["action"] == "batch"
+    assert calls[0]["stop_on_error"] is True
+    assert [call["action"] for call in calls[0]["calls"]] == ["get_booking_info", "cancel_booking"]
+    assert [result["echo"] for result in results] == ["get_booking_info", "cancel_booking"]
+
+
+def test_gas_client_batch_maps_failed_reply_to_every_call() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> list[dict]:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            return await client.batch([("get_stats", {}), ("get_settings", {})])
+        finally:
+            await client.close()
+            await server.close()
+
+    results = asyncio.run(scenario())
+    assert [result["status"] for result in results] == ["error", "error"]
+
+
+def test_gas_client_retries_reads_but_not_writes() -> None:
+    calls: list[str] = []
+
+    async def handle(request: web.Request) -> web.Response:
+        body = await request.json()
+        calls.append(body["action"])
+        if calls.count(body["action"]) == 1:
+            return web.Response(status=503, text="cold start")
+        return web.json_response({"status": "success"})
+
+    app = web.Application()
+    app.router.add_post("/exec", handle)
+
+    async def scenario() -> tuple[dict, dict]:
+        server = TestServer(app)
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            read = await client.request("get_stats", {})
+            write = await client.request("confirm_payment", {"record_id": "ID_1"})
+            return read, write
+        finally:
+            await client.close()
+            await server.close()
+
+    read, write = asyncio.run(scenario())
+    assert read["status"] == "success"
+    assert write["status"] == "error"
+    assert calls == ["get_stats", "get_stats", "confirm_payment"]
+
+
+def test_gas_client_breaker_fails_fast_after_errors() -> None:
+    calls: list[str] = []
+
+    async def handle(request: web.Request) -> web.Response:
+        calls.append((await request.json())["action"])
+        return web.Response(status=500)
+
+    app = web.Application()
+    app.router.add_post("/exec", handle)
+
+    async def scenario() -> dict:
+        server = TestServer(app)
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            for _ in range(5):
+                await client.request("create_booking", {"date": "05.01.2026"})
+            result = await client.request("create_booking", {"date": "05.01.2026"})
+            assert client.breaker_stats()["create_booking"]["state"] == "open"
+            return result
+        finally:
+            await client.close()
+            await server.close()
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "error"
+    assert len(calls) == 5
+
+
+def test_gas_client_breaker_recovers_from_a_cancelled_probe() -> None:
+    calls: list[str] = []
+
+    async def handle(request: web.Request) -> web.Response:
+        calls.append((await request.json())["action"])
+        if len(calls) <= 5:
+            return web.Response(status=500)
+        if len(calls) == 6:
+            await asyncio.sleep(1)
+        return web.json_response({"status": "success"})
+
+    app = web.Application()
+    app.router.add_post("/exec", handle)
+
+    async def scenario() -> dict:
+        server = TestServer(app)
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        client._breakers["create_booking"] = CircuitBreaker(cooldown=0.05)
+        try:
+            for _ in range(5):
+                await client.request("create_booking", {"date": "05.01.2026"})
+            await asyncio.sleep(0.06)
+            probe = asyncio.ensure_future(client.request("create_booking", {"date": "05.01.2026"}))
+            await asyncio.sleep(0.05)
+            probe.cancel()
+            await asyncio.gather(probe, return_exceptions=True)
+            result = await client.request("create_booking", {"date": "05.01.2026"})
+            assert client.breaker_stats()["create_booking"]["state"] == "closed"
+            return result
+        finally:
+            await client.close()
+            await server.close()
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "success"
+    assert len(calls) == 7
+
+
+def test_gas_client_hedges_slow_reads() -> None:
+    calls: list[int] = []
+
+    async def handle(request: web.Request) -> web.Response:
+        calls.append(1)
+        # The 21st call (the first one hedged) stalls; its hedge answers quickly.
+        if len(calls) == 21:
+            await asyncio.sleep(2)
+        return web.json_response({"status": "success", "n": len(calls)})
+
+    app = web.Application()
+    app.router.add_post("/exec", handle)
+
+    async def scenario() -> dict:
+        server = TestServer(app)
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token", hedging=True)
+        try:
+            for _ in range(20):
+                await client.request("get_settings", {})
+            started = asyncio.get_running_loop().time()
+            result = await client.request("get_settings", {})
+            assert asyncio.get_running_loop().time() - started < 1.5
+            assert client.hedged == 1
+            return result
+        finally:
+            await client.close()
+            await server.close()
+
+    assert asyncio.run(scenario())["n"] == 22
+
+
+def test_gas_client_sends_a_write_once_per_idempotency_key() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> list[dict]:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            payload = {"record_id": "ID_1"}
+            results = list(
+                await asyncio.gather(
+                    *(
+                        client.request("confirm_payment", payload, idempotency_key="pay-ID_1")
+                        for _ in range(2)
+                    )
+                )
+            )
+            results.append(
+                await client.request("confirm_payment", payload, idempotency_key="pay-ID_1")
+            )
+            await client.request("cancel_booking", {"record_id": "ID_2"})
+            return results
+        finally:
+            await client.close()
+            await server.close()
+
+    results = asyncio.run(scenario())
+
+    assert [call["action"] for call in calls] == ["confirm_payment", "cancel_booking"]
+    assert calls[0]["idempotency_key"] == "pay-ID_1"
+    assert calls[1]["idempotency_key"].startswith("cancel_booking-")
+    assert [result.get("replayed", False) for result in results] == [False, False, True]
+
+
+def test_gas_client_sends_a_later_payment_confirmation_again() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> list[dict]:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            payload = {"record_id": "ID_1"}
+            return [
+                await client.request("confirm_payment", payload, idempotency_key=key)
+                for key in (
+                    payment_key("ID_1", 1, 10),
+                    payment_key("ID_1", 1, 10),
+                    payment_key("ID_1", 1, 11),
+                )
+            ]
+        finally:
+            await client.close()
+            await server.close()
+
+    results = asyncio.run(scenario())
+    # The second tap on the same button is replayed; a new message asks GAS again.
+    assert [result.get("replayed", False) for result in results] == [False, True, False]
+    assert len(calls) == 2
+
+
+def test_gas_client_sends_replica_sync_as_a_read() -> None:
+    calls: list[dict] = []
+
+    async def scenario() -> dict[str, int]:
+        server = TestServer(_make_app(calls))
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token")
+        try:
+            for cursor in ("", "c1", "c2"):
+                await client.request("get_changes", {"since": cursor})
+            return client.writes.stats()
+        finally:
+            await client.close()
+            await server.close()
+
+    stats = asyncio.run(scenario())
+    assert [call["action"] for call in calls] == ["get_changes"] * 3
+    assert not any("idempotency_key" in call for call in calls)
+    assert stats["size"] == 0
+
+
+def test_gas_client_retries_keyed_writes_when_gas_dedupes_them() -> None:
+    calls: list[dict] = []
+
+    async def handle(request: web.Request) -> web.Response:
+        body = await request.json()
+        calls.append(body)
+        if len(calls) == 1:
+            return web.Response(status=503, text="timeout")
+        return web.json_response({"status": "success"})
+
+    app = web.Application()
+    app.router.add_post("/exec", handle)
+
+    async def scenario() -> dict:
+        server = TestServer(app)
+        await server.start_server()
+        client = GasClient(str(server.make_url("/exec")), "token", idempotent_writes=True)
+        try:
+            return await client.request("create_booking", {"date": "01.01.2030"})
+        finally:
+            await client.close()
+            await server.close()
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "success"
+    assert len(calls) == 2
+    assert calls[0]["idempotency_key"] == calls[1]["idempotency_key"]
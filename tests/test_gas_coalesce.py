@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+
+from coworkingbot.services.gas_coalesce import SingleFlight, request_key
+
+
+def test_request_key_ignores_payload_order() -> None:
+    assert request_key("get_reviews", {"limit": 10, "public_only": True}) == request_key(
+        "get_reviews", {"public_only": True, "limit": 10}
+    )
+    assert request_key("get_reviews", {"limit": 10}) != request_key("get_reviews", {"limit": 20})
+
+
+def test_single_flight_shares_one_call() -> None:
+    calls = 0
+
+    async def fetch() -> dict:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"status": "success"}
+
+    async def scenario() -> list[dict]:
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.run("key", fetch) for _ in range(5)))
+        assert flight.stats() == {"started": 1, "coalesced": 4, "abandoned": 0, "inflight": 0}
+        return results
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == [{"status": "success"}] * 5
+
+
+def test_single_flight_survives_cancelled_caller() -> None:
+    async def fetch() -> dict:
+        await asyncio.sleep(0.02)
+        return {"status": "success"}
+
+    async def scenario() -> dict:
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.run("key", fetch))
+        second = asyncio.ensure_future(flight.run("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == {"status": "success"}
+
+
+def test_single_flight_cancels_the_call_when_every_caller_gives_up() -> None:
+    finished = False
+
+    async def fetch() -> dict:
+        nonlocal finished
+        await asyncio.sleep(0.05)
+        finished = True
+        return {"status": "success"}
+
+    async def scenario() -> SingleFlight:
+        flight = SingleFlight()
+        callers = [asyncio.ensure_future(flight.run("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.06)
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert not finished
+    assert flight.stats()["abandoned"] == 1
+    assert flight.stats()["inflight"] == 0
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+from coworkingbot.devtools.loadtest import LoadTest, LoadTestConfig, format_report
+
+
+@pytest.fixture(autouse=True)
+def _clean_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in ("BOT_TOKEN", "GAS_WEBAPP_URL", "API_TOKEN", "ADMIN_IDS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("BOT_MODE", "polling")
+
+
+def test_load_test_books_every_user_through_the_dispatcher() -> None:
+    report = asyncio.run(LoadTest(LoadTestConfig(users=8, admins=1, concurrency=4, seed=1)).run())
+
+    assert report["bookings_completed"] == 8
+    assert report["failed_users"] == 0
+    assert report["handler_errors"] == 0
+    assert report["steps"]["confirm"]["count"] == 8
+    assert report["steps"]["summary_today"]["count"] == 1
+    assert report["gas_calls"]["create_booking"] == 8
+    assert report["gas_calls_per_booking"] >= 1
+    assert report["telegram_calls"]["SendMessage"] > 0
+    assert "p99 ms" in format_report(report)
+    # The fake token and GAS URL do not outlive the run.
+    assert "BOT_TOKEN" not in os.environ
+    assert "GAS_WEBAPP_URL" not in os.environ
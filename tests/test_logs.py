@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import random
+
+from coworkingbot.app.logs import (
+    LogPipeline,
+    RateLimitFilter,
+    SamplingFilter,
+    parse_sampling,
+    redact,
+)
+from coworkingbot.services.tracing import Trace, traced
+
+
+def make_record(name: str, level: int = logging.INFO, msg: str = "hello") -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, (), None)
+
+
+def test_redact_masks_phones_and_name_fields_but_not_ids() -> None:
+    text = redact(
+        "{'name': 'Иван Петров', 'phone': '9123456789', 'user_id': '7123456789'} "
+        "client_name=Анна call +7 (912) 345-67-89"
+    )
+
+    assert "Иван" not in text and "Анна" not in text
+    assert "9123456789" not in text and "345-67" not in text
+    assert "'user_id': '7123456789'" in text
+    assert "call ***89" in text
+
+
+def test_sampling_applies_to_chatty_loggers_below_warning_only() -> None:
+    sampling = SamplingFilter(parse_sampling("aiogram.event=0,bad,x=oops"), random.Random(1))
+
+    assert not sampling.filter(make_record("aiogram.event"))
+    assert not sampling.filter(make_record("aiogram.event.child"))
+    assert sampling.filter(make_record("aiogram.event", logging.WARNING))
+    assert sampling.filter(make_record("coworkingbot.routers.booking"))
+
+
+def test_rate_limit_reports_how_many_records_it_dropped() -> None:
+    limit = RateLimitFilter(rate=0.0001, burst=2, repeat_per_minute=1)
+
+    passed = [limit.filter(make_record("noisy")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limit.filter(make_record("noisy", logging.WARNING, "GAS down"))
+    assert not limit.filter(make_record("noisy", logging.WARNING, "GAS down"))
+    assert limit.filter(make_record("noisy", logging.WARNING, "other"))
+    assert limit.dropped == 4
+
+    limit._buckets["noisy"] = (5.0, limit._buckets["noisy"][1])
+    record = make_record("noisy")
+    assert limit.filter(record)
+    assert record.suppressed == 3
+
+
+def test_pipeline_writes_redacted_json_with_trace_id() -> None:
+    stream = io.StringIO()
+    pipeline = LogPipeline(stream=stream)
+    root = logging.getLogger("coworkingbot.test_logs")
+    root.propagate = False
+    pipeline.install(root)
+    try:
+        with traced(Trace("abc123")):
+            root.info("Booking for %s", {"name": "Мария", "phone": "+79123456789"})
+        try:
+            raise ValueError("phone=89123456789")
+        except ValueError:
+            root.exception("Failed")
+    finally:
+        pipeline.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["msg"] for line in lines] == [
+        "Booking for {'name': '***', 'phone': '***'}",
+        "Failed",
+    ]
+    assert lines[0]["trace_id"] == "abc123"
+    assert lines[1]["trace_id"] == "-"
+    assert "ValueError: phone=***" in lines[1]["exc"]
+    assert pipeline.stats()["dropped_full"] == 0
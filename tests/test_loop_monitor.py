@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from coworkingbot.services.loop_monitor import LoopMonitor
+
+
+def blocking_call() -> None:
+    time.sleep(0.3)
+
+
+def test_monitor_records_lag_and_the_stack_of_a_blocking_call() -> None:
+    async def scenario() -> LoopMonitor:
+        monitor = LoopMonitor(tick=0.02, stall_threshold=0.1)
+        await monitor.start()
+        await asyncio.sleep(0.1)
+        blocking_call()
+        await asyncio.sleep(0.15)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+
+    assert monitor.stall_count == 1
+    stall = monitor.stalls[0]
+    assert "blocking_call" in stall.stack
+    assert 0.15 <= stall.seconds <= 0.5
+    stats = monitor.stats()
+    assert stats["samples"] > 3
+    assert stats["max_ms"] >= 250
+    assert stats["p50_ms"] < 100
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+
+from aiogram import Bot, Dispatcher, Router, types
+from aiogram.fsm.context import FSMContext
+from aiohttp.test_utils import TestClient, TestServer
+from coworkingbot.app.middleware import HandlerMetricsMiddleware, UpdateMetricsMiddleware
+from coworkingbot.app.update_queue import UpdateScheduler
+from coworkingbot.devtools.fake_gas import FakeGasServer, FaultProfile
+from coworkingbot.devtools.loadtest import RecordingSession
+from coworkingbot.services.gas import GasClient
+from coworkingbot.services.metrics import BotMetrics, MetricsServer, Registry
+
+
+def test_registry_renders_prometheus_text() -> None:
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls.", ("action",))
+    latency = registry.histogram("call_seconds", "Call time.", ("action",))
+    registry.sampled("depth", "Queue depth.", lambda: [((), 3)])
+    calls.inc("get_free_slots")
+    calls.inc("get_free_slots")
+    latency.observe(0.07, "get_free_slots")
+    latency.observe(40, "get_free_slots")
+
+    text = registry.render()
+    assert "# TYPE coworkingbot_calls_total counter" in text
+    assert 'coworkingbot_calls_total{action="get_free_slots"} 2' in text
+    assert 'coworkingbot_call_seconds_bucket{action="get_free_slots",le="0.05"} 0' in text
+    assert 'coworkingbot_call_seconds_bucket{action="get_free_slots",le="0.1"} 1' in text
+    assert 'coworkingbot_call_seconds_bucket{action="get_free_slots",le="+Inf"} 2' in text
+    assert 'coworkingbot_call_seconds_count{action="get_free_slots"} 2' in text
+    assert "coworkingbot_depth 3" in text
+
+
+def test_gas_and_handler_metrics_are_exported() -> None:
+    metrics = BotMetrics()
+    fake = FakeGasServer(token="dev", faults=FaultProfile(error_rate=0.0), seed=1)
+    router = Router()
+
+    @router.message()
+    async def echo(message: types.Message, state: FSMContext) -> None:
+        await state.set_state("Demo:waiting")
+        await message.answer("ok")
+
+    async def scenario() -> str:
+        server = TestServer(fake.make_app())
+        await server.start_server()
+        gas = GasClient(str(server.make_url("/exec")), "dev")
+        metrics.watch_gas(gas)
+        await gas.request("get_stats", {})
+        await gas.request("cancel_booking", {"record_id": "missing"})
+
+        bot = Bot("123456:metrics")
+        bot.session = RecordingSession()
+        metrics.watch_bot(bot)
+        dp = Dispatcher()
+        dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+        dp.message.middleware(HandlerMetricsMiddleware(metrics))
+        dp.include_router(router)
+        metrics.watch_fsm(dp.storage)
+        await dp.feed_raw_update(
+            bot,
+            {
+                "update_id": 1,
+                "message": {
+                    "message_id": 1,
+                    "date": 0,
+                    "chat": {"id": 5, "type": "private"},
+                    "from": {"id": 5, "is_bot": False, "first_name": "A"},
+                    "text": "hi",
+                },
+            },
+        )
+
+        client = TestClient(TestServer(MetricsServer(metrics.registry, "127.0.0.1", 0).make_app()))
+        await client.start_server()
+        try:
+            response = await client.get("/metrics")
+            assert response.headers["Content-Type"].startswith("text/plain")
+            return await response.text()
+        finally:
+            await client.close()
+            await gas.close()
+            await server.close()
+
+    text = asyncio.run(scenario())
+    assert 'coworkingbot_gas_requests_total{action="get_stats",outcome="ok"} 1' in text
+    assert 'coworkingbot_gas_requests_total{action="cancel_booking",outcome="error"} 1' in text
+    assert 'coworkingbot_update_seconds_count{event="message"} 1' in text
+    assert 'coworkingbot_handler_seconds_count{router="test_metrics",handler="echo"} 1' in text
+    assert 'coworkingbot_telegram_requests_total{method="sendMessage",outcome="ok"} 1' in text
+    assert 'coworkingbot_fsm_states{state="Demo:waiting"} 1' in text
+    assert 'coworkingbot_gas_cache_hit_ratio{cache="slot_cache"} 0' in text
+
+
+def test_update_queue_metrics_do_not_name_chats() -> None:
+    metrics = BotMetrics()
+    scheduler = UpdateScheduler(max_concurrency=4)
+    metrics.watch_updates(scheduler)
+
+    async def scenario() -> str:
+        release = asyncio.Event()
+        tasks = [
+            asyncio.create_task(scheduler.run(chat, release.wait))
+            for chat in (1001, 1001, 1001, 2002, 2002, 3003)
+        ]
+        await asyncio.sleep(0)
+        text = metrics.registry.render()
+        release.set()
+        await asyncio.gather(*tasks)
+        return text
+
+    text = asyncio.run(scenario())
+    assert "coworkingbot_update_queue_depth 6" in text
+    assert "coworkingbot_update_queue_max_chat_depth 3" in text
+    assert "coworkingbot_update_queue_chats_waiting 2" in text
+    assert "1001" not in text
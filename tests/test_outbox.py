@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+
+from coworkingbot.services.outbox import Outbox, OutboxRelay
+
+
+class DummyNotifier:
+    def __init__(self, failing: set[int]) -> None:
+        self.failing = failing
+        self.delivered: list[tuple[int, str]] = []
+
+    async def deliver(self, chat_id: int, text: str, **kwargs) -> bool:
+        if chat_id in self.failing:
+            return False
+        self.delivered.append((chat_id, text))
+        return True
+
+
+def test_outbox_survives_restart_and_retries_failures(tmp_path) -> None:
+    path = tmp_path / "outbox.sqlite3"
+
+    async def enqueue() -> None:
+        outbox = Outbox(path)
+        await outbox.put_many([(1, "новая бронь"), (2, "новая бронь")])
+        await outbox.put(3, "требуется действие")
+        outbox.close()
+
+    asyncio.run(enqueue())
+
+    async def relay() -> None:
+        outbox = Outbox(path)
+        assert outbox.stats() == {"pending": 3, "dead": 0}
+        notifier = DummyNotifier(failing={2})
+        relay = OutboxRelay(outbox, notifier)
+
+        assert await relay.relay_once() == 3
+        assert notifier.delivered == [(1, "новая бронь"), (3, "требуется действие")]
+        assert outbox.stats() == {"pending": 1, "dead": 0}
+        # The failed row is backed off, not retried immediately.
+        assert await relay.relay_once() == 0
+        assert outbox.next_due_in() > 0
+        outbox.close()
+
+    asyncio.run(relay())
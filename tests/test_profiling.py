@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from coworkingbot.services.profiling import Profiler
+
+
+def burn_cpu(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+
+def test_cpu_profile_finds_the_busy_function_and_can_be_stopped_early() -> None:
+    profiler = Profiler()
+
+    async def scenario():
+        task = asyncio.create_task(profiler.profile_cpu(60))
+        await asyncio.sleep(0.05)
+        assert profiler.cpu_running
+        burn_cpu(0.3)
+        await asyncio.sleep(0.1)
+        assert profiler.stop_cpu()
+        return await task
+
+    started = time.monotonic()
+    result = asyncio.run(scenario())
+    assert time.monotonic() - started < 5
+    assert not profiler.cpu_running
+    assert result.samples > result.idle > 0
+    assert "burn_cpu" in result.render()
+
+
+def test_memory_snapshots_report_growth_between_calls() -> None:
+    profiler = Profiler()
+    kept: list[bytes] = []
+
+    async def scenario() -> tuple[str, str]:
+        first = await profiler.memory_snapshot()
+        kept.extend(b"x" * 4096 for _ in range(500))
+        second = await profiler.memory_snapshot()
+        return first, second
+
+    try:
+        first, second = asyncio.run(scenario())
+    finally:
+        assert profiler.stop_memory()
+    assert "baseline" in first
+    assert "changes since" in second
+    assert "test_profiling.py" in second
+    assert not profiler.memory_tracing
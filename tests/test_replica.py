@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+
+import pytz
+from coworkingbot.services.replica import BookingReplica
+
+
+def _replica(tmp_path) -> BookingReplica:
+    replica = BookingReplica(tmp_path / "replica.sqlite3", pytz.timezone("Europe/Moscow"))
+    replica.apply_changes(
+        {
+            "status": "success",
+            "cursor": "c1",
+            "slot_grid": ["10:00-12:00", "12:00-14:00", "14:00-16:00"],
+            "exceptions": [{"date": "02.03.2099", "slot": "14:00-16:00"}],
+            "changes": [
+                {"id": "ID_1", "date": "02.03.2099", "time": "10:00-12:00", "user_id": "7"},
+                {"id": "ID_2", "date": "02.03.2099", "time": "12:00-14:00", "user_id": "8"},
+                {"id": "ID_3", "date": "03.03.2099", "time": "10:00-12:00", "user_id": "7"},
+            ],
+        }
+    )
+    return replica
+
+
+def test_replica_answers_reads_like_gas(tmp_path) -> None:
+    replica = _replica(tmp_path)
+
+    bookings = replica.answer("get_user_bookings", {"user_id": 7, "active_only": False})
+    assert [b["id"] for b in bookings["bookings"]] == ["ID_1", "ID_3"]
+
+    busy = replica.answer("get_busy_slots", {"date": "02.03.2099"})
+    assert [slot["time"] for slot in busy["busy_slots"]] == ["10:00-12:00", "12:00-14:00"]
+
+    free = replica.answer("get_free_slots", {"date": "03.03.2099"})
+    assert free["free_slots"] == ["12:00-14:00", "14:00-16:00"]
+    free = replica.answer("get_free_slots", {"date": "02.03.2099"})
+    assert free["free_slots"] == []
+    assert replica.cursor() == "c1"
+
+
+def test_replica_applies_deletes(tmp_path) -> None:
+    replica = _replica(tmp_path)
+    replica.apply_changes(
+        {"status": "success", "cursor": "c2", "changes": [{"id": "ID_1", "deleted": True}]}
+    )
+
+    bookings = replica.answer("get_user_bookings", {"user_id": 7, "active_only": False})
+    assert [b["id"] for b in bookings["bookings"]] == ["ID_3"]
+    assert replica.stats()["rows"] == 2
+
+
+def test_cancelled_rows_free_their_slot(tmp_path) -> None:
+    replica = _replica(tmp_path)
+    replica.apply_changes(
+        {
+            "status": "success",
+            "cursor": "c2",
+            "changes": [
+                {
+                    "id": "ID_3",
+                    "date": "03.03.2099",
+                    "time": "10:00-12:00",
+                    "user_id": "7",
+                    "status": "Отменено",
+                }
+            ],
+        }
+    )
+
+    free = replica.answer("get_free_slots", {"date": "03.03.2099"})
+    assert free["free_slots"] == ["10:00-12:00", "12:00-14:00", "14:00-16:00"]
+    assert replica.answer("get_busy_slots", {"date": "03.03.2099"})["busy_slots"] == []
+    active = replica.answer("get_user_bookings", {"user_id": 7, "active_only": True})
+    assert [b["id"] for b in active["bookings"]] == ["ID_1"]
+    history = replica.answer("get_user_bookings", {"user_id": 7, "active_only": False})
+    assert [b["id"] for b in history["bookings"]] == ["ID_1", "ID_3"]
+
+
+def test_replica_from_an_older_schema_is_rebuilt(tmp_path) -> None:
+    path = tmp_path / "replica.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE bookings (record_id TEXT PRIMARY KEY, day TEXT, time TEXT, "
+        "user_id TEXT, row TEXT);"
+        "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);"
+        "INSERT INTO meta VALUES ('cursor', 'old');"
+    )
+    conn.commit()
+    conn.close()
+
+    replica = BookingReplica(path, pytz.timezone("Europe/Moscow"))
+    assert replica.cursor() == ""
+    assert replica.stats()["rows"] == 0
+
+
+def test_replica_is_stale_after_a_write(tmp_path) -> None:
+    replica = _replica(tmp_path)
+    assert not replica.is_fresh(60)
+
+    replica.mark_synced(time.monotonic(), replica.write_marker())
+    assert replica.is_fresh(60)
+
+    marker = replica.write_marker()
+    replica.mark_dirty()
+    assert not replica.is_fresh(60)
+
+    replica.mark_synced(time.monotonic(), marker)
+    assert not replica.is_fresh(60)
+    replica.mark_synced(time.monotonic(), replica.write_marker())
+    assert replica.is_fresh(60)
+
+
+def test_replica_reads_do_not_wait_for_a_sync_in_progress(tmp_path) -> None:
+    replica = _replica(tmp_path)
+    writing = threading.Event()
+
+    def slow_sync() -> None:
+        with replica._lock, replica._conn:
+            replica._conn.execute("DELETE FROM bookings WHERE record_id = 'ID_1'")
+            writing.set()
+            time.sleep(0.3)
+
+    sync = threading.Thread(target=slow_sync)
+    sync.start()
+    writing.wait()
+    started = time.monotonic()
+    bookings = replica.answer("get_user_bookings", {"user_id": 7, "active_only": False})
+    elapsed = time.monotonic() - started
+    sync.join()
+
+    # The read saw the last committed sync, not the one being written.
+    assert [b["id"] for b in bookings["bookings"]] == ["ID_1", "ID_3"]
+    assert elapsed < 0.2
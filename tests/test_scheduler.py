@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytz
+from coworkingbot.routers.admin import _run_scheduled_job
+from coworkingbot.services.jobs import send_reminders
+from coworkingbot.services.scheduler import CronSpec, Job, JobStateStore, Scheduler
+
+TZ = pytz.timezone("Europe/Moscow")
+
+
+def test_cron_spec_next_after() -> None:
+    spec = CronSpec.parse("*/15 9-18 * * 1-5")
+    friday_evening = TZ.localize(datetime(2026, 10, 16, 18, 50))
+    assert spec.next_after(friday_evening) == TZ.localize(datetime(2026, 10, 19, 9, 0))
+    assert spec.next_after(TZ.localize(datetime(2026, 10, 19, 9, 0))).minute == 15
+
+    # Day-of-month and day-of-week both restricted: either one matches, as in cron.
+    first_or_monday = CronSpec.parse("0 9 1 * 1")
+    saturday = TZ.localize(datetime(2026, 10, 17, 12, 0))
+    assert first_or_monday.next_after(saturday) == TZ.localize(datetime(2026, 10, 19, 9, 0))
+    tuesday = TZ.localize(datetime(2026, 10, 27, 12, 0))
+    # November 1st is a Sunday.
+    assert first_or_monday.next_after(tuesday) == TZ.localize(datetime(2026, 11, 1, 9, 0))
+    assert CronSpec.parse("0 9 */2 * 1").next_after(saturday).day == 19
+
+    with pytest.raises(ValueError):
+        CronSpec.parse("61 * * * *")
+    with pytest.raises(ValueError):
+        CronSpec.parse("* * *")
+
+
+def test_run_now_refuses_overlap_and_persists_state(tmp_path) -> None:
+    path = tmp_path / "scheduler.json"
+
+    async def scenario() -> None:
+        release = asyncio.Event()
+
+        async def slow(data: dict) -> dict:
+            data["runs"] = data.get("runs", 0) + 1
+            await release.wait()
+            return {"ok": True}
+
+        scheduler = Scheduler(JobStateStore(path), TZ)
+        scheduler.add(Job("slow", CronSpec.parse("0 0 1 1 *"), slow))
+        first = asyncio.create_task(scheduler.run_now("slow"))
+        await asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            await scheduler.run_now("slow")
+        release.set()
+        assert await first == {"ok": True}
+
+    asyncio.run(scenario())
+
+    store = JobStateStore(path)
+    assert store.job("slow")["data"] == {"runs": 1}
+    assert store.last_run("slow") is not None
+
+
+@dataclass
+class DummyGas:
+    bookings: dict[str, list[dict]]
+
+    async def request(self, action: str, payload: dict) -> dict:
+        assert action == "get_reminder_targets"
+        return {"status": "success", "bookings": self.bookings.get(payload["date"], [])}
+
+
+@dataclass
+class DummyBot:
+    sent: list[tuple[int, str]] = field(default_factory=list)
+    # Chats whose next send fails once.
+    failing: set[int] = field(default_factory=set)
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str) -> None:
+        if chat_id in self.failing:
+            self.failing.discard(chat_id)
+            raise RuntimeError("Forbidden: bot was blocked by the user")
+        self.sent.append((chat_id, text))
+
+
+@dataclass
+class DummyCtx:
+    gas: DummyGas
+    bot: DummyBot
+    tz: pytz.tzinfo.BaseTzInfo = TZ
+    notifier: object | None = None
+
+
+def test_reminders_are_sent_once_per_window() -> None:
+    soon = datetime.now(TZ) + timedelta(minutes=90)
+    later = datetime.now(TZ) + timedelta(hours=20)
+
+    def row(record_id: str, start: datetime, user_id: int) -> dict:
+        return {
+            "id": record_id,
+            "date": start.strftime("%d.%m.%Y"),
+            "time": f"{start:%H:%M}-{start + timedelta(hours=1):%H:%M}",
+            "user_id": user_id,
+        }
+
+    rows: dict[str, list[dict]] = {}
+    for item in (row("ID_1", soon, 1), row("ID_2", later, 2)):
+        rows.setdefault(item["date"], []).append(item)
+    ctx = DummyCtx(gas=DummyGas(rows), bot=DummyBot())
+    data: dict = {}
+
+    stats = asyncio.run(send_reminders(ctx, data))
+    assert stats == {"day_before": 1, "two_hours_before": 1, "errors": 0}
+    assert sorted(chat_id for chat_id, _ in ctx.bot.sent) == [1, 2]
+
+    stats = asyncio.run(send_reminders(ctx, data))
+    assert stats == {"day_before": 0, "two_hours_before": 0, "errors": 0}
+    assert len(ctx.bot.sent) == 2
+
+
+def test_failed_reminder_is_sent_again_on_the_next_run() -> None:
+    soon = datetime.now(TZ) + timedelta(minutes=90)
+    booking = {
+        "id": "ID_1",
+        "date": soon.strftime("%d.%m.%Y"),
+        "time": f"{soon:%H:%M}-{soon + timedelta(hours=1):%H:%M}",
+        "user_id": 1,
+    }
+    ctx = DummyCtx(gas=DummyGas({booking["date"]: [booking]}), bot=DummyBot(failing={1}))
+    data: dict = {}
+
+    stats = asyncio.run(send_reminders(ctx, data))
+    assert stats == {"day_before": 0, "two_hours_before": 0, "errors": 1}
+    assert data["sent"] == {}
+
+    stats = asyncio.run(send_reminders(ctx, data))
+    assert stats == {"day_before": 0, "two_hours_before": 1, "errors": 0}
+    assert [chat_id for chat_id, _ in ctx.bot.sent] == [1]
+    assert sorted(data["sent"]) == ["ID_1:day_before", "ID_1:two_hours_before"]
+
+
+def test_admin_button_falls_back_to_gas_for_a_job_the_bot_does_not_run(tmp_path) -> None:
+    calls: list[str] = []
+
+    async def request(action: str, payload: dict) -> dict:
+        calls.append(action)
+        return {"status": "success", "cancelled_count": 2}
+
+    # Scheduler on, but only the reminders job has a cron.
+    scheduler = Scheduler(JobStateStore(tmp_path / "scheduler.json"), TZ)
+
+    async def reminders(data: dict) -> dict:
+        return {"day_before": 1}
+
+    scheduler.add(Job("reminders", CronSpec.parse("*/5 * * * *"), reminders))
+    ctx = SimpleNamespace(scheduler=scheduler, gas=SimpleNamespace(request=request))
+
+    async def scenario() -> tuple[dict, dict]:
+        return (
+            await _run_scheduled_job(ctx, "auto_cancel", "auto_cancel"),
+            await _run_scheduled_job(ctx, "reminders", "send_reminders"),
+        )
+
+    cancelled, reminded = asyncio.run(scenario())
+    assert calls == ["auto_cancel"]
+    assert cancelled["cancelled_count"] == 2
+    assert reminded["stats"] == {"day_before": 1}
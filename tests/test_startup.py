@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from coworkingbot.app.lazy_router import LazyRouter
+from coworkingbot.devtools.loadtest import RecordingSession
+from coworkingbot.devtools.startup import check, measure
+
+LAZY_MODULE = """
+from aiogram import Router
+from aiogram.filters import Command
+
+router = Router()
+
+
+@router.message(Command("secret"))
+async def secret(message):
+    await message.answer("loaded")
+"""
+
+
+def message_update(update_id: int, user_id: int, text: str) -> Update:
+    message: dict[str, Any] = {
+        "message_id": update_id,
+        "date": 0,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return Update.model_validate({"update_id": update_id, "message": message})
+
+
+def test_lazy_router_imports_its_module_on_the_first_wanted_update(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    (tmp_path / "lazy_secret_router.py").write_text(LAZY_MODULE, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    lazy = LazyRouter("lazy_secret_router", lambda event, data: event.text.startswith("/"))
+    dp = Dispatcher()
+    dp.include_router(lazy)
+    session = RecordingSession()
+    bot = Bot("42:TEST", session=session)
+
+    async def scenario() -> None:
+        await dp.feed_update(bot, message_update(1, 7, "hello"))
+        assert "lazy_secret_router" not in sys.modules
+        await dp.feed_update(bot, message_update(2, 7, "/secret"))
+
+    asyncio.run(scenario())
+
+    assert lazy.loaded
+    assert [m.text for m in session.outgoing[7]] == ["loaded"]
+
+
+def test_check_reports_every_metric_over_budget() -> None:
+    result = {"import_ms": 900.0, "time_to_first_update_ms": 1200.0, "rss_mib": 90.0}
+    budget = {"import_ms": 1000, "time_to_first_update_ms": 1000, "rss_mib": 80}
+
+    assert check(result, budget) == [
+        "time_to_first_update_ms: 1200.0 over budget 1000",
+        "rss_mib: 90.0 over budget 80",
+    ]
+    assert check({**result, "admin_loaded": True}, {})[0].startswith("admin_loaded")
+
+
+def test_probe_answers_start_without_loading_the_admin_router() -> None:
+    result = measure(runs=1)
+
+    assert result["admin_loaded"] is False
+    assert 0 < result["import_ms"] <= result["time_to_first_update_ms"]
+    assert result["rss_mib"] > 0
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import pytest
+from aiogram import Bot, Dispatcher, Router, types
+from aiohttp.test_utils import TestServer
+from coworkingbot.app.middleware import TraceHandlerMiddleware, TracingMiddleware
+from coworkingbot.devtools.fake_gas import FakeGasServer
+from coworkingbot.devtools.loadtest import RecordingSession
+from coworkingbot.services.gas import GasClient
+from coworkingbot.services.tracing import TraceLogFilter, TraceRequestMiddleware, current_trace_id
+
+
+def test_update_summary_breaks_down_gas_and_telegram_time(caplog: pytest.LogCaptureFixture) -> None:
+    fake = FakeGasServer(token="dev", seed=1)
+    router = Router()
+    seen: dict[str, str | None] = {}
+
+    async def scenario() -> None:
+        server = TestServer(fake.make_app())
+        await server.start_server()
+        gas = GasClient(str(server.make_url("/exec")), "dev")
+
+        @router.message()
+        async def show_stats(message: types.Message) -> None:
+            seen["trace_id"] = current_trace_id()
+            await gas.request("get_stats", {})
+            await message.answer("ok")
+
+        bot = Bot("123456:tracing")
+        bot.session = RecordingSession()
+        bot.session.middleware(TraceRequestMiddleware())
+        dp = Dispatcher()
+        dp.update.outer_middleware(TracingMiddleware())
+        dp.message.middleware(TraceHandlerMiddleware())
+        dp.include_router(router)
+        try:
+            await dp.feed_raw_update(
+                bot,
+                {
+                    "update_id": 42,
+                    "message": {
+                        "message_id": 1,
+                        "date": 0,
+                        "chat": {"id": 7, "type": "private"},
+                        "from": {"id": 7, "is_bot": False, "first_name": "A"},
+                        "text": "stats",
+                    },
+                },
+            )
+        finally:
+            await gas.close()
+            await server.close()
+
+    with caplog.at_level(logging.INFO, logger="coworkingbot.trace"):
+        asyncio.run(scenario())
+
+    (record,) = [r for r in caplog.records if r.name == "coworkingbot.trace"]
+    summary = record.trace
+    assert summary["trace_id"] == seen["trace_id"]
+    assert summary["update_id"] == 42
+    assert summary["user_id"] == 7
+    assert summary["handler"] == "test_tracing.show_stats"
+    assert summary["gas_calls"] == 1
+    assert summary["telegram_calls"] == 1
+    assert summary["total_ms"] >= summary["gas_ms"]
+    assert 0 <= summary["other_ms"] <= summary["total_ms"]
+    assert list(fake.trace_ids) == [seen["trace_id"]]
+
+
+def test_log_filter_tags_records_outside_updates() -> None:
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", (), None)
+    assert TraceLogFilter().filter(record)
+    assert record.trace_id == "-"
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+
+from aiogram import Bot, F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from coworkingbot.app.middleware import CallbackAckMiddleware, LatestWinsMiddleware
+from coworkingbot.app.update_queue import (
+    LATEST_WINS,
+    LatestWins,
+    ScheduledDispatcher,
+    UpdateScheduler,
+)
+from coworkingbot.devtools.loadtest import RecordingSession
+from coworkingbot.services.callback_answers import CallbackAnswerDedupe, CallbackAnswers
+
+
+class Confirming(StatesGroup):
+    waiting = State()
+
+
+def test_scheduler_orders_one_chat_and_limits_all_chats() -> None:
+    async def scenario() -> None:
+        scheduler = UpdateScheduler(max_concurrency=2)
+        log: list[str] = []
+        release = asyncio.Event()
+        peak = 0
+
+        async def job(name: str) -> str:
+            nonlocal peak
+            peak = max(peak, scheduler.running)
+            log.append(f"start {name}")
+            await release.wait()
+            log.append(f"end {name}")
+            return name
+
+        tasks = [
+            asyncio.create_task(scheduler.run(key, lambda name=name: job(name)))
+            for key, name in ((1, "a1"), (1, "a2"), (2, "b1"), (3, "c1"))
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.depths() == {1: 2, 2: 1, 3: 1}
+        assert scheduler.total == 4
+        assert log == ["start a1", "start b1"]
+
+        release.set()
+        assert await asyncio.gather(*tasks) == ["a1", "a2", "b1", "c1"]
+        assert log.index("end a1") < log.index("start a2")
+        assert peak == 2
+        assert scheduler.depths() == {}
+        assert scheduler.total == 0
+
+    asyncio.run(scenario())
+
+
+def test_double_tap_sees_the_state_left_by_the_first_tap() -> None:
+    user = User(id=7, is_bot=False, first_name="Test")
+    router = Router()
+    created: list[int] = []
+
+    @router.callback_query(Confirming.waiting, F.data == "confirm")
+    async def confirm(callback: CallbackQuery, state: FSMContext) -> None:
+        await asyncio.sleep(0.02)
+        created.append(callback.message.message_id)
+        await state.clear()
+
+    def tap(update_id: int) -> Update:
+        message = Message(message_id=1, date=0, chat=Chat(id=user.id, type="private"))
+        return Update(
+            update_id=update_id,
+            callback_query=CallbackQuery(
+                id=str(update_id),
+                from_user=user,
+                chat_instance="ci",
+                data="confirm",
+                message=message,
+            ),
+        )
+
+    async def scenario() -> None:
+        dp = ScheduledDispatcher(scheduler=UpdateScheduler(max_concurrency=4))
+        dp.include_router(router)
+        bot = Bot("42:TEST", session=RecordingSession())
+        await dp.fsm.get_context(bot, chat_id=user.id, user_id=user.id).set_state(
+            Confirming.waiting
+        )
+        await asyncio.gather(dp.feed_update(bot, tap(1)), dp.feed_update(bot, tap(2)))
+
+    asyncio.run(scenario())
+
+    assert created == [1]
+
+
+def test_queued_callback_is_acked_while_it_waits_for_the_chat() -> None:
+    user = User(id=7, is_bot=False, first_name="Test")
+    router = Router()
+
+    @router.callback_query()
+    async def slow(callback: CallbackQuery) -> None:
+        await asyncio.sleep(0.3)
+
+    def tap(update_id: int) -> Update:
+        return Update(
+            update_id=update_id,
+            callback_query=CallbackQuery(
+                id=str(update_id), from_user=user, chat_instance="ci", data="slow"
+            ),
+        )
+
+    async def scenario() -> int:
+        session = RecordingSession()
+        answers = CallbackAnswers()
+        session.middleware(CallbackAnswerDedupe(answers))
+        bot = Bot("42:TEST", session=session)
+        dp = ScheduledDispatcher(scheduler=UpdateScheduler(max_concurrency=4))
+        ack = CallbackAckMiddleware(answers, deadline=0.05)
+        dp.callback_query.outer_middleware(ack)
+        dp.arrival_hooks.append(ack.arrived)
+        dp.include_router(router)
+
+        taps = [asyncio.create_task(dp.feed_update(bot, tap(i))) for i in (1, 2)]
+        # The second tap still waits behind the first one's handler.
+        await asyncio.sleep(0.15)
+        acked = session.calls["AnswerCallbackQuery"]
+        await asyncio.gather(*taps)
+        assert session.calls["AnswerCallbackQuery"] == 2
+        return acked
+
+    assert asyncio.run(scenario()) == 2
+
+
+def message_update(update_id: int, text: str) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=0,
+            chat=Chat(id=7, type="private"),
+            from_user=User(id=7, is_bot=False, first_name="Test"),
+            text=text,
+        ),
+    )
+
+
+def test_newer_message_cancels_or_skips_latest_wins_lookups() -> None:
+    router = Router()
+    started: list[str] = []
+    finished: list[str] = []
+
+    @router.message(F.text.startswith("date"), flags={LATEST_WINS: True})
+    async def lookup(message: Message) -> None:
+        started.append(message.text)
+        await asyncio.sleep(0.05)
+        finished.append(message.text)
+
+    @router.message(F.text == "save")
+    async def save(message: Message) -> None:
+        await asyncio.sleep(0.05)
+        finished.append(message.text)
+
+    async def scenario() -> UpdateScheduler:
+        scheduler = UpdateScheduler(max_concurrency=4)
+        dp = ScheduledDispatcher(scheduler=scheduler)
+        dp.message.middleware(LatestWinsMiddleware(scheduler))
+        dp.include_router(router)
+        bot = Bot("42:TEST", session=RecordingSession())
+
+        first = asyncio.create_task(dp.feed_update(bot, message_update(1, "date 1")))
+        await asyncio.sleep(0.01)
+        rest = [
+            asyncio.create_task(dp.feed_update(bot, message_update(i, text)))
+            for i, text in ((2, "date 2"), (3, "date 3"), (4, "save"), (5, "date 5"))
+        ]
+        await asyncio.gather(first, *rest)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+
+    # 1 is cancelled by 2's arrival, 2 and 3 are skipped as 3 and "save" wait
+    # behind them, "save" is not flagged and runs to the end.
+    assert started == ["date 1", "date 5"]
+    assert finished == ["save", "date 5"]
+    assert scheduler.superseded == 3
+
+
+def test_superseded_lookup_leaves_the_state_to_the_next_message() -> None:
+    router = Router()
+    chosen: list[str] = []
+
+    @router.message(Confirming.waiting)
+    async def choose(message: Message, state: FSMContext, latest_wins: LatestWins) -> None:
+        slots = await latest_wins(lambda: asyncio.sleep(0.05, result=[message.text]))
+        if slots is None:
+            return
+        chosen.extend(slots)
+        await state.clear()
+
+    async def scenario() -> str | None:
+        scheduler = UpdateScheduler(max_concurrency=4)
+        dp = ScheduledDispatcher(scheduler=scheduler)
+        dp.message.middleware(LatestWinsMiddleware(scheduler))
+        dp.include_router(router)
+        bot = Bot("42:TEST", session=RecordingSession())
+        state = dp.fsm.get_context(bot, chat_id=7, user_id=7)
+        await state.set_state(Confirming.waiting)
+
+        first = asyncio.create_task(dp.feed_update(bot, message_update(1, "date 1")))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, dp.feed_update(bot, message_update(2, "date 2")))
+        return await state.get_state()
+
+    assert asyncio.run(scenario()) is None
+    assert chosen == ["date 2"]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+
+from aiogram import Bot, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+from coworkingbot.app.update_queue import ScheduledDispatcher, UpdateScheduler
+from coworkingbot.app.webhook import SECRET_HEADER, WebhookHandler, build_webhook_app
+from coworkingbot.devtools.loadtest import RecordingSession
+
+
+class DummyDispatcher:
+    def __init__(self) -> None:
+        self.handled: list[int] = []
+        self.running = 0
+        self.peak = 0
+
+    async def feed_raw_update(self, bot, update) -> None:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.05)
+        self.running -= 1
+        self.handled.append(update["update_id"])
+
+
+def test_webhook_checks_secret_bounds_concurrency_and_drains() -> None:
+    async def scenario() -> None:
+        dp = DummyDispatcher()
+        handler = WebhookHandler(object(), dp, secret="s3cret", max_concurrency=2)
+        client = TestClient(TestServer(build_webhook_app(handler, "/hook")))
+        await client.start_server()
+        try:
+            denied = await client.post("/hook", json={"update_id": 0})
+            assert denied.status == 401
+
+            headers = {SECRET_HEADER: "s3cret"}
+            replies = await asyncio.gather(
+                *(client.post("/hook", json={"update_id": i}, headers=headers) for i in range(5))
+            )
+            assert [r.status for r in replies] == [200] * 5
+
+            await handler.drain(timeout=5)
+            assert sorted(dp.handled) == [0, 1, 2, 3, 4]
+            assert dp.peak <= 2
+
+            late = await client.post("/hook", json={"update_id": 9}, headers=headers)
+            assert late.status == 503
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_webhook_slot_is_not_held_while_an_update_waits_for_its_chat() -> None:
+    router = Router()
+    finished: list[str] = []
+
+    @router.message()
+    async def handle(message: Message) -> None:
+        await asyncio.sleep(0.2 if message.text == "slow" else 0)
+        finished.append(message.text)
+
+    def raw_update(update_id: int, chat_id: int, text: str) -> dict:
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+                "text": text,
+            },
+        }
+
+    async def scenario() -> None:
+        dp = ScheduledDispatcher(scheduler=UpdateScheduler(max_concurrency=4))
+        dp.include_router(router)
+        bot = Bot("42:TEST", session=RecordingSession())
+        handler = WebhookHandler(bot, dp, secret="s3cret", max_concurrency=2)
+        client = TestClient(TestServer(build_webhook_app(handler, "/hook")))
+        await client.start_server()
+        try:
+            headers = {SECRET_HEADER: "s3cret"}
+            for update in (raw_update(1, 1, "slow"), raw_update(2, 1, "queued")):
+                assert (await client.post("/hook", json=update, headers=headers)).status == 200
+            other = await client.post("/hook", json=raw_update(3, 2, "other"), headers=headers)
+            assert other.status == 200
+            await handler.drain(timeout=5)
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+
+    # The other chat did not wait for a slot held by chat 1's queued update.
+    assert finished == ["other", "slow", "queued"]